@@ -1,16 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException
+from contextlib import aclosing
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from app.db.database import get_db
+from app.api.dependencies import get_chat_service
+from app.core.collections import RetrievalScope, normalize_collection
 from app.services.chat_service import ChatService
-from app.db.models import InterviewBooking
-from typing import Optional
+from app.db.models import Document, DocumentChunk, InterviewBooking
+from typing import List, Optional
 
 router = APIRouter(prefix="/api/chat", tags=["Conversational RAG"])
 
 class ChatRequest(BaseModel):
     session_id: str
     query: str
+    top_k: int = Field(5, ge=1, le=50)
+    # Unset: settings.retrieval_mmr_lambda / retrieval_dedup_threshold
+    mmr_lambda: Optional[float] = Field(None, ge=0.0, le=1.0)
+    dedup_threshold: Optional[float] = Field(None, gt=0.0, le=1.0)
+    # Search only this collection (the default one if unset), and within
+    # it only these documents if given
+    collection: Optional[str] = None
+    document_ids: Optional[List[int]] = Field(None, min_length=1)
 
 class BookingRequest(BaseModel):
     name: str
@@ -19,22 +33,58 @@ class BookingRequest(BaseModel):
     interview_time: str
 
 
+async def resolve_scope(request: ChatRequest, db: AsyncSession) -> RetrievalScope:
+    """Retrieval scope of a chat request, checking that its documents exist in its collection"""
+    try:
+        collection = normalize_collection(request.collection)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not request.document_ids:
+        return RetrievalScope(collection)
+    
+    result = await db.execute(
+        select(Document.id, Document.filename)
+        .where(Document.id.in_(request.document_ids), Document.collection == collection)
+    )
+    filenames = dict(result.all())
+    missing = sorted(set(request.document_ids) - set(filenames))
+    if missing:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Documents not found in collection '{collection}': {', '.join(map(str, missing))}"
+        )
+    
+    result = await db.execute(
+        select(DocumentChunk.id).where(DocumentChunk.document_id.in_(request.document_ids))
+    )
+    return RetrievalScope(collection, filenames=filenames.values(), chunk_ids=result.scalars().all())
+
+
 @router.post("/query")
-async def chat_query(request: ChatRequest):
+async def chat_query(
+    request: ChatRequest,
+    chat_service: ChatService = Depends(get_chat_service),
+    db: AsyncSession = Depends(get_db)
+):
     """
     Query the RAG system with conversation support
     """
+    scope = await resolve_scope(request, db)
     try:
-        chat_service = ChatService()
-        result = chat_service.chat(
+        result = await chat_service.chat_async(
             session_id=request.session_id,
-            query=request.query
+            query=request.query,
+            top_k=request.top_k,
+            mmr_lambda=request.mmr_lambda,
+            dedup_threshold=request.dedup_threshold,
+            scope=scope
         )
         
         return {
             "status": "success",
             "session_id": request.session_id,
             "query": request.query,
+            "collection": scope.collection,
             "response": result["response"],
             "context_used": result["context_used"],
             "booking_detected": result["booking_detected"]
@@ -44,6 +94,41 @@ async def chat_query(request: ChatRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/stream")
+async def chat_stream(
+    request: ChatRequest,
+    http_request: Request,
+    chat_service: ChatService = Depends(get_chat_service),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Query the RAG system and stream the answer as server-sent events:
+    `context` once retrieval finishes, `delta` increments of the response
+    and a final `done`. History is saved after the answer is complete.
+    """
+    scope = await resolve_scope(request, db)
+    
+    async def events():
+        stream = chat_service.chat_stream(
+            request.session_id, request.query, request.top_k, request.mmr_lambda, request.dedup_threshold, scope
+        )
+        async with aclosing(stream):
+            async for event in stream:
+                if await http_request.is_disconnected():
+                    break
+                yield _sse(event["event"], event["data"])
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.post("/book-interview")
 async def book_interview(
     request: BookingRequest,
@@ -82,18 +167,25 @@ async def book_interview(
 
 
 @router.get("/history/{session_id}")
-async def get_chat_history(session_id: str):
+async def get_chat_history(
+    session_id: str,
+    offset: int = Query(0, ge=0, description="Index of the first message, oldest first"),
+    limit: int = Query(50, ge=1, le=500, description="Maximum number of messages"),
+    chat_service: ChatService = Depends(get_chat_service)
+):
     """
-    Retrieve chat history for a session
+    Retrieve chat history for a session, a page at a time
     """
     try:
-        chat_service = ChatService()
-        history = chat_service.get_chat_history(session_id)
+        history, total = await chat_service.get_chat_history_page_async(session_id, offset, limit)
         
         return {
             "status": "success",
             "session_id": session_id,
-            "history": history
+            "history": history,
+            "offset": offset,
+            "limit": limit,
+            "total": total
         }
     
     except Exception as e:
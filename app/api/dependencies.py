@@ -0,0 +1,32 @@
+from fastapi import Request
+from app.services.chat_service import ChatService
+from app.services.container import ServiceContainer
+from app.services.document_service import DocumentService
+from app.services.job_service import IngestionJobManager
+
+
+def get_container(request: Request) -> ServiceContainer:
+    return request.app.state.services
+
+
+def get_chat_service(request: Request) -> ChatService:
+    container = get_container(request)
+    return ChatService(
+        embedding_service=container.embedding_service,
+        vector_store=container.vector_store,
+        embedding_batcher=container.embedding_batcher,
+        redis_client=container.redis_client,
+        async_redis_client=container.async_redis_client,
+        async_vector_store=container.async_vector_store,
+        lexical_index=container.lexical_index,
+        semantic_cache=container.semantic_cache,
+        index_version=container.index_version
+    )
+
+
+def get_document_service(request: Request) -> DocumentService:
+    return get_container(request).document_service()
+
+
+def get_job_manager(request: Request) -> IngestionJobManager:
+    return get_container(request).job_manager
@@ -1,8 +1,15 @@
+from typing import List, Optional
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, status
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.database import get_db
+from app.db.models import Document
+from app.api.dependencies import get_document_service, get_job_manager
 from app.services.document_service import DocumentService
+from app.services.job_service import IngestionJobManager, JobQueueFullError
 from app.core.chunking import ChunkingStrategy
+from app.core.collections import normalize_collection
+from app.core.uploads import spool_upload, UploadTooLargeError
 import logging
 import os
 
@@ -10,11 +17,22 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/ingest", tags=["Document Ingestion"])
 
+
+def _collection_or_400(collection: Optional[str]) -> str:
+    try:
+        return normalize_collection(collection)
+    except ValueError as e:
+        logger.error(f"Invalid collection: {collection}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
 @router.post("/upload", status_code=status.HTTP_201_CREATED)
 async def upload_document(
     file: UploadFile = File(..., description="PDF or TXT file"),
-    chunking_strategy: str = Form(..., description="Chunking strategy: fixed_size or sentence_based"),
-    db: AsyncSession = Depends(get_db)
+    chunking_strategy: str = Form(..., description="Chunking strategy: fixed_size, sentence_based or token_based"),
+    collection: Optional[str] = Form(None, description="Collection to add the document to (default if omitted)"),
+    db: AsyncSession = Depends(get_db),
+    document_service: DocumentService = Depends(get_document_service)
 ):
     """
     Upload and process a document
@@ -34,17 +52,19 @@ async def upload_document(
             detail=f"Only {', '.join(allowed_extensions)} files are supported"
         )
 
-    if chunking_strategy not in ['fixed_size', 'sentence_based']:
+    if chunking_strategy not in [strategy.value for strategy in ChunkingStrategy]:
         logger.error(f"Invalid chunking strategy: {chunking_strategy}")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="chunking_strategy must be either 'fixed_size' or 'sentence_based'"
+            detail="chunking_strategy must be one of 'fixed_size', 'sentence_based' or 'token_based'"
         )
+    collection = _collection_or_400(collection)
     
+    file_path = None
     try:
-        file_content = await file.read()
+        file_path, file_size = await spool_upload(file)
         
-        if len(file_content) == 0:
+        if file_size == 0:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="File is empty"
@@ -52,15 +72,16 @@ async def upload_document(
 
         strategy_enum = ChunkingStrategy(chunking_strategy)
 
-        document_service = DocumentService()
-        document = await document_service.process_document(
-            filename=file.filename,
-            file_content=file_content,
-            chunking_strategy=strategy_enum
-        )
-        
-        db.add(document)
-        await db.commit()
+        async with document_service.document_lock(file.filename, collection):
+            document = await document_service.process_file(
+                filename=file.filename,
+                file_path=file_path,
+                chunking_strategy=strategy_enum,
+                db=db,
+                collection=collection
+            )
+            
+            await db.commit()
         await db.refresh(document)
 
         
@@ -69,6 +90,7 @@ async def upload_document(
             "message": "Document processed and stored successfully",
             "document_id": document.id,
             "filename": document.filename,
+            "collection": document.collection,
             "chunking_strategy": document.chunking_strategy,
             "chunk_count": document.chunk_count,
             "file_type": document.file_type
@@ -76,8 +98,133 @@ async def upload_document(
         
     except HTTPException:
         raise
+    except UploadTooLargeError as e:
+        logger.error(f"Upload rejected: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to process document: {str(e)}"
-        )
\ No newline at end of file
+        )
+    finally:
+        if file_path:
+            os.remove(file_path)
+
+
+@router.post("/bulk", status_code=status.HTTP_202_ACCEPTED)
+async def bulk_upload(
+    files: List[UploadFile] = File(..., description="PDF or TXT files"),
+    chunking_strategy: str = Form(..., description="Chunking strategy: fixed_size, sentence_based or token_based"),
+    collection: Optional[str] = Form(None, description="Collection to add the documents to (default if omitted)"),
+    job_manager: IngestionJobManager = Depends(get_job_manager)
+):
+    """
+    Queue documents for background ingestion and return a job per file
+    """
+    if chunking_strategy not in [strategy.value for strategy in ChunkingStrategy]:
+        logger.error(f"Invalid chunking strategy: {chunking_strategy}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="chunking_strategy must be one of 'fixed_size', 'sentence_based' or 'token_based'"
+        )
+    collection = _collection_or_400(collection)
+
+    if not job_manager.has_capacity(len(files)):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Ingestion queue is full, retry later"
+        )
+
+    strategy_enum = ChunkingStrategy(chunking_strategy)
+    allowed_extensions = ('.pdf', '.txt')
+    jobs = []
+
+    for file in files:
+        filename = file.filename or ""
+        if not filename.lower().endswith(allowed_extensions):
+            jobs.append({
+                "filename": filename,
+                "status": "rejected",
+                "error": f"Only {', '.join(allowed_extensions)} files are supported"
+            })
+            continue
+
+        file_path = None
+        try:
+            file_path, file_size = await spool_upload(file, spool_dir=job_manager.job_dir)
+            if file_size == 0:
+                raise ValueError("File is empty")
+
+            job = await job_manager.submit(filename, file_path, strategy_enum, collection)
+            file_path = None
+            jobs.append({"filename": filename, "status": job.status, "job_id": job.id})
+
+        except (UploadTooLargeError, JobQueueFullError, ValueError) as e:
+            logger.error(f"Bulk upload rejected {filename}: {e}")
+            jobs.append({"filename": filename, "status": "rejected", "error": str(e)})
+        except Exception as e:
+            logger.error(f"Failed to queue {filename}: {e}")
+            jobs.append({"filename": filename, "status": "rejected", "error": f"Failed to queue document: {str(e)}"})
+        finally:
+            if file_path:
+                os.remove(file_path)
+
+    return {
+        "queued": sum(1 for job in jobs if job["status"] == "queued"),
+        "jobs": jobs
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(
+    job_id: str,
+    job_manager: IngestionJobManager = Depends(get_job_manager)
+):
+    """
+    Status and progress of a background ingestion job
+    """
+    job = await job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+
+    return {
+        "job_id": job.id,
+        "filename": job.filename,
+        "collection": job.collection,
+        "status": job.status,
+        "chunking_strategy": job.chunking_strategy,
+        "progress": {
+            "pages_extracted": job.pages_extracted,
+            "chunks_embedded": job.chunks_embedded,
+            "vectors_upserted": job.vectors_upserted
+        },
+        "document_id": job.document_id,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at
+    }
+
+
+@router.get("/collections")
+async def list_collections(db: AsyncSession = Depends(get_db)):
+    """
+    Collections with their document and chunk counts
+    """
+    result = await db.execute(
+        select(Document.collection, func.count(Document.id), func.sum(Document.chunk_count))
+        .group_by(Document.collection)
+        .order_by(Document.collection)
+    )
+    return {
+        "collections": [
+            {"collection": collection, "documents": documents, "chunks": chunks or 0}
+            for collection, documents, chunks in result.all()
+        ]
+    }
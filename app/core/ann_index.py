@@ -0,0 +1,182 @@
+from typing import List, Optional, Tuple
+from array import array
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class IVFIndex:
+    """
+    Inverted-file index over the rows of a vector matrix.
+
+    Rows are assigned to the nearest of `nlist` spherical k-means centroids.
+    A query scans only the `nprobe` closest lists, trading recall for
+    latency. The index stores row numbers only; the vectors themselves stay
+    in the owning store's matrix.
+
+    Re-assigning a row (an overwrite) leaves its old list entry behind as a
+    stale posting, which searches skip by checking `assignment[row]`. Lists
+    are compacted once stale postings make up a large share of them.
+    """
+
+    def __init__(self, dimension: int, nlist: int, nprobe: int = 8):
+        self.dimension = dimension
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.centroids: Optional[np.ndarray] = None
+        self.assignment = np.full(0, -1, dtype=np.int32)
+        self._lists: List[array] = []
+        self._postings = 0
+        self.trained_size = 0
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def train(self, vectors: np.ndarray, iterations: int = 15, seed: int = 0):
+        """Fit centroids with spherical k-means on a sample of normalized vectors"""
+        rng = np.random.default_rng(seed)
+        nlist = min(self.nlist, vectors.shape[0])
+        sample_size = min(vectors.shape[0], max(nlist * 64, 10000))
+        sample = vectors[rng.choice(vectors.shape[0], sample_size, replace=False)]
+
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = self._nearest(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=nlist)
+
+            empty = counts == 0
+            if empty.any():
+                # Re-seed empty clusters from random sample points
+                sums[empty] = sample[rng.choice(sample_size, int(empty.sum()), replace=False)]
+
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+
+        self.nlist = nlist
+        self.centroids = centroids
+        self.clear()
+        self.trained_size = vectors.shape[0]
+
+    @staticmethod
+    def _nearest(vectors: np.ndarray, centroids: np.ndarray, block: int = 8192) -> np.ndarray:
+        labels = np.empty(vectors.shape[0], dtype=np.int32)
+        for start in range(0, vectors.shape[0], block):
+            scores = vectors[start:start + block] @ centroids.T
+            labels[start:start + block] = np.argmax(scores, axis=1)
+        return labels
+
+    def clear(self):
+        """Drop every posting but keep the trained centroids"""
+        self.assignment = np.full(0, -1, dtype=np.int32)
+        self._lists = [array('q') for _ in range(self.nlist)]
+        self._postings = 0
+
+    def add(self, rows: np.ndarray, vectors: np.ndarray):
+        """Assign rows (with their normalized vectors) to their nearest lists"""
+        if not self.is_trained or len(rows) == 0:
+            return
+
+        rows = np.asarray(rows, dtype=np.int64)
+        needed = int(rows.max()) + 1
+        if needed > self.assignment.shape[0]:
+            grown = np.full(max(needed, self.assignment.shape[0] * 2), -1, dtype=np.int32)
+            grown[:self.assignment.shape[0]] = self.assignment
+            self.assignment = grown
+
+        labels = self._nearest(vectors, self.centroids)
+        self.assignment[rows] = labels
+        for row, label in zip(rows.tolist(), labels.tolist()):
+            self._lists[label].append(row)
+        self._postings += len(rows)
+
+        if self._postings > 2 * max(1, int((self.assignment >= 0).sum())):
+            self.compact()
+
+    def remove(self, rows: np.ndarray):
+        """Tombstone rows so searches skip them"""
+        rows = np.asarray(rows, dtype=np.int64)
+        rows = rows[rows < self.assignment.shape[0]]
+        self.assignment[rows] = -1
+
+    def compact(self):
+        """Drop stale and tombstoned postings from every list"""
+        live = 0
+        for label, postings in enumerate(self._lists):
+            rows = np.frombuffer(postings, dtype=np.int64) if len(postings) else np.empty(0, dtype=np.int64)
+            keep = np.unique(rows[self.assignment[rows] == label])
+            self._lists[label] = array('q', keep.tobytes())
+            live += keep.shape[0]
+        self._postings = live
+
+    def candidates(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """Live rows in the nprobe lists closest to the query"""
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        centroid_scores = self.centroids @ query
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+
+        rows_parts, label_parts = [], []
+        for label in probe.tolist():
+            postings = self._lists[label]
+            if len(postings):
+                rows_parts.append(np.frombuffer(postings, dtype=np.int64))
+                label_parts.append(np.full(len(postings), label, dtype=np.int32))
+        if not rows_parts:
+            return np.empty(0, dtype=np.int64)
+
+        rows = np.concatenate(rows_parts)
+        rows = rows[self.assignment[rows] == np.concatenate(label_parts)]
+        return np.unique(rows)
+
+    def save(self, path: str):
+        lengths = np.array([len(postings) for postings in self._lists], dtype=np.int64)
+        postings = np.concatenate([
+            np.frombuffer(p, dtype=np.int64) for p in self._lists if len(p)
+        ]) if lengths.sum() else np.empty(0, dtype=np.int64)
+        np.savez(
+            path,
+            centroids=self.centroids,
+            assignment=self.assignment,
+            lengths=lengths,
+            postings=postings,
+            params=np.array([self.dimension, self.nlist, self.nprobe, self.trained_size], dtype=np.int64)
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        with np.load(path) as data:
+            dimension, nlist, nprobe, trained_size = (int(v) for v in data["params"])
+            index = cls(dimension, nlist, nprobe)
+            index.centroids = data["centroids"].astype(np.float32)
+            index.assignment = data["assignment"].astype(np.int32)
+            index.trained_size = trained_size
+            offsets = np.concatenate([[0], np.cumsum(data["lengths"])])
+            postings = data["postings"].astype(np.int64)
+            index._lists = [
+                array('q', postings[offsets[i]:offsets[i + 1]].tobytes()) for i in range(nlist)
+            ]
+            index._postings = int(postings.shape[0])
+        return index
+
+
+def recall_at_k(exact: List[List[str]], approximate: List[List[str]]) -> float:
+    """Mean fraction of the exact top-k ids recovered by the approximate search"""
+    hits = [
+        len(set(truth) & set(found)) / len(truth)
+        for truth, found in zip(exact, approximate) if truth
+    ]
+    return float(np.mean(hits)) if hits else 0.0
+
+
+def top_k_rows(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Positions and scores of the k highest scores, best first"""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=scores.dtype)
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return top, scores[top]
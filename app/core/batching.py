@@ -0,0 +1,162 @@
+from typing import List, Dict, Any, Optional
+import asyncio
+import time
+from collections import deque
+from app.core.config import settings
+from app.core.embeddings import EmbeddingService
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """
+    Coalesce concurrent single-text embedding requests into batched encodes.
+
+    Callers await `embed(text)`. A collector task drains the queue until
+    either `max_batch_size` texts are pending or `max_wait_ms` has elapsed
+    since the first one arrived, then encodes them with a single
+    `model.encode` call and resolves each caller's future.
+    """
+
+    def __init__(
+        self,
+        embedding_service: EmbeddingService,
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None,
+        max_in_flight: Optional[int] = None
+    ):
+        self.embedding_service = embedding_service
+        self.max_batch_size = max_batch_size or settings.embedding_batch_max_size
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else settings.embedding_batch_max_wait_ms) / 1000.0
+        self._in_flight = asyncio.Semaphore(max_in_flight or settings.embedding_max_workers)
+        self._queue: Optional[asyncio.Queue] = None
+        self._collector: Optional[asyncio.Task] = None
+        self._batches: set = set()
+
+        self._batch_count = 0
+        self._item_count = 0
+        self._max_batch_seen = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._recent_sizes = deque(maxlen=1000)
+        self._recent_waits = deque(maxlen=1000)
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._collector = asyncio.create_task(self._collect())
+
+    async def stop(self):
+        if self._collector is not None:
+            self._collector.cancel()
+            try:
+                await self._collector
+            except asyncio.CancelledError:
+                pass
+            self._collector = None
+
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+
+        while self._queue is not None and not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Embedding batcher stopped"))
+
+    async def embed(self, text: str) -> List[float]:
+        """Queue a text for the next batch and wait for its embedding"""
+        if self._collector is None:
+            return await self.embedding_service.generate_embedding_async(text)
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self):
+        # A pending `queue.get()` is carried across windows rather than
+        # cancelled on timeout, so an item is never dropped by the race
+        # between the timeout firing and the get completing.
+        getter = None
+        while True:
+            if getter is None:
+                getter = asyncio.ensure_future(self._queue.get())
+            first = await getter
+            getter = None
+
+            batch = [first]
+            deadline = first[2] + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                getter = asyncio.ensure_future(self._queue.get())
+                done, _ = await asyncio.wait({getter}, timeout=remaining)
+                if not done:
+                    break
+                batch.append(getter.result())
+                getter = None
+
+            await self._in_flight.acquire()
+            task = asyncio.create_task(self._encode(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _encode(self, batch):
+        try:
+            dispatched_at = time.perf_counter()
+            self._record(len(batch), [dispatched_at - enqueued_at for _, _, enqueued_at in batch])
+
+            texts = [text for text, _, _ in batch]
+            try:
+                embeddings = await self.embedding_service.generate_embeddings_async(texts)
+            except Exception as e:
+                logger.error(f"Batched embedding failed: {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            for (_, future, _), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+        finally:
+            self._in_flight.release()
+
+    def _record(self, size: int, waits: List[float]):
+        self._batch_count += 1
+        self._item_count += size
+        self._max_batch_seen = max(self._max_batch_seen, size)
+        self._recent_sizes.append(size)
+        for wait in waits:
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+            self._recent_waits.append(wait)
+
+    def stats(self) -> Dict[str, Any]:
+        """Batch-size and queue-wait figures for tuning the batching window"""
+        waits = sorted(self._recent_waits)
+        sizes = sorted(self._recent_sizes)
+
+        def percentile(values, p):
+            if not values:
+                return 0
+            return values[min(len(values) - 1, int(p * len(values)))]
+
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self._batch_count,
+            "items": self._item_count,
+            "avg_batch_size": self._item_count / self._batch_count if self._batch_count else 0.0,
+            "p50_batch_size": percentile(sizes, 0.50),
+            "max_batch_seen": self._max_batch_seen,
+            "avg_queue_wait_ms": self._wait_total / self._item_count * 1000 if self._item_count else 0.0,
+            "p50_queue_wait_ms": percentile(waits, 0.50) * 1000,
+            "p99_queue_wait_ms": percentile(waits, 0.99) * 1000,
+            "max_queue_wait_ms": self._wait_max * 1000,
+            "pending": self._queue.qsize() if self._queue is not None else 0
+        }
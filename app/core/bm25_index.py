@@ -0,0 +1,384 @@
+from typing import AbstractSet, Dict, Iterable, List, Optional, Tuple
+from array import array
+from contextlib import contextmanager
+import fcntl
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import numpy as np
+from app.core.collections import Partitions
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"\w+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have in is it its of on or that the "
+    "this to was were will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def default_index_path() -> str:
+    """bm25_index next to the SQLite document database, or in the working directory"""
+    if settings.bm25_index_path:
+        return settings.bm25_index_path
+    url = settings.database_url
+    if url.startswith("sqlite") and ":///" in url:
+        database = url.split(":///", 1)[1]
+        if database and database != ":memory:":
+            return os.path.join(os.path.dirname(database) or ".", "bm25_index")
+    return "bm25_index"
+
+
+class BM25Index:
+    """
+    In-process BM25 inverted index over chunk texts, keyed by vector id.
+
+    Each term's postings are two parallel arrays, doc numbers (uint32) and
+    term frequencies (uint16), so a query term is scored with one
+    vectorized pass over zero-copy NumPy views. Removed chunks are
+    tombstoned and dropped from the postings when the index is saved.
+
+    With a path, the index is a snapshot directory plus an append-only
+    log of adds and removes since that snapshot; opening replays the log
+    and close() folds it into a new snapshot. Several processes (API
+    workers) may open the same path: log writes and compaction take a
+    file lock, and compaction rebuilds the snapshot from the files rather
+    than from its own process's copy, so no worker's writes are lost.
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._reset()
+        self._dirty = False
+        self._log = None
+        self._lock = threading.RLock()
+
+        if self.path:
+            with self._file_lock():
+                self._load()
+            self._log = open(self._log_path(), "a", encoding="utf-8")
+
+    def __len__(self) -> int:
+        return self._live_count
+
+    def _reset(self):
+        self._ids: List[str] = []
+        self._texts: List[Optional[str]] = []
+        self._lengths = array("I")
+        self._live = bytearray()
+        self._id_to_doc: Dict[str, int] = {}
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._total_length = 0
+        self._live_count = 0
+
+    def _load(self):
+        """State on disk: the snapshot, if any, with the log replayed over it"""
+        self._reset()
+        if os.path.isdir(self.path):
+            self._load_snapshot(self.path)
+        self._replay_log()
+
+    def _log_path(self) -> str:
+        return f"{self.path}.log"
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock on the index files, across every process using the path"""
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def add(self, ids: List[str], texts: List[str]):
+        """Index chunk texts, replacing any already indexed under the same id"""
+        with self._lock:
+            self._add(ids, texts)
+            self._append_log({"add": list(ids), "texts": list(texts)})
+
+    def remove(self, ids: Iterable[str]):
+        with self._lock:
+            ids = [vector_id for vector_id in ids if vector_id in self._id_to_doc]
+            self._remove(ids)
+            if ids:
+                self._append_log({"remove": ids})
+
+    def _add(self, ids: List[str], texts: List[str]):
+        self._remove([vector_id for vector_id in ids if vector_id in self._id_to_doc])
+        for vector_id, text in zip(ids, texts):
+            doc = len(self._ids)
+            terms: Dict[str, int] = {}
+            tokens = tokenize(text)
+            for token in tokens:
+                terms[token] = terms.get(token, 0) + 1
+            for term, frequency in terms.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = (array("I"), array("H"))
+                postings[0].append(doc)
+                postings[1].append(min(frequency, 65535))
+
+            self._ids.append(vector_id)
+            self._texts.append(text)
+            self._lengths.append(len(tokens))
+            self._live.append(1)
+            self._id_to_doc[vector_id] = doc
+            self._total_length += len(tokens)
+            self._live_count += 1
+        self._dirty = True
+
+    def _remove(self, ids: List[str]):
+        for vector_id in ids:
+            doc = self._id_to_doc.pop(vector_id)
+            self._live[doc] = 0
+            self._texts[doc] = None
+            self._total_length -= self._lengths[doc]
+            self._live_count -= 1
+            self._dirty = True
+
+    def search(
+        self, query: str, top_k: int = 10, ids: Optional[AbstractSet[str]] = None
+    ) -> List[Dict[str, object]]:
+        """Top_k chunks by BM25 score as id/score/text dicts, only among `ids` if given"""
+        terms = set(tokenize(query))
+        with self._lock:
+            if not terms or not self._live_count:
+                return []
+            allowed = None
+            if ids is not None:
+                allowed = np.fromiter(
+                    (self._id_to_doc[vector_id] for vector_id in ids if vector_id in self._id_to_doc),
+                    dtype=np.int64
+                )
+            docs, scores = self._score(terms, top_k, allowed)
+            return [
+                {"id": self._ids[doc], "score": float(score), "text": self._texts[doc]}
+                for doc, score in zip(docs, scores)
+            ]
+
+    def _score(
+        self, terms: Iterable[str], top_k: int, allowed: Optional[np.ndarray] = None
+    ) -> Tuple[List[int], List[float]]:
+        # Runs under the lock; the buffer views die before add() can resize
+        # the arrays they point into
+        scores = np.zeros(len(self._ids), dtype=np.float32)
+        lengths = np.frombuffer(self._lengths, dtype=np.uint32)
+        average = self._total_length / self._live_count or 1.0
+        norms = self.k1 * (1 - self.b + self.b * lengths / average)
+        live = np.frombuffer(self._live, dtype=np.uint8)
+
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            docs = np.frombuffer(postings[0], dtype=np.uint32)
+            frequencies = np.frombuffer(postings[1], dtype=np.uint16).astype(np.float32)
+            # Postings of removed chunks stay until the next save; they must
+            # not count towards the document frequency
+            frequency = int(live[docs].sum())
+            idf = math.log(1 + (self._live_count - frequency + 0.5) / (frequency + 0.5))
+            scores[docs] += idf * frequencies * (self.k1 + 1) / (frequencies + norms[docs])
+
+        scores *= live
+        if allowed is not None:
+            candidates = allowed[scores[allowed] > 0]
+        else:
+            candidates = np.flatnonzero(scores)
+        if candidates.shape[0] > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return candidates.tolist(), scores[candidates].tolist()
+
+    def _append_log(self, entry: Dict[str, object]):
+        if self._log is not None:
+            with self._file_lock():
+                self._log.write(json.dumps(entry) + "\n")
+                self._log.flush()
+
+    def _replay_log(self):
+        log_path = self._log_path()
+        if not os.path.exists(log_path):
+            return
+        entries = 0
+        with open(log_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line from a crash mid-write
+                    break
+                if "add" in entry:
+                    self._add(entry["add"], entry["texts"])
+                else:
+                    self._remove([vector_id for vector_id in entry["remove"] if vector_id in self._id_to_doc])
+                entries += 1
+        if entries:
+            logger.info(f"Replayed {entries} BM25 index log entries")
+
+    def save(self):
+        """Write a compacted snapshot and truncate the log"""
+        if not self.path:
+            return
+        with self._lock, self._file_lock():
+            # Other processes append to the same log, and may have compacted
+            # it since this one opened, so start from what is on disk. All of
+            # this process's writes are in the log already.
+            self._load()
+
+            staging = f"{self.path}.tmp"
+            shutil.rmtree(staging, ignore_errors=True)
+            os.makedirs(staging)
+
+            live_docs = [doc for doc in range(len(self._ids)) if self._live[doc]]
+            renumber = np.full(len(self._ids) + 1, -1, dtype=np.int64)
+            renumber[live_docs] = np.arange(len(live_docs))
+
+            with open(os.path.join(staging, "docs.jsonl"), "w", encoding="utf-8") as f:
+                for doc in live_docs:
+                    f.write(json.dumps({"id": self._ids[doc], "text": self._texts[doc]}) + "\n")
+
+            terms, offsets, all_docs, all_frequencies = [], [0], [], []
+            for term, (docs, frequencies) in self._postings.items():
+                mapped = renumber[np.frombuffer(docs, dtype=np.uint32)]
+                keep = mapped >= 0
+                if not keep.any():
+                    continue
+                terms.append(term)
+                all_docs.append(mapped[keep].astype(np.uint32))
+                all_frequencies.append(np.frombuffer(frequencies, dtype=np.uint16)[keep])
+                offsets.append(offsets[-1] + int(keep.sum()))
+                del mapped
+
+            np.savez(
+                os.path.join(staging, "postings.npz"),
+                offsets=np.asarray(offsets, dtype=np.int64),
+                docs=np.concatenate(all_docs) if all_docs else np.zeros(0, dtype=np.uint32),
+                frequencies=np.concatenate(all_frequencies) if all_frequencies else np.zeros(0, dtype=np.uint16),
+                lengths=np.asarray([self._lengths[doc] for doc in live_docs], dtype=np.uint32)
+            )
+            all_docs = all_frequencies = None
+            with open(os.path.join(staging, "terms.json"), "w", encoding="utf-8") as f:
+                json.dump(terms, f)
+
+            previous = f"{self.path}.old"
+            shutil.rmtree(previous, ignore_errors=True)
+            if os.path.isdir(self.path):
+                os.rename(self.path, previous)
+            os.rename(staging, self.path)
+            shutil.rmtree(previous, ignore_errors=True)
+
+            if self._log is not None:
+                self._log.close()
+            self._log = open(self._log_path(), "w", encoding="utf-8")
+
+            self._load_snapshot(self.path)
+            self._dirty = False
+        logger.info(f"Saved BM25 index with {self._live_count} chunks to {self.path}")
+
+    def _load_snapshot(self, path: str):
+        ids, texts = [], []
+        with open(os.path.join(path, "docs.jsonl"), encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                ids.append(record["id"])
+                texts.append(record["text"])
+        with open(os.path.join(path, "terms.json"), encoding="utf-8") as f:
+            terms = json.load(f)
+
+        with np.load(os.path.join(path, "postings.npz")) as data:
+            offsets = data["offsets"]
+            docs = data["docs"]
+            frequencies = data["frequencies"]
+            lengths = data["lengths"]
+
+        self._postings = {}
+        for i, term in enumerate(terms):
+            start, stop = offsets[i], offsets[i + 1]
+            self._postings[term] = (
+                array("I", docs[start:stop].tobytes()),
+                array("H", frequencies[start:stop].tobytes())
+            )
+        self._ids = ids
+        self._texts = texts
+        self._lengths = array("I", lengths.astype(np.uint32).tobytes())
+        self._live = bytearray(b"\x01" * len(ids))
+        self._id_to_doc = {vector_id: doc for doc, vector_id in enumerate(ids)}
+        self._total_length = int(lengths.sum())
+        self._live_count = len(ids)
+
+    def close(self):
+        if self._dirty:
+            self.save()
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+
+
+class PartitionedBM25Index:
+    """
+    One BM25Index per namespace, laid out like PartitionedLocalVectorStore:
+    the default namespace at `path`, the others under `<path>-collections/`.
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.partitions: Partitions[BM25Index] = Partitions(self._open, path)
+
+    def _open(self, path: str) -> BM25Index:
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        return BM25Index(path or None, self.k1, self.b)
+
+    def __len__(self) -> int:
+        return sum(len(index) for _, index in self.partitions.items())
+
+    def add(self, ids: List[str], texts: List[str], namespace: Optional[str] = None):
+        self.partitions.get(namespace, create=True).add(ids, texts)
+
+    def remove(self, ids: Iterable[str], namespace: Optional[str] = None):
+        index = self.partitions.get(namespace)
+        if index is not None:
+            index.remove(ids)
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 10,
+        namespace: Optional[str] = None,
+        ids: Optional[AbstractSet[str]] = None
+    ) -> List[Dict[str, object]]:
+        index = self.partitions.get(namespace)
+        return index.search(query, top_k, ids) if index is not None else []
+
+    def close(self):
+        for _, index in self.partitions.items():
+            index.close()
+
+def reciprocal_rank_fusion(rankings: List[List[Dict[str, object]]], k: int = 60) -> List[Dict[str, object]]:
+    """
+    Merge ranked result lists by sum of 1 / (k + rank). Each result keeps
+    the fields of its first occurrence; "score" becomes the fused score.
+    """
+    fused: Dict[str, Dict[str, object]] = {}
+    for ranking in rankings:
+        for rank, result in enumerate(ranking):
+            entry = fused.get(result["id"])
+            if entry is None:
+                entry = fused[result["id"]] = {**result, "score": 0.0}
+            entry["score"] += 1.0 / (k + rank + 1)
+    return sorted(fused.values(), key=lambda result: result["score"], reverse=True)
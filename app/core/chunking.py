@@ -1,10 +1,18 @@
-from typing import List
+from typing import Any, List, Iterable, Iterator, Optional, Tuple
 from enum import Enum
+import re
 
 
 class ChunkingStrategy(str, Enum):
     FIXED_SIZE = "fixed_size"
     SENTENCE_BASED = "sentence_based"
+    TOKEN_BASED = "token_based"
+
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+# Sentence text with the character span of each of its tokens
+TokenizedSentence = Tuple[str, List[Tuple[int, int]]]
 
 
 class TextChunker:
@@ -48,7 +56,13 @@ class TextChunker:
         return chunks
     
     @staticmethod
-    def chunk_text(text: str, strategy: ChunkingStrategy) -> List[str]:
+    def chunk_text(
+        text: str,
+        strategy: ChunkingStrategy,
+        tokenizer: Optional[Any] = None,
+        max_tokens: int = 254,
+        overlap_tokens: int = 32
+    ) -> List[str]:
         """
         Chunk text using the specified strategy
         """
@@ -56,5 +70,226 @@ class TextChunker:
             return TextChunker.chunk_fixed_size(text)
         elif strategy == ChunkingStrategy.SENTENCE_BASED:
             return TextChunker.chunk_sentence_based(text)
+        elif strategy == ChunkingStrategy.TOKEN_BASED:
+            return list(TextChunker.iter_token_based([text], tokenizer, max_tokens, overlap_tokens))
+        else:
+            raise ValueError(f"Unknown chunking strategy: {strategy}")
+    
+    @staticmethod
+    def iter_fixed_size(pieces: Iterable[str], chunk_size: int = 500, overlap: int = 50) -> Iterator[str]:
+        """
+        Streaming form of chunk_fixed_size: yields the same chunks for the
+        concatenation of `pieces` while holding only one window in memory
+        """
+        step = chunk_size - overlap
+        buffer = ""
+        start = 0
+        for piece in pieces:
+            buffer = buffer[start:] + piece
+            start = 0
+            while len(buffer) - start >= chunk_size:
+                chunk = buffer[start:start + chunk_size].strip()
+                if chunk:
+                    yield chunk
+                start += step
+        
+        while start < len(buffer):
+            chunk = buffer[start:start + chunk_size].strip()
+            if chunk:
+                yield chunk
+            start += step
+    
+    @staticmethod
+    def iter_sentence_based(pieces: Iterable[str], sentences_per_chunk: int = 5) -> Iterator[str]:
+        """
+        Streaming form of chunk_sentence_based: sentences are split as text
+        arrives and a chunk is yielded as soon as it is full
+        """
+        remainder = ""
+        sentences = []
+        
+        def complete(parts):
+            for sentence in parts:
+                sentence = sentence.strip()
+                if sentence:
+                    sentences.append(sentence + '.')
+        
+        for piece in pieces:
+            parts = (remainder + piece.replace('\n', ' ')).split('.')
+            remainder = parts.pop()
+            complete(parts)
+            while len(sentences) >= sentences_per_chunk:
+                chunk = ' '.join(sentences[:sentences_per_chunk]).strip()
+                del sentences[:sentences_per_chunk]
+                if chunk:
+                    yield chunk
+        
+        complete([remainder])
+        for i in range(0, len(sentences), sentences_per_chunk):
+            chunk = ' '.join(sentences[i:i + sentences_per_chunk]).strip()
+            if chunk:
+                yield chunk
+    
+    @staticmethod
+    def _iter_sentences(pieces: Iterable[str], max_chars: int = 16384) -> Iterator[str]:
+        """
+        Whitespace-normalized sentences of a piece stream. A run of text
+        with no sentence end is cut after max_chars so the buffer stays
+        bounded.
+        """
+        remainder = ""
+        for piece in pieces:
+            parts = _SENTENCE_END.split(remainder + piece)
+            remainder = parts.pop()
+            while len(remainder) > max_chars:
+                cut = remainder.rfind(' ', 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+                parts.append(remainder[:cut])
+                remainder = remainder[cut:]
+            for part in parts:
+                sentence = ' '.join(part.split())
+                if sentence:
+                    yield sentence
+        sentence = ' '.join(remainder.split())
+        if sentence:
+            yield sentence
+    
+    @staticmethod
+    def _iter_tokenized_sentences(
+        pieces: Iterable[str],
+        tokenizer: Any,
+        max_tokens: int,
+        batch_size: int = 256
+    ) -> Iterator[TokenizedSentence]:
+        """
+        Sentences with their token offsets, tokenized a batch at a time.
+        Sentences longer than max_tokens are split between words, or
+        between tokens when a single word is longer than max_tokens.
+        """
+        def tokenize(sentences):
+            encoded = tokenizer(sentences, add_special_tokens=False, return_offsets_mapping=True)
+            for sentence, offsets in zip(sentences, encoded["offset_mapping"]):
+                offsets = [tuple(span) for span in offsets]
+                if len(offsets) <= max_tokens:
+                    yield sentence, offsets
+                    continue
+                start = 0
+                while start < len(offsets):
+                    end = start + max_tokens
+                    if end < len(offsets):
+                        end = TextChunker._word_start_before(offsets, end, start)
+                    window = offsets[start:end]
+                    begin = window[0][0]
+                    yield (
+                        sentence[begin:window[-1][1]],
+                        [(a - begin, b - begin) for a, b in window]
+                    )
+                    start = end
+        
+        batch = []
+        for sentence in TextChunker._iter_sentences(pieces):
+            batch.append(sentence)
+            if len(batch) >= batch_size:
+                yield from tokenize(batch)
+                batch = []
+        if batch:
+            yield from tokenize(batch)
+    
+    @staticmethod
+    def _starts_word(offsets: List[Tuple[int, int]], index: int) -> bool:
+        """
+        Whether the token at index begins a word. A slice starting inside
+        a word re-tokenizes differently (a WordPiece "##ing" becomes
+        "ing"), usually into more tokens than were counted.
+        """
+        return index == 0 or offsets[index][0] > offsets[index - 1][1]
+    
+    @staticmethod
+    def _word_start_before(offsets: List[Tuple[int, int]], end: int, start: int) -> int:
+        """The last word start in (start, end], or end if there is none"""
+        for index in range(end, start, -1):
+            if TextChunker._starts_word(offsets, index):
+                return index
+        return end
+    
+    @staticmethod
+    def _token_tail(sentences: List[TokenizedSentence], limit: int) -> Tuple[List[TokenizedSentence], int]:
+        """At most the last `limit` tokens of a chunk, cut at a word boundary"""
+        kept = []
+        count = 0
+        for text, offsets in reversed(sentences):
+            if count + len(offsets) <= limit:
+                kept.append((text, offsets))
+                count += len(offsets)
+                continue
+            cut = len(offsets) - (limit - count)
+            while cut < len(offsets) and not TextChunker._starts_word(offsets, cut):
+                cut += 1
+            if cut < len(offsets):
+                begin = offsets[cut][0]
+                kept.append((text[begin:], [(a - begin, b - begin) for a, b in offsets[cut:]]))
+                count += len(offsets) - cut
+            break
+        kept.reverse()
+        return kept, count
+    
+    @staticmethod
+    def iter_token_based(
+        pieces: Iterable[str],
+        tokenizer: Any,
+        max_tokens: int = 254,
+        overlap_tokens: int = 32
+    ) -> Iterator[str]:
+        """
+        Pack whole sentences into chunks of at most max_tokens tokens as
+        counted by the embedding model's tokenizer, so no chunk is
+        truncated by the model. Consecutive chunks share up to their last
+        overlap_tokens tokens; a sentence longer than a chunk is split.
+        Cuts fall between words so each chunk re-tokenizes to the tokens
+        it was counted as.
+        """
+        if tokenizer is None:
+            raise ValueError("Token-based chunking requires a tokenizer")
+        overlap_tokens = min(overlap_tokens, max_tokens // 2)
+        
+        current: List[TokenizedSentence] = []
+        total = 0
+        fresh = False
+        for text, offsets in TextChunker._iter_tokenized_sentences(pieces, tokenizer, max_tokens):
+            count = len(offsets)
+            if not count:
+                continue
+            if current and total + count > max_tokens:
+                if fresh:
+                    yield ' '.join(sentence for sentence, _ in current)
+                current, total = TextChunker._token_tail(current, min(overlap_tokens, max_tokens - count))
+            current.append((text, offsets))
+            total += count
+            fresh = True
+            if total >= max_tokens:
+                yield ' '.join(sentence for sentence, _ in current)
+                current, total = TextChunker._token_tail(current, overlap_tokens)
+                fresh = False
+        
+        if current and fresh:
+            yield ' '.join(sentence for sentence, _ in current)
+    
+    @staticmethod
+    def iter_chunks(
+        pieces: Iterable[str],
+        strategy: ChunkingStrategy,
+        tokenizer: Optional[Any] = None,
+        max_tokens: int = 254,
+        overlap_tokens: int = 32
+    ) -> Iterator[str]:
+        """
+        Chunk a stream of text pieces using the specified strategy
+        """
+        if strategy == ChunkingStrategy.FIXED_SIZE:
+            return TextChunker.iter_fixed_size(pieces)
+        elif strategy == ChunkingStrategy.SENTENCE_BASED:
+            return TextChunker.iter_sentence_based(pieces)
+        elif strategy == ChunkingStrategy.TOKEN_BASED:
+            return TextChunker.iter_token_based(pieces, tokenizer, max_tokens, overlap_tokens)
         else:
-            raise ValueError(f"Unknown chunking strategy: {strategy}")
\ No newline at end of file
+            raise ValueError(f"Unknown chunking strategy: {strategy}")
@@ -0,0 +1,115 @@
+"""
+Collections: named partitions of the corpus.
+
+Every document belongs to one collection. Its vectors live in a
+vector store namespace of the same name (a Pinecone namespace, or a
+separate local index) and its chunks in a matching BM25 partition, so a
+query scoped to a collection only searches that partition. The default
+collection maps to the default namespace, where documents ingested
+before collections existed already are.
+"""
+from typing import Callable, Dict, FrozenSet, Generic, Iterable, List, Optional, Tuple, TypeVar
+import os
+import re
+import threading
+
+DEFAULT_COLLECTION = "default"
+
+_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$")
+
+T = TypeVar("T")
+
+
+def normalize_collection(name: Optional[str]) -> str:
+    """The collection name to use, DEFAULT_COLLECTION when none is given"""
+    if not name:
+        return DEFAULT_COLLECTION
+    if not _NAME.match(name):
+        raise ValueError(
+            "Collection names are 1-64 letters, digits, '_' or '-', starting with a letter or digit"
+        )
+    return name
+
+
+def collection_namespace(collection: Optional[str]) -> Optional[str]:
+    """Vector store namespace of a collection; None is the default namespace"""
+    collection = normalize_collection(collection)
+    return None if collection == DEFAULT_COLLECTION else collection
+
+
+def partition_path(base_path: Optional[str], namespace: Optional[str]) -> str:
+    """
+    Storage path of a partition: `base_path` itself for the default
+    namespace, `<base_path>-collections/<namespace>` for the others. An
+    empty base path (in-memory) stays empty.
+    """
+    if not base_path or namespace is None:
+        return base_path or ""
+    return os.path.join(f"{base_path}-collections", namespace)
+
+
+class RetrievalScope:
+    """
+    The part of the corpus a query searches: one collection, optionally
+    narrowed to some of its documents (their filenames, and the vector
+    ids of their chunks for backends that cannot filter on metadata).
+    """
+
+    def __init__(
+        self,
+        collection: Optional[str] = None,
+        filenames: Optional[Iterable[str]] = None,
+        chunk_ids: Optional[Iterable[str]] = None
+    ):
+        self.collection = normalize_collection(collection)
+        self.namespace = collection_namespace(self.collection)
+        self.filenames: Optional[Tuple[str, ...]] = tuple(sorted(filenames)) if filenames is not None else None
+        self.chunk_ids: Optional[FrozenSet[str]] = frozenset(chunk_ids) if chunk_ids is not None else None
+
+    def vector_filter(self) -> Optional[Dict[str, object]]:
+        if self.filenames is None:
+            return None
+        return {"filename": {"$in": list(self.filenames)}}
+
+    def cache_key(self) -> Tuple[str, Optional[Tuple[str, ...]]]:
+        return (self.collection, self.filenames)
+
+
+class Partitions(Generic[T]):
+    """
+    Per-namespace instances of a store, built by `factory(path)` with the
+    path from partition_path. Partitions found on disk are opened up front;
+    others are created on first write.
+    """
+
+    def __init__(self, factory: Callable[[str], T], base_path: Optional[str]):
+        self.factory = factory
+        self.base_path = base_path or ""
+        self._lock = threading.Lock()
+        self._partitions: Dict[Optional[str], T] = {None: factory(self.base_path)}
+        for namespace in self._stored_namespaces():
+            self._partitions[namespace] = factory(partition_path(self.base_path, namespace))
+
+    def _stored_namespaces(self) -> List[str]:
+        if not self.base_path:
+            return []
+        directory = f"{self.base_path}-collections"
+        if not os.path.isdir(directory):
+            return []
+        # Strip suffixes like ".log" or ".tmp" of a partition's own files
+        names = {entry.split(".", 1)[0] for entry in os.listdir(directory)}
+        return sorted(name for name in names if _NAME.match(name))
+
+    def get(self, namespace: Optional[str], create: bool = False) -> Optional[T]:
+        partition = self._partitions.get(namespace)
+        if partition is not None or not create:
+            return partition
+        with self._lock:
+            partition = self._partitions.get(namespace)
+            if partition is None:
+                partition = self._partitions[namespace] = self.factory(partition_path(self.base_path, namespace))
+            return partition
+
+    def items(self) -> List[Tuple[Optional[str], T]]:
+        with self._lock:
+            return list(self._partitions.items())
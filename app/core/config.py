@@ -1,8 +1,18 @@
+from typing import Optional
+import os
 from pydantic_settings import BaseSettings
 
+
+def usable_cpus() -> int:
+    """CPUs this process may run on; in a container often fewer than os.cpu_count()"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
 class Settings(BaseSettings):
     # pinecone
-    pinecone_api_key: str
+    pinecone_api_key: str = ""
     pinecone_environment: str = "gcp-starter"
     pinecone_index_name: str = "rag-documents"
     
@@ -10,6 +20,28 @@ class Settings(BaseSettings):
     redis_host: str = "localhost"
     redis_port: int = 6379
     redis_db: int = 0
+    chat_history_max_messages: int = 10
+    chat_history_ttl: int = 86400
+    
+    # Ingestion
+    max_upload_size: int = 100 * 1024 * 1024
+    # Whole request body of a bulk upload; each file is still held to max_upload_size
+    max_bulk_request_size: int = 1024 * 1024 * 1024
+    upload_chunk_size: int = 1024 * 1024
+    upload_spool_dir: Optional[str] = None
+    ingest_batch_size: int = 64
+    ingest_queue_size: int = 4
+    ingest_job_workers: int = 2
+    ingest_job_queue_size: int = 1000
+    ingest_job_dir: Optional[str] = None
+    ingest_progress_interval: float = 1.0
+    pdf_extraction_workers: int = min(4, usable_cpus())
+    # Each pool task reopens the PDF and ships its text back. Measured on
+    # one CPU, that costs 10-25% on top of the serial time at 1-800 pages.
+    # So the pool is only used with more than one usable CPU, and only from
+    # 64 pages, about 0.4 s of serial extraction, where the fixed cost is
+    # small next to what a second CPU saves.
+    pdf_parallel_min_pages: int = 64
     
     # Database
     database_url: str = "sqlite+aiosqlite:///./rag_system.db"
@@ -21,6 +53,70 @@ class Settings(BaseSettings):
     # Embedding 
     embedding_model: str = "all-MiniLM-L6-v2"  
     embedding_dimension: int = 384  
+    embedding_max_workers: int = 2
+    embedding_backend: str = "torch"
+    # 0 keeps the runtime's default thread count
+    embedding_threads: int = 0
+    embedding_encode_batch_size: int = 32
+    embedding_onnx_path: Optional[str] = None
+    embedding_onnx_quantized: bool = False
+    # Shared embedding server, used by EMBEDDING_BACKEND=server
+    embedding_server_socket: str = "/tmp/rag-embedding.sock"
+    embedding_server_backend: str = "torch"
+    embedding_server_max_batch: int = 128
+    embedding_server_max_wait_ms: float = 2.0
+    embedding_server_timeout: float = 30.0
+    embedding_server_stats_timeout: float = 1.0
+    embedding_batch_max_size: int = 32
+    embedding_batch_max_wait_ms: float = 5.0
+    embedding_cache_enabled: bool = True
+    embedding_cache_max_bytes: int = 64 * 1024 * 1024
+    embedding_cache_path: Optional[str] = None
+    embedding_cache_dtype: str = "float32"
+    # 0 uses the model's max sequence length
+    token_chunk_size: int = 0
+    token_chunk_overlap: int = 32
+    
+    # Vector store
+    vector_store_backend: str = "pinecone"
+    vector_store_max_workers: int = 8
+    vector_upsert_concurrency: int = 4
+    vector_upsert_max_batch_bytes: int = 2 * 1024 * 1024
+    vector_upsert_max_batch_size: int = 1000
+    vector_upsert_max_retries: int = 3
+    vector_upsert_backoff: float = 0.5
+    local_vector_store_path: Optional[str] = None
+    local_index_type: str = "flat"
+    local_vector_quantization: str = "none"
+    local_rescore_factor: int = 4
+    local_ivf_nlist: int = 0
+    local_ivf_nprobe: int = 8
+    local_ivf_min_train_size: int = 10000
+    
+    # Hybrid retrieval
+    hybrid_search_enabled: bool = True
+    # Defaults to bm25_index next to the SQLite database
+    bm25_index_path: Optional[str] = None
+    hybrid_rrf_k: int = 60
+    hybrid_candidates: int = 20
+    
+    # Context selection: candidates fetched per requested chunk, MMR trade-off
+    # (1 = relevance only) and the similarity above which a chunk is a duplicate
+    retrieval_fetch_factor: int = 4
+    retrieval_mmr_lambda: float = 0.7
+    retrieval_dedup_threshold: float = 0.95
+    
+    # Semantic cache of retrieved context
+    semantic_cache_enabled: bool = True
+    # Minimum cosine similarity between query embeddings for a hit
+    semantic_cache_threshold: float = 0.95
+    semantic_cache_ttl: float = 300.0
+    semantic_cache_max_entries: int = 1024
+    
+    # Profiling: fraction of requests run under cProfile, kept if slower than profile_slow_ms
+    profile_sample_rate: float = 0.0
+    profile_slow_ms: float = 500.0
+    profile_dir: Optional[str] = None
     
     class Config:
         env_file = ".env"
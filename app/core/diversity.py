@@ -0,0 +1,66 @@
+"""
+Context selection that trades relevance against redundancy.
+
+Documents often repeat themselves (boilerplate, overlapping chunks,
+re-uploaded copies), so the top_k most similar chunks can be a handful of
+near-identical passages. select_diverse drops candidates that are near
+duplicates of one already chosen and picks the rest by Maximal Marginal
+Relevance:
+
+    argmax  lambda * relevance(c) - (1 - lambda) * max_sim(c, selected)
+
+over one candidate-by-candidate similarity matrix, so the cost is a
+single small matrix product plus k vector updates.
+"""
+from typing import Any, List, Optional, Sequence
+import numpy as np
+
+
+def candidate_matrix(vectors: Sequence[Optional[Any]], dimension: int) -> np.ndarray:
+    """
+    Row-normalized float32 matrix of candidate vectors. A missing vector
+    becomes a zero row: similar to nothing, so never suppressed.
+    """
+    matrix = np.zeros((len(vectors), dimension), dtype=np.float32)
+    for row, vector in enumerate(vectors):
+        if vector is not None:
+            matrix[row] = vector
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def select_diverse(
+    vectors: np.ndarray,
+    relevance: Sequence[float],
+    top_k: int,
+    mmr_lambda: float = 0.7,
+    dedup_threshold: float = 0.95
+) -> List[int]:
+    """
+    Positions of up to top_k candidates, in selection order.
+
+    `vectors` are the L2-normalized candidate rows and `relevance` their
+    scores against the query on a comparable 0-1 scale. A candidate whose
+    cosine similarity to a selected one reaches `dedup_threshold` is
+    dropped; mmr_lambda=1 ranks by relevance alone.
+    """
+    count = vectors.shape[0]
+    if count == 0 or top_k <= 0:
+        return []
+
+    similarity = vectors @ vectors.T
+    weighted_relevance = mmr_lambda * np.asarray(relevance, dtype=np.float32)
+    redundancy = np.zeros(count, dtype=np.float32)
+    available = np.ones(count, dtype=bool)
+    selected: List[int] = []
+
+    while len(selected) < top_k and available.any():
+        scores = weighted_relevance - (1.0 - mmr_lambda) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+        available &= redundancy < dedup_threshold
+    return selected
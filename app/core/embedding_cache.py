@@ -0,0 +1,158 @@
+from typing import List, Dict, Any, Optional
+from collections import OrderedDict
+import hashlib
+import sqlite3
+import threading
+import unicodedata
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """
+    Content-addressed cache of embeddings.
+
+    Entries are keyed by a hash of (model name, normalized text) and kept in
+    an in-memory LRU bounded by `max_bytes`. When `persist_path` is set, a
+    SQLite blob table acts as a second tier that survives restarts; entries
+    found there are promoted back into memory.
+    """
+
+    # Rough per-entry bookkeeping cost (key bytes, OrderedDict node, ndarray header)
+    ENTRY_OVERHEAD = 200
+
+    def __init__(
+        self,
+        model_name: str,
+        max_bytes: int,
+        persist_path: Optional[str] = None,
+        persist_dtype: str = "float32"
+    ):
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.persist_dtype = np.dtype(persist_dtype)
+        self._entries: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if persist_path:
+            self._db = sqlite3.connect(persist_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key BLOB PRIMARY KEY, dtype TEXT NOT NULL, data BLOB NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    def key(self, text: str) -> bytes:
+        payload = f"{self.model_name}\0{self.normalize(text)}".encode("utf-8")
+        return hashlib.sha256(payload).digest()
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Look up embeddings, returning None for each miss"""
+        keys = [self.key(text) for text in texts]
+        results: List[Optional[np.ndarray]] = [None] * len(texts)
+        disk_lookups = []
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    results[i] = entry
+                    self.memory_hits += 1
+                else:
+                    disk_lookups.append(i)
+
+            if disk_lookups and self._db is not None:
+                found = self._load([keys[i] for i in disk_lookups])
+                for i in disk_lookups:
+                    entry = found.get(keys[i])
+                    if entry is not None:
+                        results[i] = entry
+                        self._insert(keys[i], entry)
+                        self.disk_hits += 1
+
+            self.misses += sum(1 for entry in results if entry is None)
+
+        return results
+
+    def put_many(self, texts: List[str], embeddings: List[np.ndarray]):
+        """Store freshly computed embeddings in both tiers"""
+        rows = []
+        with self._lock:
+            for text, embedding in zip(texts, embeddings):
+                key = self.key(text)
+                vector = np.asarray(embedding, dtype=np.float32)
+                self._insert(key, vector)
+                rows.append((key, self.persist_dtype.str, vector.astype(self.persist_dtype).tobytes()))
+
+            if self._db is not None and rows:
+                try:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO embeddings (key, dtype, data) VALUES (?, ?, ?)",
+                        rows
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.error(f"Failed to persist embeddings: {e}")
+
+    def _insert(self, key: bytes, vector: np.ndarray):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous.nbytes + self.ENTRY_OVERHEAD
+
+        self._entries[key] = vector
+        self._bytes += vector.nbytes + self.ENTRY_OVERHEAD
+
+        while self._bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes + self.ENTRY_OVERHEAD
+
+    def _load(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        found = {}
+        try:
+            # SQLite caps bound parameters per statement, so look up in slices
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                cursor = self._db.execute(
+                    f"SELECT key, dtype, data FROM embeddings WHERE key IN ({placeholders})",
+                    batch
+                )
+                for key, dtype, data in cursor:
+                    found[key] = np.frombuffer(data, dtype=np.dtype(dtype)).astype(np.float32)
+        except sqlite3.Error as e:
+            logger.error(f"Failed to read persisted embeddings: {e}")
+        return found
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "persistent": self._db is not None
+            }
+
+    def close(self):
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+                self._db = None
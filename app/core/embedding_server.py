@@ -0,0 +1,367 @@
+"""
+Shared embedding inference server.
+
+One process owns the model and serves every API worker over a Unix domain
+socket, so running uvicorn with N workers keeps a single copy of the
+weights and a single inference thread pool:
+
+    python -m app.core.embedding_server
+    EMBEDDING_BACKEND=server uvicorn app.main:app --workers 4
+
+Requests from all connections are merged into shared batches. Texts go
+over the socket as length-prefixed JSON frames; embeddings come back
+through a shared memory block owned by the server for each connection,
+and only its name and shape are sent over the socket.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import copy
+import json
+import os
+import queue
+import signal
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+from app.core.config import settings
+from app.core.encoder import BaseEncoder, create_encoder
+import logging
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct(">I")
+
+
+def _encode_frame(payload: Dict[str, Any]) -> bytes:
+    data = json.dumps(payload).encode("utf-8")
+    return _HEADER.pack(len(data)) + data
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> Dict[str, Any]:
+    (length,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    return json.loads(await reader.readexactly(length))
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Embedding server closed the connection")
+        data.extend(chunk)
+    return bytes(data)
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Open a block created by the server without taking ownership of it"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching registers the block with this
+        # process's resource tracker, which would unlink it on exit
+        block = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(block._name, "shared_memory")
+        return block
+
+
+class EmbeddingServer:
+    def __init__(
+        self,
+        encoder: BaseEncoder,
+        socket_path: Optional[str] = None,
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None
+    ):
+        self.encoder = encoder
+        self.socket_path = socket_path or settings.embedding_server_socket
+        self.max_batch_size = max_batch_size or settings.embedding_server_max_batch
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else settings.embedding_server_max_wait_ms) / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-server")
+        self._connections = 0
+        self._batches = 0
+        self._requests = 0
+        self._texts = 0
+
+    async def serve(self):
+        self._queue = asyncio.Queue()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        batcher = asyncio.create_task(self._batch_loop())
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, server.close)
+        logger.info(f"Embedding server listening on {self.socket_path}")
+        try:
+            async with server:
+                await server.serve_forever()
+        except asyncio.CancelledError:
+            logger.info("Embedding server stopped")
+        finally:
+            batcher.cancel()
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "max_seq_length": self.encoder.max_seq_length,
+            "tokenizer": getattr(self.encoder.tokenizer, "name_or_path", None),
+            "num_special_tokens": self.encoder.tokenizer.num_special_tokens_to_add()
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connections": self._connections,
+            "requests": self._requests,
+            "texts": self._texts,
+            "batches": self._batches,
+            "avg_requests_per_batch": self._requests / self._batches if self._batches else 0.0,
+            "avg_batch_size": self._texts / self._batches if self._batches else 0.0
+        }
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        loop = asyncio.get_running_loop()
+        block: Optional[shared_memory.SharedMemory] = None
+        self._connections += 1
+        try:
+            while True:
+                try:
+                    request = await _read_frame(reader)
+                except asyncio.IncompleteReadError:
+                    break
+
+                op = request.get("op", "encode")
+                if op == "info":
+                    reply = self.info()
+                elif op == "stats":
+                    reply = self.stats()
+                else:
+                    future = loop.create_future()
+                    await self._queue.put((request["texts"], future))
+                    try:
+                        embeddings = await future
+                    except Exception as e:
+                        reply = {"error": str(e)}
+                    else:
+                        if block is None or block.size < embeddings.nbytes:
+                            if block is not None:
+                                block.close()
+                                block.unlink()
+                            size = max(embeddings.nbytes, 1 << 20)
+                            block = shared_memory.SharedMemory(create=True, size=1 << (size - 1).bit_length())
+                        np.ndarray(embeddings.shape, dtype=np.float32, buffer=block.buf)[:] = embeddings
+                        reply = {"shm": block.name, "rows": embeddings.shape[0], "dimension": embeddings.shape[1]}
+
+                writer.write(_encode_frame(reply))
+                await writer.drain()
+        except Exception as e:
+            logger.error(f"Embedding server connection failed: {e}")
+        finally:
+            self._connections -= 1
+            writer.close()
+            if block is not None:
+                block.close()
+                block.unlink()
+
+    def _drain(self, pending: List[Tuple[List[str], asyncio.Future]], count: int) -> int:
+        while count < self.max_batch_size:
+            try:
+                texts, future = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            pending.append((texts, future))
+            count += len(texts)
+        return count
+
+    async def _batch_loop(self):
+        """Merge requests queued by all connections into one encode call"""
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self._queue.get()]
+            count = self._drain(pending, len(pending[0][0]))
+            if count < self.max_batch_size and self.max_wait > 0:
+                await asyncio.sleep(self.max_wait)
+                count = self._drain(pending, count)
+
+            texts = [text for request_texts, _ in pending for text in request_texts]
+            self._batches += 1
+            self._requests += len(pending)
+            self._texts += len(texts)
+            try:
+                embeddings = await loop.run_in_executor(self._executor, self.encoder.encode, texts)
+            except Exception as e:
+                logger.error(f"Embedding server batch failed: {e}")
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            start = 0
+            for request_texts, future in pending:
+                stop = start + len(request_texts)
+                if not future.done():
+                    future.set_result(np.asarray(embeddings[start:stop], dtype=np.float32))
+                start = stop
+
+
+class _Connection:
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.block: Optional[shared_memory.SharedMemory] = None
+
+    def request(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        self.sock.sendall(_encode_frame(payload))
+        (length,) = _HEADER.unpack(_recv_exact(self.sock, _HEADER.size))
+        return json.loads(_recv_exact(self.sock, length))
+
+    def read(self, name: str, rows: int, dimension: int) -> np.ndarray:
+        if self.block is None or self.block.name != name:
+            if self.block is not None:
+                self.block.close()
+            self.block = _attach(name)
+        return np.ndarray((rows, dimension), dtype=np.float32, buffer=self.block.buf).copy()
+
+    def close(self):
+        if self.block is not None:
+            self.block.close()
+            self.block = None
+        self.sock.close()
+
+
+class EmbeddingClient:
+    """
+    Encoder that forwards to the shared embedding server.
+
+    Holds no model: one socket per concurrent caller (up to pool_size) and
+    the server's tokenizer, loaded only if token-based chunking asks for it.
+    """
+
+    def __init__(
+        self,
+        socket_path: Optional[str] = None,
+        pool_size: Optional[int] = None,
+        timeout: Optional[float] = None
+    ):
+        self.socket_path = socket_path or settings.embedding_server_socket
+        self.timeout = timeout or settings.embedding_server_timeout
+        self._pool: "queue.Queue[_Connection]" = queue.Queue()
+        self._slots = threading.BoundedSemaphore(pool_size or settings.embedding_max_workers)
+        self._info: Optional[Dict[str, Any]] = None
+        self._tokenizer = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _connect(self, timeout: Optional[float] = None) -> _Connection:
+        timeout = timeout or self.timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(timeout)
+            try:
+                sock.connect(self.socket_path)
+                return _Connection(sock)
+            except OSError as e:
+                sock.close()
+                if time.monotonic() >= deadline:
+                    raise ConnectionError(f"Embedding server at {self.socket_path} is unavailable: {e}")
+                time.sleep(0.2)
+
+    def _request(self, payload: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[np.ndarray]]:
+        with self._slots:
+            try:
+                connection = self._pool.get_nowait()
+            except queue.Empty:
+                connection = self._connect()
+            try:
+                reply = connection.request(payload)
+                embeddings = None
+                if "shm" in reply:
+                    embeddings = connection.read(reply["shm"], reply["rows"], reply["dimension"])
+            except BaseException:
+                connection.close()
+                raise
+            self._pool.put(connection)
+        if "error" in reply:
+            raise RuntimeError(f"Embedding server error: {reply['error']}")
+        return reply, embeddings
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, settings.embedding_dimension), dtype=np.float32)
+        _, embeddings = self._request({"op": "encode", "texts": list(texts)})
+        return embeddings
+
+    @property
+    def info(self) -> Dict[str, Any]:
+        if self._info is None:
+            self._info, _ = self._request({"op": "info"})
+        return self._info
+
+    @property
+    def max_seq_length(self) -> int:
+        return self.info["max_seq_length"]
+
+    @property
+    def tokenizer(self) -> Any:
+        with self._lock:
+            if self._tokenizer is None:
+                from transformers import AutoTokenizer
+                self._tokenizer = AutoTokenizer.from_pretrained(self.info["tokenizer"])
+            return self._tokenizer
+
+    def thread_tokenizer(self) -> Any:
+        tokenizer = getattr(self._local, "tokenizer", None)
+        if tokenizer is None:
+            tokenizer = copy.deepcopy(self.tokenizer)
+            self._local.tokenizer = tokenizer
+        return tokenizer
+
+    def stats(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Server figures, over a connection of their own so monitoring does not
+        wait for a free slot or the full request timeout. An unreachable
+        server is reported with available=0 instead of raising.
+        """
+        timeout = timeout or settings.embedding_server_stats_timeout
+        try:
+            connection = self._connect(timeout)
+            try:
+                reply = connection.request({"op": "stats"})
+            finally:
+                connection.close()
+        except Exception as e:
+            logger.warning(f"Embedding server stats unavailable: {e}")
+            return {"available": 0, "error": str(e)}
+        return {"available": 1, **reply}
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Shared embedding inference server")
+    parser.add_argument("--socket", default=None, help="Defaults to settings.embedding_server_socket")
+    parser.add_argument("--backend", default=None, help="Defaults to settings.embedding_server_backend")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    encoder = create_encoder(args.backend or settings.embedding_server_backend)
+    encoder.encode(["warmup"])
+    server = EmbeddingServer(encoder, socket_path=args.socket)
+    asyncio.run(server.serve())
+
+
+if __name__ == "__main__":
+    main()
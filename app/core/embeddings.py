@@ -1,7 +1,10 @@
-from typing import List
+from typing import Any, List
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from app.core.config import settings
+from app.core.embedding_cache import EmbeddingCache
+from app.core.encoder import create_encoder, encoder_key
 import logging
 
 logger = logging.getLogger(__name__)
@@ -9,20 +12,98 @@ logger = logging.getLogger(__name__)
 class EmbeddingService:
     def __init__(self):
         try:
-            self.model = SentenceTransformer(settings.embedding_model)
+            self.encoder = create_encoder()
         except Exception as e:
             logger.error(f"Failed to load embedding model: {e}")
             raise
+        self.cache = None
+        if settings.embedding_cache_enabled:
+            self.cache = EmbeddingCache(
+                model_name=encoder_key(),
+                max_bytes=settings.embedding_cache_max_bytes,
+                persist_path=settings.embedding_cache_path,
+                persist_dtype=settings.embedding_cache_dtype
+            )
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.embedding_max_workers,
+            thread_name_prefix="embedding"
+        )
+    
+    def warmup(self):
+        """Run one forward pass so the first request does not pay for lazy init"""
+        self.encoder.encode(["warmup"])
+    
+    def tokenizer(self) -> Any:
+        """Tokenizer of the model for chunking, private to the calling thread"""
+        return self.encoder.thread_tokenizer()
+    
+    def chunk_token_budget(self) -> int:
+        """Content tokens that fit in one model input, after special tokens"""
+        max_length = self.encoder.max_seq_length
+        if settings.token_chunk_size:
+            max_length = min(settings.token_chunk_size, max_length)
+        return max_length - self.encoder.tokenizer.num_special_tokens_to_add()
+    
+    def stats(self):
+        """Figures of the shared embedding server, when one is used"""
+        if hasattr(self.encoder, "stats"):
+            return self.encoder.stats()
+        return None
+    
+    def close(self):
+        """Stop the encoding executor"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.encoder.close()
+        if self.cache is not None:
+            self.cache.close()
     
     def generate_embedding(self, text: str) -> List[float]:
         """Generate embedding for a single text"""
         return self.generate_embeddings([text])[0]
     
     def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for multiple texts"""
-        try:
-            embeddings = self.model.encode(texts)
-            return embeddings.tolist()
-        except Exception as e:
-            logger.error(f"Embedding generation failed: {e}")
-            return [np.random.rand(settings.embedding_dimension).tolist() for _ in texts]
\ No newline at end of file
+        """
+        Generate embeddings for multiple texts, encoding only cache misses.
+        Encoder failures are raised rather than papered over, so an ingest
+        never stores (and later reuses) vectors that were not computed.
+        """
+        if self.cache is None:
+            try:
+                embeddings = self.encoder.encode(texts)
+                return embeddings.tolist()
+            except Exception as e:
+                logger.error(f"Embedding generation failed: {e}")
+                raise
+        
+        embeddings = self.cache.get_many(texts)
+        
+        # Texts sharing a cache key within one call are encoded once
+        missing = {}
+        for i, embedding in enumerate(embeddings):
+            if embedding is None:
+                missing.setdefault(self.cache.normalize(texts[i]), []).append(i)
+        
+        if missing:
+            miss_texts = [texts[positions[0]] for positions in missing.values()]
+            try:
+                encoded = self.encoder.encode(miss_texts)
+            except Exception as e:
+                logger.error(f"Embedding generation failed: {e}")
+                raise
+            self.cache.put_many(miss_texts, encoded)
+            
+            for positions, embedding in zip(missing.values(), encoded):
+                for i in positions:
+                    embeddings[i] = embedding
+        
+        return [np.asarray(embedding).tolist() for embedding in embeddings]
+    
+    async def generate_embedding_async(self, text: str) -> List[float]:
+        """Generate embedding for a single text without blocking the event loop"""
+        embeddings = await self.generate_embeddings_async([text])
+        return embeddings[0]
+    
+    async def generate_embeddings_async(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings on the bounded encoding executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.generate_embeddings, texts)
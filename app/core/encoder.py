@@ -0,0 +1,183 @@
+from typing import Any, List, Optional
+from abc import ABC, abstractmethod
+import copy
+import json
+import os
+import threading
+import numpy as np
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BaseEncoder(ABC):
+    """
+    Sentence encoder that batches inputs by token length.
+
+    Texts are tokenized once, sorted by length and encoded in batches of
+    neighbours, so each batch is padded only to its own longest input
+    instead of the longest in the call. Results come back in input order.
+    """
+
+    def __init__(self, tokenizer: Any, max_seq_length: int, batch_size: int):
+        self.tokenizer = tokenizer
+        self.max_seq_length = max_seq_length
+        self.batch_size = batch_size
+        self._local = threading.local()
+
+    def thread_tokenizer(self) -> Any:
+        """
+        Per-thread copy of the tokenizer. A fast tokenizer is reconfigured
+        for truncation and padding on each call, which fails when another
+        thread is using it at the same time.
+        """
+        tokenizer = getattr(self._local, "tokenizer", None)
+        if tokenizer is None:
+            tokenizer = copy.deepcopy(self.tokenizer)
+            self._local.tokenizer = tokenizer
+        return tokenizer
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, settings.embedding_dimension), dtype=np.float32)
+
+        input_ids = self.thread_tokenizer()(
+            texts, truncation=True, max_length=self.max_seq_length
+        )["input_ids"]
+        order = np.argsort([len(ids) for ids in input_ids], kind="stable")
+
+        embeddings = None
+        for start in range(0, len(texts), self.batch_size):
+            rows = order[start:start + self.batch_size]
+            batch = self._encode_batch(
+                [texts[i] for i in rows], [input_ids[i] for i in rows]
+            )
+            if embeddings is None:
+                embeddings = np.empty((len(texts), batch.shape[1]), dtype=np.float32)
+            embeddings[rows] = batch
+        return embeddings
+
+    def close(self):
+        """Release backend resources"""
+
+    @abstractmethod
+    def _encode_batch(self, texts: List[str], input_ids: List[List[int]]) -> np.ndarray:
+        """Embed one length-sorted batch; texts and their token ids are both given"""
+
+
+class TorchEncoder(BaseEncoder):
+    """SentenceTransformer on PyTorch, optionally with a fixed CPU thread count"""
+
+    def __init__(self, model_name: str, threads: int = 0, batch_size: int = 32):
+        from sentence_transformers import SentenceTransformer
+
+        if threads > 0:
+            import torch
+            torch.set_num_threads(threads)
+
+        self.model = SentenceTransformer(model_name)
+        super().__init__(self.model.tokenizer, self.model.max_seq_length, batch_size)
+
+    def _encode_batch(self, texts: List[str], input_ids: List[List[int]]) -> np.ndarray:
+        return np.asarray(
+            self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True),
+            dtype=np.float32
+        )
+
+
+class OnnxEncoder(BaseEncoder):
+    """
+    Exported transformer on ONNX Runtime, with the mean pooling and L2
+    normalization of the sentence-transformers MiniLM/MPNet models.
+
+    `model_path` is a directory written by scripts/export_onnx_model.py:
+    model.onnx, model_quantized.onnx (dynamic int8 weights), the tokenizer
+    files and sentence_bert_config.json with the max sequence length.
+    """
+
+    def __init__(self, model_path: str, quantized: bool = False, threads: int = 0, batch_size: int = 32):
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        filename = "model_quantized.onnx" if quantized else "model.onnx"
+        options = onnxruntime.SessionOptions()
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_path, filename),
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        max_seq_length = 256
+        config_path = os.path.join(model_path, "sentence_bert_config.json")
+        if os.path.exists(config_path):
+            with open(config_path) as f:
+                max_seq_length = json.load(f).get("max_seq_length", max_seq_length)
+
+        tokenizer = AutoTokenizer.from_pretrained(model_path)
+        self.pad_token_id = tokenizer.pad_token_id or 0
+        super().__init__(tokenizer, max_seq_length, batch_size)
+
+    def _encode_batch(self, texts: List[str], input_ids: List[List[int]]) -> np.ndarray:
+        width = max(len(ids) for ids in input_ids)
+        ids = np.full((len(input_ids), width), self.pad_token_id, dtype=np.int64)
+        mask = np.zeros((len(input_ids), width), dtype=np.int64)
+        for i, row in enumerate(input_ids):
+            ids[i, :len(row)] = row
+            mask[i, :len(row)] = 1
+
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.zeros_like(ids)
+        hidden = self.session.run(None, feeds)[0]
+
+        weights = mask[:, :, None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+def create_encoder(backend: Optional[str] = None):
+    """Build the encoder selected by settings.embedding_backend"""
+    backend = (backend or settings.embedding_backend).lower()
+    if backend == "server":
+        from app.core.embedding_server import EmbeddingClient
+        return EmbeddingClient()
+    if backend == "torch":
+        return TorchEncoder(
+            settings.embedding_model,
+            threads=settings.embedding_threads,
+            batch_size=settings.embedding_encode_batch_size
+        )
+    if backend == "onnx":
+        if not settings.embedding_onnx_path:
+            raise ValueError("EMBEDDING_ONNX_PATH must be set for the onnx embedding backend")
+        return OnnxEncoder(
+            settings.embedding_onnx_path,
+            quantized=settings.embedding_onnx_quantized,
+            threads=settings.embedding_threads,
+            batch_size=settings.embedding_encode_batch_size
+        )
+    raise ValueError(f"Unknown embedding backend: {settings.embedding_backend}")
+
+
+def encoder_key(backend: Optional[str] = None) -> str:
+    """
+    Identity of the vectors an encoder produces, for the embedding cache.
+    The same model run by ONNX, or quantized, gives slightly different
+    vectors than under torch, so the backend and quantization are part of
+    the key. Torch keeps the bare model name, which earlier caches used.
+    """
+    backend = (backend or settings.embedding_backend).lower()
+    if backend == "server":
+        backend = settings.embedding_server_backend.lower()
+    if backend == "onnx":
+        quantization = "int8" if settings.embedding_onnx_quantized else "fp32"
+        return f"onnx:{settings.embedding_model}:{settings.embedding_onnx_path}:{quantization}"
+    if backend == "torch":
+        return settings.embedding_model
+    return f"{backend}:{settings.embedding_model}"
@@ -0,0 +1,92 @@
+"""
+Keyword rules of the rule-based responder, compiled once at import.
+
+Each rule is a list of lower-case words or phrases matched
+case-insensitively on word boundaries, so "hi" does not fire inside
+"machine" nor "ai" inside "said". All rules are alternatives of one regex
+with a named group per rule, so a query is classified in a single scan
+however many rules there are.
+
+Context passages are much longer than queries, and a leading `\b` or
+IGNORECASE stops `re` from skipping ahead to candidate positions by
+their literal prefix. Passages are therefore lower-cased once and scanned
+with a pattern that only checks the trailing boundary; the character
+before each hit is checked in Python.
+"""
+from typing import Dict, FrozenSet, Optional, Sequence
+import re
+
+QUERY_RULES: Dict[str, Sequence[str]] = {
+    "greeting": ["hello", "hi", "hey", "greetings"],
+    "booking": [
+        "book", "books", "booked", "booking", "schedule", "scheduled", "scheduling",
+        "interview", "interviews", "appointment", "appointments", "meeting", "meetings",
+        "slot", "slots", "time", "times", "date", "dates", "reserve", "reservation"
+    ],
+    "thanks": ["thank", "thanks", "thank you"],
+    "topic_ai": ["artificial intelligence", "ai"],
+    "topic_ml": ["machine learning", "ml"]
+}
+
+# Topics answered with a matching sentence from the context, in priority order
+TOPICS = ("topic_ai", "topic_ml")
+
+
+def _alternation(phrases: Sequence[str]) -> str:
+    # Longest first, so "thank you" is preferred over "thank"
+    ordered = sorted(phrases, key=len, reverse=True)
+    return "|".join(re.escape(phrase).replace(r"\ ", r"\s+") for phrase in ordered)
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+class KeywordMatcher:
+    """Named keyword rules compiled into one combined regex, plus a scanner per rule"""
+
+    def __init__(self, rules: Dict[str, Sequence[str]]):
+        self._combined = re.compile(
+            "|".join(rf"(?P<{name}>\b(?:{_alternation(phrases)})\b)" for name, phrases in rules.items()),
+            re.IGNORECASE
+        )
+        self._rules = {
+            name: re.compile(rf"\b(?:{_alternation(phrases)})\b", re.IGNORECASE)
+            for name, phrases in rules.items()
+        }
+        self._scanners = {
+            name: re.compile(rf"(?:{_alternation(phrases)})(?!\w)")
+            for name, phrases in rules.items()
+        }
+
+    def match(self, text: str) -> FrozenSet[str]:
+        """Names of every rule that occurs in text"""
+        return frozenset(match.lastgroup for match in self._combined.finditer(text))
+
+    def find(self, name: str, text: str, lowered: Optional[str] = None) -> int:
+        """
+        Offset of the first occurrence of one rule in text, or -1.
+        `lowered` is text.lower(), if the caller already has it.
+        """
+        if lowered is None:
+            lowered = text.lower()
+        if len(lowered) != len(text):
+            # Lower-casing changed the length (some non-ASCII letters), so
+            # offsets in lowered do not apply to text
+            match = self._rules[name].search(text)
+            return match.start() if match else -1
+        for match in self._scanners[name].finditer(lowered):
+            start = match.start()
+            if start == 0 or not _is_word_char(lowered[start - 1]):
+                return start
+        return -1
+
+
+QUERY_MATCHER = KeywordMatcher(QUERY_RULES)
+
+
+def enclosing_sentence(text: str, position: int) -> str:
+    """The '.'-delimited sentence of text around position, stripped"""
+    start = text.rfind(".", 0, position) + 1
+    end = text.find(".", position)
+    return text[start:end if end != -1 else len(text)].strip()
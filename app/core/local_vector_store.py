@@ -0,0 +1,724 @@
+from typing import List, Dict, Any, Optional
+from contextlib import contextmanager
+import fcntl
+import json
+import math
+import os
+import shutil
+import struct
+import threading
+import uuid
+import numpy as np
+from app.core.ann_index import IVFIndex, top_k_rows
+from app.core.collections import Partitions
+from app.core.config import settings
+from app.core.vector_segment import VectorSegment
+from app.core.vector_store import BaseVectorStore
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Log record prefix: size of the JSON header, number of float32 rows after it
+_LOG_PREFIX = struct.Struct("<II")
+
+
+def _compare(value: Any, operator: str, operand: Any) -> bool:
+    if operator == "$eq":
+        return value == operand
+    if operator == "$ne":
+        return value != operand
+    if operator == "$in":
+        return value in operand
+    if operator == "$nin":
+        return value not in operand
+    if operator == "$exists":
+        return (value is not None) == bool(operand)
+    if value is None:
+        return False
+    if operator == "$gt":
+        return value > operand
+    if operator == "$gte":
+        return value >= operand
+    if operator == "$lt":
+        return value < operand
+    if operator == "$lte":
+        return value <= operand
+    raise ValueError(f"Unsupported filter operator: {operator}")
+
+
+def matches_filter(metadata: Dict[str, Any], filter_dict: Dict[str, Any]) -> bool:
+    """
+    Evaluate a Pinecone-style metadata filter against one metadata dict.
+
+    Supports bare equality (`{"field": value}`), the comparison operators
+    `$eq $ne $gt $gte $lt $lte $in $nin $exists`, and `$and` / `$or`.
+    """
+    for field, condition in filter_dict.items():
+        if field == "$and":
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif field == "$or":
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(field)
+            for operator, operand in condition.items():
+                if not _compare(value, operator, operand):
+                    return False
+        elif metadata.get(field) != condition:
+            return False
+    return True
+
+
+def _value_key(value: Any) -> Any:
+    """Dictionary key of a metadata value; lists and dicts by their JSON"""
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return json.dumps(value, sort_keys=True, default=str)
+
+
+class _MetadataColumn:
+    """
+    One metadata field of every row, dictionary-encoded: `codes[row]`
+    indexes the field's distinct values, -1 where the row lacks it. A
+    condition is evaluated once per distinct value and the outcomes are
+    gathered by code, so filtering costs a comparison per distinct value
+    plus one vectorized lookup over the rows.
+    """
+
+    def __init__(self, field: str, metadata: List[Dict[str, Any]]):
+        self.field = field
+        self.values: List[Any] = []
+        self._code_of: Dict[Any, int] = {}
+        self.codes = np.empty(max(len(metadata), 1024), dtype=np.int32)
+        self.size = 0
+        for meta in metadata:
+            self.append(meta)
+
+    def _code(self, value: Any) -> int:
+        if value is None:
+            return -1
+        key = _value_key(value)
+        code = self._code_of.get(key)
+        if code is None:
+            code = self._code_of[key] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def append(self, meta: Dict[str, Any]):
+        if self.size == self.codes.shape[0]:
+            self.codes = np.concatenate([self.codes, np.empty_like(self.codes)])
+        self.codes[self.size] = self._code(meta.get(self.field))
+        self.size += 1
+
+    def set(self, row: int, meta: Dict[str, Any]):
+        self.codes[row] = self._code(meta.get(self.field))
+
+    def mask(self, condition: Any, size: int) -> np.ndarray:
+        """Rows among the first `size` whose value satisfies the field's condition"""
+        if isinstance(condition, dict):
+            def test(value):
+                return all(_compare(value, operator, operand) for operator, operand in condition.items())
+        else:
+            def test(value):
+                return value == condition
+        # The extra last entry is the outcome for rows without the field,
+        # which code -1 picks
+        outcomes = np.fromiter(
+            (test(value) for value in self.values + [None]), dtype=bool, count=len(self.values) + 1
+        )
+        return outcomes[self.codes[:size]]
+
+
+class LocalVectorStore(BaseVectorStore):
+    """
+    In-process vector store over normalized float32 embeddings.
+
+    Rows live in two places: an immutable memory-mapped VectorSegment
+    loaded from `path`, followed by an in-memory delta matrix for rows
+    added since. Vectors are L2-normalized on insert so cosine similarity
+    is a matrix-vector product; ids and metadata live in parallel lists
+    indexed by row. Top-k selection uses `argpartition` so only the k best
+    rows are sorted. Metadata fields that queries filter on are also kept
+    as dictionary-encoded columns, so a filter is a vectorized row mask.
+
+    With `index_type="ivf"` an IVFIndex is trained once the store holds
+    `ivf_min_train_size` vectors and queries scan only the probed lists.
+    When the segment is quantized (float16/int8), candidates are ranked on
+    the codes and the best `top_k * rescore_factor` are rescored against
+    the float32 rows.
+
+    A store is a single partition: the `namespace` arguments must be None.
+    PartitionedLocalVectorStore keeps one store per namespace.
+
+    Deleted or overwritten segment rows are tombstoned. `save()` compacts
+    everything into a fresh segment and re-opens it, so the delta matrix
+    only ever holds recent writes.
+
+    With a path, every upsert and delete is first appended to `<path>.log`
+    (ids, metadata and the normalized vectors), so writes survive a crash
+    and opening the store replays them. Several processes (API workers)
+    may share a path. Log writes and compaction take a file lock, and
+    compaction rebuilds from the segment and the log on disk rather than
+    from its own process's rows, so no worker's writes are lost.
+    """
+
+    local_fetch = True
+
+    def __init__(
+        self,
+        dimension: Optional[int] = None,
+        initial_capacity: int = 1024,
+        index_type: Optional[str] = None,
+        path: Optional[str] = None,
+        quantization: Optional[str] = None
+    ):
+        self.dimension = dimension or settings.embedding_dimension
+        self.index_type = (index_type or settings.local_index_type).lower()
+        if self.index_type not in ("flat", "ivf"):
+            raise ValueError(f"Unknown local index type: {self.index_type}")
+        self.path = path if path is not None else settings.local_vector_store_path
+        self.quantization = (quantization or settings.local_vector_quantization).lower()
+        self.rescore_factor = settings.local_rescore_factor
+        self._lock = threading.RLock()
+        self._reset(initial_capacity)
+        self._log = None
+
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with self._file_lock():
+                self._load_from_disk()
+            self._log = open(self._log_path(), "ab")
+
+    def __len__(self) -> int:
+        return self._live
+
+    def _reset(self, initial_capacity: int = 1024):
+        self._segment: Optional[VectorSegment] = None
+        self._base = 0
+        self._vectors = np.zeros((initial_capacity, self.dimension), dtype=np.float32)
+        self._deleted = np.zeros(initial_capacity, dtype=bool)
+        self._size = 0
+        self._live = 0
+        self._ids: List[str] = []
+        self._metadata: List[Dict[str, Any]] = []
+        self._columns: Dict[str, _MetadataColumn] = {}
+        self._id_to_row: Dict[str, int] = {}
+        self._ivf: Optional[IVFIndex] = None
+        self._dirty = False
+
+    def _load_from_disk(self):
+        """State on disk: the segment, if any, with the log replayed over it"""
+        if os.path.isdir(self.path):
+            self.load(self.path)
+        else:
+            self._reset()
+        self._replay_log()
+
+    def _log_path(self) -> str:
+        return f"{self.path}.log"
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock on the store files, across every process using the path"""
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _append_log(self, entry: Dict[str, Any], matrix: Optional[np.ndarray] = None):
+        if self._log is None:
+            return
+        header = json.dumps(entry).encode("utf-8")
+        rows = 0 if matrix is None else matrix.shape[0]
+        record = _LOG_PREFIX.pack(len(header), rows) + header
+        if matrix is not None:
+            record += np.ascontiguousarray(matrix, dtype=np.float32).tobytes()
+        with self._file_lock():
+            self._log.write(record)
+            self._log.flush()
+
+    def _replay_log(self):
+        log_path = self._log_path()
+        if not os.path.exists(log_path):
+            return
+        row_bytes = self.dimension * 4
+        entries = 0
+        good = 0
+        with open(log_path, "rb") as f:
+            while True:
+                prefix = f.read(_LOG_PREFIX.size)
+                if len(prefix) < _LOG_PREFIX.size:
+                    break
+                header_size, rows = _LOG_PREFIX.unpack(prefix)
+                header = f.read(header_size)
+                data = f.read(rows * row_bytes)
+                if len(header) < header_size or len(data) < rows * row_bytes:
+                    break
+                try:
+                    entry = json.loads(header)
+                except json.JSONDecodeError:
+                    break
+                if entry["op"] == "upsert":
+                    matrix = np.frombuffer(data, dtype=np.float32).reshape(rows, self.dimension)
+                    self._apply_upsert(entry["ids"], matrix, entry["metadata"])
+                else:
+                    self._apply_delete(entry["ids"])
+                entries += 1
+                good = f.tell()
+        if good < os.path.getsize(log_path):
+            # A torn last record from a crash mid-write; later appends must not follow it
+            logger.warning(f"Truncating a torn record at the end of {log_path}")
+            os.truncate(log_path, good)
+        if entries:
+            logger.info(f"Replayed {entries} vector store log entries")
+
+    @staticmethod
+    def _check_namespace(namespace: Optional[str]):
+        if namespace is not None:
+            raise ValueError("LocalVectorStore holds a single namespace; use PartitionedLocalVectorStore")
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def _reserve(self, rows: int):
+        delta = self._size - self._base
+        capacity = self._vectors.shape[0]
+        if delta + rows > capacity:
+            while capacity < delta + rows:
+                capacity *= 2
+            grown = np.zeros((capacity, self.dimension), dtype=np.float32)
+            grown[:delta] = self._vectors[:delta]
+            self._vectors = grown
+
+        if self._size + rows > self._deleted.shape[0]:
+            deleted = np.zeros(max(self._size + rows, 2 * self._deleted.shape[0]), dtype=bool)
+            deleted[:self._size] = self._deleted[:self._size]
+            self._deleted = deleted
+
+    def _view(self):
+        """Snapshot of the row storage, safe to read after the lock is released"""
+        return self._segment, self._base, self._vectors, self._size
+
+    def _take(self, rows: np.ndarray, view=None) -> np.ndarray:
+        """Full-precision vectors for global row numbers"""
+        segment, base, vectors, _ = view or self._view()
+        out = np.empty((rows.shape[0], self.dimension), dtype=np.float32)
+        in_segment = rows < base
+        if in_segment.any():
+            out[in_segment] = segment.take(rows[in_segment])
+        if not in_segment.all():
+            out[~in_segment] = vectors[rows[~in_segment] - base]
+        return out
+
+    def _scores(self, query: np.ndarray, rows: Optional[np.ndarray], view) -> np.ndarray:
+        """Scores for the given rows (all rows if None), quantized for segment rows"""
+        segment, base, vectors, size = view
+        if rows is None:
+            parts = []
+            if base:
+                parts.append(segment.scores(query))
+            if size > base:
+                parts.append(vectors[:size - base] @ query)
+            return np.concatenate(parts) if parts else np.empty(0, dtype=np.float32)
+
+        scores = np.empty(rows.shape[0], dtype=np.float32)
+        in_segment = rows < base
+        if in_segment.any():
+            scores[in_segment] = segment.scores(query, rows[in_segment])
+        if not in_segment.all():
+            scores[~in_segment] = vectors[rows[~in_segment] - base] @ query
+        return scores
+
+    def upsert_vectors(
+        self,
+        vectors: List[List[float]],
+        texts: List[str],
+        metadata: List[Dict[str, Any]],
+        ids: Optional[List[str]] = None,
+        namespace: Optional[str] = None
+    ) -> List[str]:
+        """Insert vectors, overwriting rows whose id already exists"""
+        self._check_namespace(namespace)
+        if len(vectors) == 0 or not texts:
+            logger.warning("No vectors or texts to upsert")
+            return []
+
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[1] != self.dimension:
+            raise ValueError(
+                f"Expected vectors of dimension {self.dimension}, got shape {matrix.shape}"
+            )
+        matrix = self._normalize(matrix)
+
+        ids = ids or [str(uuid.uuid4()) for _ in range(len(vectors))]
+        metas = []
+        for i in range(len(ids)):
+            meta = dict(metadata[i])
+            meta['text'] = texts[i]
+            metas.append(meta)
+
+        with self._lock:
+            self._append_log({"op": "upsert", "ids": list(ids), "metadata": metas}, matrix)
+            self._apply_upsert(ids, matrix, metas)
+
+        return list(ids)
+
+    def _apply_upsert(self, ids: List[str], matrix: np.ndarray, metas: List[Dict[str, Any]]):
+        with self._lock:
+            self._reserve(len(ids))
+            rows = np.empty(len(ids), dtype=np.int64)
+            replaced = []
+            for i, vector_id in enumerate(ids):
+                meta = metas[i]
+
+                row = self._id_to_row.get(vector_id)
+                if row is not None and row < self._base:
+                    # Segment rows are read-only: tombstone and append instead
+                    self._deleted[row] = True
+                    replaced.append(row)
+                    row = None
+                    self._live -= 1
+
+                if row is None:
+                    row = self._size
+                    self._size += 1
+                    self._live += 1
+                    self._ids.append(vector_id)
+                    self._metadata.append(meta)
+                    for column in self._columns.values():
+                        column.append(meta)
+                    self._id_to_row[vector_id] = row
+                else:
+                    self._metadata[row] = meta
+                    for column in self._columns.values():
+                        column.set(row, meta)
+                self._vectors[row - self._base] = matrix[i]
+                rows[i] = row
+
+            if self._ivf is not None:
+                if replaced:
+                    self._ivf.remove(np.asarray(replaced, dtype=np.int64))
+                self._ivf.add(rows, matrix)
+            self._maybe_train()
+            self._dirty = True
+
+    def delete_vectors(self, ids: List[str], namespace: Optional[str] = None) -> int:
+        """Tombstone the given ids, returning how many were present"""
+        self._check_namespace(namespace)
+        with self._lock:
+            present = [vector_id for vector_id in ids if vector_id in self._id_to_row]
+            if present:
+                self._append_log({"op": "delete", "ids": present})
+            return self._apply_delete(present)
+
+    def _apply_delete(self, ids: List[str]) -> int:
+        with self._lock:
+            rows = [self._id_to_row.pop(vector_id) for vector_id in ids if vector_id in self._id_to_row]
+            if not rows:
+                return 0
+            rows = np.asarray(rows, dtype=np.int64)
+            self._deleted[rows] = True
+            self._live -= rows.shape[0]
+            if self._ivf is not None:
+                self._ivf.remove(rows)
+            self._dirty = True
+            return int(rows.shape[0])
+
+    def _live_rows(self) -> np.ndarray:
+        return np.flatnonzero(~self._deleted[:self._size])
+
+    def _index_rows(self, index: IVFIndex, rows: np.ndarray, block: int = 65536):
+        for start in range(0, rows.shape[0], block):
+            batch = rows[start:start + block]
+            index.add(batch, self._take(batch))
+
+    def _maybe_train(self):
+        if self.index_type != "ivf" or self._live < settings.local_ivf_min_train_size:
+            return
+        # Retrain when the corpus has grown well past what the centroids saw
+        if self._ivf is not None and self._live < 4 * self._ivf.trained_size:
+            return
+
+        live_rows = self._live_rows()
+        nlist = settings.local_ivf_nlist or max(1, int(4 * math.sqrt(live_rows.shape[0])))
+        sample = np.random.default_rng(0).choice(
+            live_rows, min(live_rows.shape[0], max(nlist * 64, 10000)), replace=False
+        )
+        index = IVFIndex(self.dimension, nlist, settings.local_ivf_nprobe)
+        index.train(self._take(np.sort(sample)))
+        index.trained_size = live_rows.shape[0]
+        self._index_rows(index, live_rows)
+        self._ivf = index
+        logger.info(f"Trained IVF index with {index.nlist} lists on {live_rows.shape[0]} vectors")
+
+    def _column(self, field: str) -> _MetadataColumn:
+        """The field's column, built on the first query that filters on it"""
+        column = self._columns.get(field)
+        if column is None:
+            column = self._columns[field] = _MetadataColumn(field, self._metadata)
+        return column
+
+    def _filter_mask(self, filter_dict: Dict[str, Any], size: int) -> np.ndarray:
+        """matches_filter over the first `size` rows, as a boolean mask"""
+        mask = np.ones(size, dtype=bool)
+        for field, condition in filter_dict.items():
+            if field == "$and":
+                for sub in condition:
+                    mask &= self._filter_mask(sub, size)
+            elif field == "$or":
+                matched = np.zeros(size, dtype=bool)
+                for sub in condition:
+                    matched |= self._filter_mask(sub, size)
+                mask &= matched
+            else:
+                mask &= self._column(field).mask(condition, size)
+        return mask
+
+    def query(
+        self,
+        query_vector: List[float],
+        top_k: int = 5,
+        filter_dict: Dict[str, Any] = None,
+        nprobe: Optional[int] = None,
+        exact: bool = False,
+        include_values: bool = False,
+        namespace: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Cosine top-k, through the IVF lists when trained unless exact is set"""
+        self._check_namespace(namespace)
+        try:
+            query = self._normalize(np.asarray(query_vector, dtype=np.float32))
+
+            with self._lock:
+                view = self._view()
+                size = self._size
+                ids = self._ids
+                metadata = self._metadata
+                if self._ivf is not None and not exact:
+                    rows = self._ivf.candidates(query, nprobe)
+                else:
+                    rows = self._live_rows() if self._live < size else None
+                mask = self._filter_mask(filter_dict, size) if filter_dict and size else None
+
+            if size == 0 or top_k <= 0:
+                return []
+
+            if mask is not None:
+                rows = np.flatnonzero(mask) if rows is None else rows[mask[rows]]
+            if rows is not None and rows.size == 0:
+                return []
+
+            scores = self._scores(query, rows, view)
+
+            segment = view[0]
+            if segment is not None and segment.is_quantized:
+                pool, _ = top_k_rows(scores, top_k * self.rescore_factor)
+                rows = rows[pool] if rows is not None else pool
+                scores = self._take(rows, view) @ query
+
+            top, top_scores = top_k_rows(scores, top_k)
+            top_rows = rows[top] if rows is not None else top
+            values = self._take(top_rows, view) if include_values else None
+
+            results = []
+            for position, (row, score) in enumerate(zip(top_rows.tolist(), top_scores.tolist())):
+                meta = metadata[row]
+                result = {
+                    'id': ids[row],
+                    'score': score,
+                    'text': meta.get('text', ''),
+                    'metadata': meta
+                }
+                if values is not None:
+                    result['values'] = values[position]
+                results.append(result)
+            return results
+
+        except Exception as e:
+            logger.error(f"Vector query failed: {e}")
+            raise
+
+    def fetch_vectors(self, ids: List[str], namespace: Optional[str] = None) -> Dict[str, np.ndarray]:
+        self._check_namespace(namespace)
+        with self._lock:
+            view = self._view()
+            found = [(vector_id, self._id_to_row[vector_id]) for vector_id in ids if vector_id in self._id_to_row]
+        if not found:
+            return {}
+        values = self._take(np.asarray([row for _, row in found], dtype=np.int64), view)
+        return {vector_id: values[i] for i, (vector_id, _) in enumerate(found)}
+
+    def save(self, path: Optional[str] = None):
+        """
+        Compact live rows into a new segment directory and switch to it.
+
+        The directory holds the segment files, records.jsonl with ids and
+        metadata in row order, and ivf.npz when an IVF index is trained.
+        Saving to the store's own path folds the log into the segment and
+        truncates it.
+        """
+        path = path or self.path
+        if not path:
+            raise ValueError("No path configured for the local vector store")
+        if path != self.path:
+            with self._lock:
+                self._write_segment(path)
+            return
+
+        with self._lock, self._file_lock():
+            # Other processes append to the same log, and may have compacted
+            # it since this one opened, so start from what is on disk. All of
+            # this process's writes are in the log already.
+            self._load_from_disk()
+            self._write_segment(path)
+            if self._log is not None:
+                self._log.close()
+            self._log = open(self._log_path(), "wb")
+
+    def _write_segment(self, path: str):
+        with self._lock:
+            staging = f"{path}.tmp"
+            shutil.rmtree(staging, ignore_errors=True)
+            os.makedirs(staging)
+
+            live_rows = self._live_rows()
+            VectorSegment.write(
+                staging,
+                live_rows.shape[0],
+                self.dimension,
+                lambda start, stop: self._take(live_rows[start:stop]),
+                quantization=self.quantization
+            )
+            with open(os.path.join(staging, "records.jsonl"), "w", encoding="utf-8") as f:
+                for row in live_rows.tolist():
+                    f.write(json.dumps({"id": self._ids[row], "metadata": self._metadata[row]}) + "\n")
+
+            if self._ivf is not None:
+                # Row numbers change with compaction; keep centroids, rebuild lists
+                segment = VectorSegment(staging)
+                self._ivf.clear()
+                for start in range(0, len(segment), 65536):
+                    stop = min(start + 65536, len(segment))
+                    self._ivf.add(np.arange(start, stop), segment.take(np.arange(start, stop)))
+                self._ivf.save(os.path.join(staging, "ivf.npz"))
+
+            previous = f"{path}.old"
+            shutil.rmtree(previous, ignore_errors=True)
+            if os.path.isdir(path):
+                os.rename(path, previous)
+            os.rename(staging, path)
+            shutil.rmtree(previous, ignore_errors=True)
+
+            self.load(path)
+
+        logger.info(f"Saved {self._live} vectors to {path}")
+
+    def load(self, path: str):
+        """Map the segment in a directory written by save(); reads no vector data"""
+        segment = VectorSegment(path)
+        if segment.dimension != self.dimension:
+            raise ValueError(
+                f"Stored vectors have dimension {segment.dimension}, expected {self.dimension}"
+            )
+
+        ids, metadata = [], []
+        with open(os.path.join(path, "records.jsonl"), encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                ids.append(record["id"])
+                metadata.append(record["metadata"])
+
+        ivf_path = os.path.join(path, "ivf.npz")
+        ivf = IVFIndex.load(ivf_path) if self.index_type == "ivf" and os.path.exists(ivf_path) else None
+
+        with self._lock:
+            self._segment = segment
+            self._base = len(segment)
+            self._size = len(segment)
+            self._vectors = np.zeros((1024, self.dimension), dtype=np.float32)
+            self._deleted = np.zeros(max(self._size, 1024), dtype=bool)
+            self._ids = ids
+            self._metadata = metadata
+            self._columns = {}
+            self._id_to_row = {vector_id: row for row, vector_id in enumerate(ids)}
+            self._live = len(self._id_to_row)
+            self._ivf = ivf
+            self._dirty = False
+            self._maybe_train()
+
+        logger.info(f"Loaded {self._live} vectors from {path}")
+
+    def close(self):
+        if self.path and self._dirty:
+            self.save(self.path)
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+
+class PartitionedLocalVectorStore(BaseVectorStore):
+    """
+    One LocalVectorStore per namespace, so a query only scans the rows of
+    its own partition. The default namespace is stored at `path` as a
+    plain LocalVectorStore; the others under `<path>-collections/`.
+    """
+
+    local_fetch = True
+
+    def __init__(self, path: Optional[str] = None, **options):
+        path = path if path is not None else settings.local_vector_store_path
+        self.partitions: Partitions[LocalVectorStore] = Partitions(
+            lambda partition_path: LocalVectorStore(path=partition_path, **options), path
+        )
+
+    def __len__(self) -> int:
+        return sum(len(store) for _, store in self.partitions.items())
+
+    def upsert_vectors(
+        self,
+        vectors: List[List[float]],
+        texts: List[str],
+        metadata: List[Dict[str, Any]],
+        ids: Optional[List[str]] = None,
+        namespace: Optional[str] = None
+    ) -> List[str]:
+        return self.partitions.get(namespace, create=True).upsert_vectors(vectors, texts, metadata, ids)
+
+    def query(
+        self,
+        query_vector: List[float],
+        top_k: int = 5,
+        filter_dict: Dict[str, Any] = None,
+        include_values: bool = False,
+        namespace: Optional[str] = None,
+        **options
+    ) -> List[Dict[str, Any]]:
+        store = self.partitions.get(namespace)
+        if store is None:
+            return []
+        return store.query(query_vector, top_k, filter_dict, include_values=include_values, **options)
+
+    def fetch_vectors(self, ids: List[str], namespace: Optional[str] = None) -> Dict[str, np.ndarray]:
+        store = self.partitions.get(namespace)
+        return store.fetch_vectors(ids) if store is not None else {}
+
+    def delete_vectors(self, ids: List[str], namespace: Optional[str] = None) -> int:
+        store = self.partitions.get(namespace)
+        return store.delete_vectors(ids) if store is not None else 0
+
+    def save(self):
+        for _, store in self.partitions.items():
+            if store.path:
+                store.save()
+
+    def close(self):
+        for _, store in self.partitions.items():
+            store.close()
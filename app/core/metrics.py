@@ -0,0 +1,285 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Counters, gauges and histograms are plain Python objects guarded by a
+lock each; recording a sample is a dict lookup and a few additions, so
+the instruments can sit on hot paths. GET /metrics renders the registry.
+"""
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+import bisect
+import cProfile
+import io
+import os
+import pstats
+import random
+import threading
+import time
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> Iterable[str]:
+        """Exposition lines of the metric's current values"""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels: str):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (non-cumulative, +Inf last), sum]
+        self._values: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, **labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric):
+        self._metrics.append(metric)
+
+    def render(self, extra: Optional[Dict[str, Dict[str, float]]] = None) -> str:
+        """
+        Exposition text of every registered metric. `extra` adds numeric
+        component statistics (as returned by ServiceContainer.stats) as a
+        `rag_component_stat` gauge.
+        """
+        parts = [metric.render() for metric in self._metrics]
+        if extra:
+            lines = [
+                "# HELP rag_component_stat Runtime statistics reported by shared services",
+                "# TYPE rag_component_stat gauge"
+            ]
+            for component, stats in extra.items():
+                for stat, value in stats.items():
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        labels = _format_labels(("component", "stat"), (component, stat))
+                        lines.append(f"rag_component_stat{labels} {_format_value(value)}")
+            parts.append("\n".join(lines))
+        return "\n".join(parts) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_seconds", "Time spent in each stage of chat and ingestion requests", ["operation", "stage"]
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "rag_http_request_seconds", "HTTP request latency, until the response body is sent", ["method", "route", "status"]
+)
+HTTP_IN_FLIGHT = Gauge("rag_http_requests_in_flight", "HTTP requests being served")
+CHUNKS = Counter("rag_chunks_total", "Chunks produced by ingestion", ["strategy"])
+VECTORS_UPSERTED = Counter("rag_vectors_upserted_total", "Vectors written to the vector store")
+VECTOR_UPSERT_FAILURES = Counter("rag_vector_upsert_failures_total", "Vectors that could not be written")
+INGESTED_BYTES = Counter("rag_ingested_bytes_total", "Bytes of source documents ingested", ["file_type"])
+DOCUMENTS = Counter("rag_documents_ingested_total", "Documents ingested", ["status"])
+CHAT_REQUESTS = Counter("rag_chat_requests_total", "Chat turns served", ["mode"])
+
+
+def stage_timer(operation: str, stage: str):
+    """Context manager recording the duration of one stage into rag_stage_seconds"""
+    return STAGE_SECONDS.time(operation=operation, stage=stage)
+
+
+class RequestProfiler:
+    """
+    Opt-in sampled profiling of HTTP requests.
+
+    A `sample_rate` fraction of requests runs under cProfile, one at a
+    time since the profiler covers the whole event loop thread. If the
+    request then took at least `slow_ms`, the top functions by cumulative
+    time are logged and, with `output_dir`, the raw profile is written
+    there for snakeviz / pstats.
+    """
+
+    def __init__(self, sample_rate: float, slow_ms: float, output_dir: Optional[str] = None):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.output_dir = output_dir
+        self._active = False
+        self._lock = threading.Lock()
+
+    def start(self) -> Optional[cProfile.Profile]:
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        with self._lock:
+            if self._active:
+                return None
+            self._active = True
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler (a debugger, py-spy in-process) is active
+            self._active = False
+            return None
+        return profile
+
+    def finish(self, profile: cProfile.Profile, name: str, seconds: float):
+        profile.disable()
+        self._active = False
+        if seconds * 1000 < self.slow_ms:
+            return
+
+        out = io.StringIO()
+        pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(15)
+        logger.warning(f"Slow request {name} took {seconds * 1000:.1f} ms:\n{out.getvalue()}")
+        if self.output_dir:
+            os.makedirs(self.output_dir, exist_ok=True)
+            slug = "".join(c if c.isalnum() else "_" for c in name).strip("_")
+            profile.dump_stats(os.path.join(self.output_dir, f"{int(time.time() * 1000)}-{slug}.prof"))
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware tracking in-flight requests and their latency by route
+    template, including the time to stream the body, and running the
+    sampled profiler.
+    """
+
+    def __init__(self, app, profiler: Optional[RequestProfiler] = None):
+        self.app = app
+        self.profiler = profiler or RequestProfiler(
+            settings.profile_sample_rate, settings.profile_slow_ms, settings.profile_dir
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        profile = self.profiler.start()
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_IN_FLIGHT.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.observe(elapsed, method=scope["method"], route=path, status=status)
+            if profile is not None:
+                self.profiler.finish(profile, f"{scope['method']} {scope['path']}", elapsed)
@@ -0,0 +1,74 @@
+from typing import Iterator, List
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import contextmanager
+import math
+import mmap
+import multiprocessing
+import PyPDF2
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def open_pdf(path: str):
+    """
+    PdfReader over a read-only memory map of the file.
+
+    PdfReader(path) would read the whole file into a BytesIO; the map lets
+    the OS page it in on demand and share it between processes.
+    """
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield PyPDF2.PdfReader(mapped)
+
+
+def extract_page_range(path: str, start: int, stop: int) -> List[str]:
+    """Extract pages [start, stop) of the PDF at path; runs in a pool worker"""
+    with open_pdf(path) as reader:
+        return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def create_pdf_executor(max_workers: int) -> ProcessPoolExecutor:
+    """
+    Process pool for page extraction. Workers are spawned rather than
+    forked so they do not inherit the API process's threads and model.
+    """
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def iter_pages_parallel(
+    executor: Executor,
+    path: str,
+    page_count: int,
+    workers: int
+) -> Iterator[str]:
+    """
+    Yield page texts in order while page ranges are extracted concurrently.
+
+    Ranges are sized so each worker gets a couple of tasks, and at most
+    2 * workers ranges are in flight, keeping extracted-but-unconsumed
+    text bounded when the consumer is slower than extraction.
+    """
+    pages_per_task = max(4, math.ceil(page_count / (workers * 2)))
+    ranges = [
+        (start, min(start + pages_per_task, page_count))
+        for start in range(0, page_count, pages_per_task)
+    ]
+
+    pending = deque()
+    next_range = 0
+    try:
+        while next_range < len(ranges) or pending:
+            while next_range < len(ranges) and len(pending) < workers * 2:
+                start, stop = ranges[next_range]
+                pending.append(executor.submit(extract_page_range, path, start, stop))
+                next_range += 1
+            yield from pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,150 @@
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+import threading
+import time
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION_KEY = "rag:index_version"
+
+# (shared counter in Redis, ingests finished by this process)
+IndexVersionValue = Tuple[int, int]
+
+
+class IndexVersion:
+    """
+    Version of the searchable index, bumped after every ingest.
+
+    The counter lives in Redis so an ingest in one worker invalidates the
+    caches of all of them. The local count is part of the version too, so
+    this process still sees its own ingests if the Redis increment fails;
+    when Redis cannot be read at all the version is None and callers
+    should not serve cached results.
+    """
+
+    def __init__(self, redis_client=None, async_redis_client=None):
+        self.redis_client = redis_client
+        self.async_redis_client = async_redis_client
+        self._local = 0
+
+    def current(self) -> Optional[IndexVersionValue]:
+        try:
+            return int(self.redis_client.get(INDEX_VERSION_KEY) or 0), self._local
+        except Exception as e:
+            logger.warning(f"Could not read index version: {e}")
+            return None
+
+    async def current_async(self) -> Optional[IndexVersionValue]:
+        try:
+            return int(await self.async_redis_client.get(INDEX_VERSION_KEY) or 0), self._local
+        except Exception as e:
+            logger.warning(f"Could not read index version: {e}")
+            return None
+
+    async def bump_async(self):
+        self._local += 1
+        try:
+            await self.async_redis_client.incr(INDEX_VERSION_KEY)
+        except Exception as e:
+            logger.error(f"Could not bump index version: {e}")
+
+
+class SemanticCache:
+    """
+    Retrieval results keyed by query embedding.
+
+    A lookup hits when a cached query has cosine similarity of at least
+    `threshold` to the new one, was stored for the same retrieval options
+    (`variant`, any hashable value such as top_k) under the current index
+    version and is younger than `ttl` seconds. Embeddings
+    sit in one preallocated matrix, so a lookup is a single matrix-vector
+    product; when all `max_entries` rows are live the least recently used
+    entry is replaced. A version change drops every entry.
+
+    Query embeddings are expected to be L2-normalized, as the encoders
+    return them.
+    """
+
+    def __init__(self, dimension: int, threshold: float, ttl: float, max_entries: int):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._embeddings = np.zeros((max_entries, dimension), dtype=np.float32)
+        self._expires = np.zeros(max_entries, dtype=np.float64)
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._values: List[Optional[Tuple[Hashable, List[str]]]] = [None] * max_entries
+        self._version: Optional[IndexVersionValue] = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._hit_seconds = 0.0
+        self._miss_seconds = 0.0
+
+    def _check_version(self, version: IndexVersionValue):
+        if version != self._version:
+            if self._version is not None:
+                self.invalidations += 1
+            self._version = version
+            self._expires[:] = 0
+            self._values = [None] * self.max_entries
+
+    def get(self, embedding: np.ndarray, version: IndexVersionValue, variant: Hashable) -> Optional[List[str]]:
+        now = time.monotonic()
+        query = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            self._check_version(version)
+            similarities = self._embeddings @ query
+            similarities[self._expires <= now] = -np.inf
+            while True:
+                row = int(np.argmax(similarities))
+                if similarities[row] < self.threshold:
+                    self.misses += 1
+                    return None
+                cached_variant, context = self._values[row]
+                if cached_variant == variant:
+                    self._last_used[row] = now
+                    self.hits += 1
+                    return list(context)
+                similarities[row] = -np.inf
+
+    def put(self, embedding: np.ndarray, version: IndexVersionValue, variant: Hashable, context: List[str]):
+        now = time.monotonic()
+        with self._lock:
+            self._check_version(version)
+            expired = np.flatnonzero(self._expires <= now)
+            row = int(expired[0]) if expired.shape[0] else int(np.argmin(self._last_used))
+            self._embeddings[row] = embedding
+            self._expires[row] = now + self.ttl
+            self._last_used[row] = now
+            self._values[row] = (variant, list(context))
+
+    def record_latency(self, seconds: float, hit: bool):
+        """Time of a whole retrieval, for the saved-latency estimate"""
+        with self._lock:
+            if hit:
+                self._hit_seconds += seconds
+            else:
+                self._miss_seconds += seconds
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            avg_hit_ms = self._hit_seconds / self.hits * 1000 if self.hits else 0.0
+            avg_miss_ms = self._miss_seconds / self.misses * 1000 if self.misses else 0.0
+            return {
+                "entries": int(np.count_nonzero(self._expires > time.monotonic())),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "avg_hit_ms": avg_hit_ms,
+                "avg_miss_ms": avg_miss_ms,
+                # Each hit is assumed to have cost an average miss otherwise
+                "saved_ms": max(avg_miss_ms - avg_hit_ms, 0.0) * self.hits
+            }
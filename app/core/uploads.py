@@ -0,0 +1,145 @@
+from typing import Dict, Optional, Tuple
+import asyncio
+import os
+import tempfile
+from fastapi import UploadFile
+from fastapi.responses import JSONResponse
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Room for the multipart boundaries, part headers and form fields around
+# the file of a single upload
+FORM_OVERHEAD = 1024 * 1024
+
+
+class UploadTooLargeError(Exception):
+    pass
+
+
+def default_upload_limits() -> Dict[str, int]:
+    """Request body limit by path of the upload routes"""
+    return {
+        "/api/ingest/upload": settings.max_upload_size + FORM_OVERHEAD,
+        "/api/ingest/bulk": settings.max_bulk_request_size
+    }
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware capping the request body of the upload routes.
+
+    The multipart form, files included, is parsed and spooled before a
+    handler runs, so the limit has to be enforced here. A request whose
+    Content-Length is over the limit is rejected before any of the body
+    is read. A body without one (chunked) is cut off once the bytes
+    received pass the limit.
+    """
+
+    def __init__(self, app, limits: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.limits = limits if limits is not None else default_upload_limits()
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        declared = _content_length(scope)
+        if declared is not None and declared > limit:
+            logger.error(f"Upload rejected: Content-Length {declared} exceeds {limit} bytes")
+            await _reject(scope, receive, send, limit)
+            return
+
+        received = 0
+        exceeded = False
+        started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    raise UploadTooLargeError(f"Request body exceeds {limit} bytes")
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            # Whatever the app makes of the aborted body is replaced by the 413
+            if exceeded:
+                return
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+        if exceeded and not started:
+            logger.error(f"Upload rejected: request body exceeds {limit} bytes")
+            await _reject(scope, receive, send, limit)
+
+
+def _content_length(scope) -> Optional[int]:
+    for name, value in scope.get("headers", []):
+        if name == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+async def _reject(scope, receive, send, limit: int):
+    response = JSONResponse(
+        {"detail": f"Request exceeds the maximum upload size of {limit} bytes"},
+        status_code=413
+    )
+    await response(scope, receive, send)
+
+
+async def spool_upload(
+    upload: UploadFile,
+    max_bytes: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    spool_dir: Optional[str] = None
+) -> Tuple[str, int]:
+    """
+    Copy an upload to a temp file in fixed-size chunks.
+
+    Returns (path, size). Only one chunk is held in memory at a time, and
+    the copy is abandoned as soon as it passes `max_bytes`. This checks
+    each file of a form that has already been received. The request body
+    as a whole is capped by UploadLimitMiddleware. The caller owns the
+    file and must remove it.
+    """
+    max_bytes = max_bytes or settings.max_upload_size
+    chunk_size = chunk_size or settings.upload_chunk_size
+    suffix = os.path.splitext(upload.filename or "")[1]
+
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=spool_dir or settings.upload_spool_dir)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLargeError(
+                        f"File exceeds the maximum upload size of {max_bytes} bytes"
+                    )
+                await asyncio.to_thread(f.write, chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+
+    return path, size
@@ -0,0 +1,150 @@
+from typing import Callable, Optional
+import json
+import os
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATIONS = ("none", "float16", "int8")
+
+
+class VectorSegment:
+    """
+    Immutable on-disk block of normalized vectors, opened with memory maps.
+
+    A segment directory holds:
+      - vectors.npy   full-precision float32 rows, used for rescoring
+      - codes.npy     float16 or int8 copy scanned by queries (if quantized)
+      - quant.npz     per-dimension scale/offset for int8 codes
+      - segment.json  row count, dimension and quantization
+
+    Files are opened with `np.load(mmap_mode="r")`, so opening a segment
+    reads no vector data, and several worker processes mapping the same
+    files share one copy through the page cache. Queries scan the compact
+    codes and only touch the float32 rows of the final candidates.
+    """
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, "segment.json")) as f:
+            info = json.load(f)
+        self.path = path
+        self.count = info["count"]
+        self.dimension = info["dimension"]
+        self.quantization = info["quantization"]
+
+        # Zero-length files cannot be mapped
+        mmap_mode = "r" if self.count else None
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode=mmap_mode)
+        self.codes = None
+        self.scale = None
+        self.offset = None
+        if self.quantization != "none":
+            self.codes = np.load(os.path.join(path, "codes.npy"), mmap_mode=mmap_mode)
+        if self.quantization == "int8":
+            with np.load(os.path.join(path, "quant.npz")) as quant:
+                self.scale = quant["scale"].astype(np.float32)
+                self.offset = quant["offset"].astype(np.float32)
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def is_quantized(self) -> bool:
+        return self.codes is not None
+
+    def take(self, rows: np.ndarray) -> np.ndarray:
+        """Full-precision vectors for the given rows"""
+        return np.asarray(self.vectors[rows], dtype=np.float32)
+
+    def scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None, block: int = 16384) -> np.ndarray:
+        """
+        Similarity of the query to each row, from the quantized codes when
+        present. Rows are decoded a block at a time so the float32 working
+        set stays bounded regardless of segment size.
+        """
+        source = self.codes if self.codes is not None else self.vectors
+        total = self.count if rows is None else rows.shape[0]
+        out = np.empty(total, dtype=np.float32)
+
+        if self.quantization == "int8":
+            # x ~= offset + scale * (code + 128), so q.x is affine in the codes
+            weights = query * self.scale
+            constant = float(query @ self.offset + 128.0 * weights.sum())
+        else:
+            weights = query
+            constant = 0.0
+
+        for start in range(0, total, block):
+            stop = min(start + block, total)
+            chunk = source[start:stop] if rows is None else source[rows[start:stop]]
+            out[start:stop] = np.asarray(chunk, dtype=np.float32) @ weights + constant
+        return out
+
+    @staticmethod
+    def write(
+        path: str,
+        count: int,
+        dimension: int,
+        read_block: Callable[[int, int], np.ndarray],
+        quantization: str = "none",
+        block: int = 16384
+    ):
+        """
+        Write a segment from `read_block(start, stop)`, which returns the
+        float32 rows in [start, stop). Rows are streamed, never held whole.
+        """
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization}")
+        os.makedirs(path, exist_ok=True)
+
+        if count == 0:
+            np.save(os.path.join(path, "vectors.npy"), np.zeros((0, dimension), dtype=np.float32))
+            if quantization != "none":
+                dtype = np.float16 if quantization == "float16" else np.int8
+                np.save(os.path.join(path, "codes.npy"), np.zeros((0, dimension), dtype=dtype))
+            if quantization == "int8":
+                np.savez(
+                    os.path.join(path, "quant.npz"),
+                    scale=np.ones(dimension, dtype=np.float32),
+                    offset=np.zeros(dimension, dtype=np.float32)
+                )
+            with open(os.path.join(path, "segment.json"), "w") as f:
+                json.dump({"count": 0, "dimension": dimension, "quantization": quantization}, f)
+            return
+
+        vectors = np.lib.format.open_memmap(
+            os.path.join(path, "vectors.npy"), mode="w+", dtype=np.float32, shape=(count, dimension)
+        )
+        low = np.full(dimension, np.inf, dtype=np.float32)
+        high = np.full(dimension, -np.inf, dtype=np.float32)
+        for start in range(0, count, block):
+            stop = min(start + block, count)
+            rows = read_block(start, stop)
+            vectors[start:stop] = rows
+            low = np.minimum(low, rows.min(axis=0))
+            high = np.maximum(high, rows.max(axis=0))
+        vectors.flush()
+
+        if quantization == "float16":
+            codes = np.lib.format.open_memmap(
+                os.path.join(path, "codes.npy"), mode="w+", dtype=np.float16, shape=(count, dimension)
+            )
+            for start in range(0, count, block):
+                codes[start:start + block] = vectors[start:start + block].astype(np.float16)
+            codes.flush()
+        elif quantization == "int8":
+            scale = (high - low) / 255.0
+            scale[scale == 0] = 1.0
+            codes = np.lib.format.open_memmap(
+                os.path.join(path, "codes.npy"), mode="w+", dtype=np.int8, shape=(count, dimension)
+            )
+            for start in range(0, count, block):
+                rows = np.asarray(vectors[start:start + block])
+                quantized = np.clip(np.rint((rows - low) / scale), 0, 255) - 128
+                codes[start:start + block] = quantized.astype(np.int8)
+            codes.flush()
+            np.savez(os.path.join(path, "quant.npz"), scale=scale, offset=low)
+
+        with open(os.path.join(path, "segment.json"), "w") as f:
+            json.dump({"count": count, "dimension": dimension, "quantization": quantization}, f)
@@ -1,5 +1,12 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+from abc import ABC, abstractmethod
+import asyncio
+import json
+import random
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pinecone import Pinecone, ServerlessSpec
+from urllib3.exceptions import HTTPError as TransportError
 from app.core.config import settings
 import uuid
 import logging
@@ -7,10 +14,101 @@ import time
 
 logger = logging.getLogger(__name__)
 
-class VectorStore:
+
+class UpsertReport:
+    """Outcome of an upsert: ids written and the error for each id that was not"""
+
+    def __init__(self):
+        self.succeeded: List[str] = []
+        self.failed: Dict[str, str] = {}
+
+    def merge(self, other: "UpsertReport"):
+        self.succeeded.extend(other.succeeded)
+        self.failed.update(other.failed)
+
+
+class BaseVectorStore(ABC):
+    """Interface shared by the vector store backends"""
+
+    # Whether fetch_vectors is an in-process lookup, cheap enough to check
+    # every recorded chunk id of a document before an ingest reuses it
+    local_fetch = False
+
+    @abstractmethod
+    def upsert_vectors(
+        self,
+        vectors: List[List[float]],
+        texts: List[str],
+        metadata: List[Dict[str, Any]],
+        ids: Optional[List[str]] = None,
+        namespace: Optional[str] = None
+    ) -> List[str]:
+        """
+        Store vectors with their texts and metadata, returning the ids stored.
+        Vectors are written under the given ids, overwriting existing ones,
+        or under fresh ids when none are given. `namespace` selects the
+        partition (see app.core.collections); None is the default one.
+        """
+
+    @abstractmethod
+    def query(
+        self,
+        query_vector: List[float],
+        top_k: int = 5,
+        filter_dict: Dict[str, Any] = None,
+        include_values: bool = False,
+        namespace: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Return the top_k most similar vectors of the namespace as
+        id/score/text/metadata dicts, with the stored vector under 'values'
+        if include_values. A failed query raises rather than returning no
+        matches, so callers can tell the two apart
+        """
+
+    def fetch_vectors(self, ids: List[str], namespace: Optional[str] = None) -> Dict[str, Any]:
+        """Stored vectors by id; ids that are missing are left out"""
+        return {}
+
+    def upsert_with_report(
+        self,
+        vectors: List[List[float]],
+        texts: List[str],
+        metadata: List[Dict[str, Any]],
+        ids: Optional[List[str]] = None,
+        namespace: Optional[str] = None
+    ) -> UpsertReport:
+        """Upsert and report which ids were stored and which failed"""
+        if ids is None:
+            ids = [str(uuid.uuid4()) for _ in range(len(vectors))]
+        report = UpsertReport()
+        try:
+            report.succeeded = list(self.upsert_vectors(vectors, texts, metadata, ids, namespace))
+        except Exception as e:
+            report.failed = {vector_id: str(e) for vector_id in ids}
+            return report
+        stored = set(report.succeeded)
+        report.failed = {
+            vector_id: "Not stored" for vector_id in ids if vector_id not in stored
+        }
+        return report
+
+    @abstractmethod
+    def delete_vectors(self, ids: List[str], namespace: Optional[str] = None) -> int:
+        """Remove vectors by id, returning how many were removed"""
+
+    def close(self):
+        """Flush and release backend resources"""
+
+
+class VectorStore(BaseVectorStore):
     def __init__(self):
         self.pc = Pinecone(api_key=settings.pinecone_api_key)
         self.index_name = settings.pinecone_index_name
+        self._upsert_executor = ThreadPoolExecutor(
+            max_workers=settings.vector_upsert_concurrency,
+            thread_name_prefix="pinecone-upsert"
+        )
         self._initialize_index()
     
     def _initialize_index(self):
@@ -61,78 +159,276 @@ class VectorStore:
         self, 
         vectors: List[List[float]], 
         texts: List[str], 
-        metadata: List[Dict[str, Any]]
+        metadata: List[Dict[str, Any]],
+        ids: Optional[List[str]] = None,
+        namespace: Optional[str] = None
     ) -> List[str]:
         """Insert vectors into Pinecone with metadata"""
-        try:
-            if not vectors or not texts:
-                logger.warning("No vectors or texts to upsert")
-                return []
-                
+        report = self.upsert_with_report(vectors, texts, metadata, ids, namespace)
+        if report.failed:
+            logger.error(f"Failed to upsert {len(report.failed)} of {len(vectors)} vectors")
+        return report.succeeded
+    
+    def upsert_with_report(
+        self,
+        vectors: List[List[float]],
+        texts: List[str],
+        metadata: List[Dict[str, Any]],
+        ids: Optional[List[str]] = None,
+        namespace: Optional[str] = None
+    ) -> UpsertReport:
+        """
+        Upsert in concurrent batches with retries.
+        
+        Batches are cut by estimated request size (the text metadata varies
+        widely) as well as count, and sent by up to
+        vector_upsert_concurrency threads. Throttling and server errors are
+        retried with jittered exponential backoff; a batch that still fails
+        is split in half and retried, so one bad record only fails itself.
+        """
+        report = UpsertReport()
+        if len(vectors) == 0 or not texts:
+            logger.warning("No vectors or texts to upsert")
+            return report
+        
+        if ids is None:
             ids = [str(uuid.uuid4()) for _ in range(len(vectors))]
-
-            for i, meta in enumerate(metadata):
-                meta['text'] = texts[i]
-
-            vectors_to_upsert = [
-                (ids[i], vectors[i], metadata[i]) 
-                for i in range(len(vectors))
-            ]
-            
-           
-            batch_size = 100
-            successful_ids = []
-            
-            for i in range(0, len(vectors_to_upsert), batch_size):
-                batch = vectors_to_upsert[i:i + batch_size]
-                try:
-                    upsert_response = self.index.upsert(vectors=batch)
-                    successful_ids.extend(ids[i:i + batch_size])
-                
-                except Exception as e:
-                    logger.error(f"Failed to upsert batch {i//batch_size + 1}: {e}")
-                    continue
-            
-            return successful_ids
         
+        for i, meta in enumerate(metadata):
+            meta['text'] = texts[i]
+        
+        records = [
+            (ids[i], vectors[i], metadata[i])
+            for i in range(len(vectors))
+        ]
+        batches = self._split_batches(records)
+        upsert_batch = partial(self._upsert_batch, namespace=namespace)
+        
+        if len(batches) == 1:
+            report.merge(upsert_batch(batches[0]))
+        else:
+            for batch_report in self._upsert_executor.map(upsert_batch, batches):
+                report.merge(batch_report)
+        return report
+    
+    @staticmethod
+    def _record_size(record: Tuple[str, List[float], Dict[str, Any]]) -> int:
+        """Approximate JSON size of a record in the upsert request"""
+        vector_id, values, meta = record
+        return len(vector_id) + 12 * len(values) + len(json.dumps(meta, default=str).encode("utf-8")) + 64
+    
+    def _split_batches(self, records: List[Tuple]) -> List[List[Tuple]]:
+        max_bytes = settings.vector_upsert_max_batch_bytes
+        max_count = settings.vector_upsert_max_batch_size
+        batches = []
+        batch, batch_bytes = [], 0
+        for record in records:
+            size = self._record_size(record)
+            if batch and (batch_bytes + size > max_bytes or len(batch) >= max_count):
+                batches.append(batch)
+                batch, batch_bytes = [], 0
+            batch.append(record)
+            batch_bytes += size
+        if batch:
+            batches.append(batch)
+        return batches
+    
+    @staticmethod
+    def _status(error: Exception) -> Optional[int]:
+        status = getattr(error, "status", None) or getattr(error, "status_code", None)
+        return status if isinstance(status, int) else None
+    
+    @classmethod
+    def _is_transient(cls, error: Exception) -> bool:
+        """Rate limiting, server errors and dropped connections; worth retrying as is"""
+        status = cls._status(error)
+        if status is not None:
+            return status == 429 or status >= 500
+        # The client's connection failures surface as urllib3 errors
+        # (ProtocolError, MaxRetryError, ...) or bare socket errors, neither
+        # of which derives from the builtin ConnectionError
+        return isinstance(error, (TransportError, OSError))
+    
+    @classmethod
+    def _is_payload_error(cls, error: Exception) -> bool:
+        """The request itself was rejected (too large, bad record); a smaller batch may pass"""
+        status = cls._status(error)
+        if status is not None:
+            return 400 <= status < 500 and status != 429
+        message = str(error).lower()
+        return "too large" in message or "exceeds" in message
+    
+    def _upsert_batch(self, batch: List[Tuple], namespace: Optional[str] = None) -> UpsertReport:
+        report = UpsertReport()
+        error = None
+        for attempt in range(settings.vector_upsert_max_retries + 1):
+            try:
+                self.index.upsert(vectors=batch, namespace=namespace)
+                report.succeeded = [record[0] for record in batch]
+                return report
+            except Exception as e:
+                error = e
+                if not self._is_transient(e) or attempt == settings.vector_upsert_max_retries:
+                    break
+                delay = settings.vector_upsert_backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+                logger.warning(f"Upsert of {len(batch)} vectors failed ({e}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+        
+        # Only a rejected payload is worth splitting to isolate the bad
+        # records; when the service is unavailable, smaller requests would
+        # just fail again, each after its own backoff
+        if len(batch) > 1 and self._is_payload_error(error):
+            middle = len(batch) // 2
+            report.merge(self._upsert_batch(batch[:middle], namespace))
+            report.merge(self._upsert_batch(batch[middle:], namespace))
+            return report
+        
+        logger.error(f"Failed to upsert {len(batch)} vectors: {error}")
+        report.failed = {record[0]: str(error) for record in batch}
+        return report
+    
+    def delete_vectors(self, ids: List[str], namespace: Optional[str] = None) -> int:
+        """Delete vectors from Pinecone by id"""
+        if not ids:
+            return 0
+        try:
+            for i in range(0, len(ids), 1000):
+                self.index.delete(ids=ids[i:i + 1000], namespace=namespace)
+            return len(ids)
         except Exception as e:
-            logger.error(f"Vector upsert failed: {e}")
+            logger.error(f"Vector delete failed: {e}")
             raise
     
+    def close(self):
+        self._upsert_executor.shutdown(wait=False, cancel_futures=True)
+    
     def query(
         self, 
         query_vector: List[float], 
         top_k: int = 5,
-        filter_dict: Dict[str, Any] = None
+        filter_dict: Dict[str, Any] = None,
+        include_values: bool = False,
+        namespace: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """Query similar vectors from Pinecone"""
         try:
-            logger.info(f"Querying Pinecone with vector of dimension: {len(query_vector)}")
-            logger.info(f"Looking for top {top_k} results")
-            
             results = self.index.query(
                 vector=query_vector,
                 top_k=top_k,
                 include_metadata=True,
-                filter=filter_dict
+                include_values=include_values,
+                filter=filter_dict,
+                namespace=namespace
             )
             
+            # Formatting every match is measurable on the hot path, so only
+            # do it when debug logging is on
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Pinecone query for top {top_k} of dimension {len(query_vector)}")
+                for i, match in enumerate(results.matches):
+                    logger.debug(f"Match {i+1}: Score={match.score:.4f}")
+                    if match.metadata.get('text'):
+                        logger.debug(f"         Text: {match.metadata['text'][:100]}...")
             
-            for i, match in enumerate(results.matches):
-                logger.info(f"Match {i+1}: Score={match.score:.4f}")
-                if match.metadata.get('text'):
-                    logger.info(f"         Text: {match.metadata['text'][:100]}...")
-            
-            return [
-                {
+            matches = []
+            for match in results.matches:
+                result = {
                     'id': match.id,
                     'score': match.score,
                     'text': match.metadata.get('text', ''),
                     'metadata': match.metadata
                 }
-                for match in results.matches
-            ]
+                if include_values:
+                    result['values'] = match.values
+                matches.append(result)
+            return matches
         
         except Exception as e:
             logger.error(f"Vector query failed: {e}")
-            return []
\ No newline at end of file
+            raise
+    
+    def fetch_vectors(self, ids: List[str], namespace: Optional[str] = None) -> Dict[str, Any]:
+        """Fetch stored vectors from Pinecone by id"""
+        if not ids:
+            return {}
+        try:
+            response = self.index.fetch(ids=list(ids), namespace=namespace)
+            return {vector_id: vector.values for vector_id, vector in response.vectors.items()}
+        except Exception as e:
+            logger.error(f"Vector fetch failed: {e}")
+            return {}
+
+
+class AsyncVectorStore:
+    """
+    Awaitable facade over a synchronous vector store.
+
+    The backends are blocking, so each call is dispatched to a
+    dedicated thread pool to keep the event loop free while the network
+    round trip is in flight.
+    """
+
+    def __init__(self, store: BaseVectorStore, max_workers: int = None):
+        self.store = store
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or settings.vector_store_max_workers,
+            thread_name_prefix="vector-store"
+        )
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    async def upsert_vectors(
+        self,
+        vectors: List[List[float]],
+        texts: List[str],
+        metadata: List[Dict[str, Any]],
+        ids: Optional[List[str]] = None,
+        namespace: Optional[str] = None
+    ) -> List[str]:
+        return await self._run(self.store.upsert_vectors, vectors, texts, metadata, ids, namespace)
+
+    async def upsert_with_report(
+        self,
+        vectors: List[List[float]],
+        texts: List[str],
+        metadata: List[Dict[str, Any]],
+        ids: Optional[List[str]] = None,
+        namespace: Optional[str] = None
+    ) -> UpsertReport:
+        return await self._run(self.store.upsert_with_report, vectors, texts, metadata, ids, namespace)
+
+    async def query(
+        self,
+        query_vector: List[float],
+        top_k: int = 5,
+        filter_dict: Dict[str, Any] = None,
+        include_values: bool = False,
+        namespace: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        return await self._run(
+            self.store.query, query_vector, top_k=top_k, filter_dict=filter_dict,
+            include_values=include_values, namespace=namespace
+        )
+
+    async def fetch_vectors(self, ids: List[str], namespace: Optional[str] = None) -> Dict[str, Any]:
+        return await self._run(self.store.fetch_vectors, ids, namespace)
+
+    async def delete_vectors(self, ids: List[str], namespace: Optional[str] = None) -> int:
+        return await self._run(self.store.delete_vectors, ids, namespace)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.store.close()
+
+
+def create_vector_store() -> BaseVectorStore:
+    """Build the vector store backend selected by settings.vector_store_backend"""
+    backend = settings.vector_store_backend.lower()
+    if backend == "pinecone":
+        return VectorStore()
+    if backend == "local":
+        from app.core.local_vector_store import PartitionedLocalVectorStore
+        return PartitionedLocalVectorStore()
+    raise ValueError(f"Unknown vector store backend: {settings.vector_store_backend}")
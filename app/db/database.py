@@ -1,7 +1,12 @@
+from sqlalchemy import inspect, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateColumn
 from app.core.config import settings
 from app.db.models import Base
+import logging
+
+logger = logging.getLogger(__name__)
 
 engine = create_async_engine(settings.database_url, echo=True)
 
@@ -10,9 +15,32 @@ AsyncSessionLocal = sessionmaker(
 )
 
 
+def _add_missing_columns(connection):
+    """
+    Add model columns that existing tables lack, with their indexes.
+    create_all only creates missing tables, so columns added to a model
+    later need this; they must be nullable or have a server default.
+    """
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            definition = CreateColumn(column).compile(dialect=connection.dialect)
+            connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {definition}"))
+            for index in table.indexes:
+                if column.name in index.columns:
+                    index.create(connection, checkfirst=True)
+            logger.info(f"Added column {table.name}.{column.name}")
+
+
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
 
 
 async def get_db():
@@ -20,4 +48,4 @@ async def get_db():
         try:
             yield session
         finally:
-            await session.close()
\ No newline at end of file
+            await session.close()
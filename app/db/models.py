@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
+from app.core.collections import DEFAULT_COLLECTION
 
 Base = declarative_base()
 
@@ -13,9 +14,40 @@ class Document(Base):
     file_type = Column(String, nullable=False)
     chunking_strategy = Column(String, nullable=False)
     chunk_count = Column(Integer, nullable=False)
+    collection = Column(String, nullable=False, default=DEFAULT_COLLECTION, server_default=DEFAULT_COLLECTION, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
 
+class DocumentChunk(Base):
+    __tablename__ = "document_chunks"
+    
+    # Vector id of the chunk in the vector store
+    id = Column(String(36), primary_key=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False, index=True)
+    chunk_index = Column(Integer, nullable=False)
+    content_hash = Column(String(64), nullable=False)
+    
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+    
+    id = Column(String(36), primary_key=True)
+    filename = Column(String, nullable=False)
+    file_type = Column(String, nullable=False)
+    chunking_strategy = Column(String, nullable=False)
+    collection = Column(String, nullable=False, default=DEFAULT_COLLECTION, server_default=DEFAULT_COLLECTION)
+    file_path = Column(String, nullable=True)
+    status = Column(String, nullable=False, default="queued", index=True)
+    pages_extracted = Column(Integer, nullable=False, default=0)
+    chunks_embedded = Column(Integer, nullable=False, default=0)
+    vectors_upserted = Column(Integer, nullable=False, default=0)
+    document_id = Column(Integer, ForeignKey("documents.id"), nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    
+
 class InterviewBooking(Base):
     __tablename__ = "interview_bookings"
     
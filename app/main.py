@@ -1,10 +1,30 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
 from app.api import ingestion, chat
 from app.db.database import init_db
 from app.core.config import settings
+from app.core.metrics import REGISTRY, MetricsMiddleware
+from app.core.uploads import UploadLimitMiddleware
+from app.services.container import ServiceContainer
 
-app = FastAPI(title=settings.app_name)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await init_db()
+
+    services = ServiceContainer()
+    await services.startup()
+    app.state.services = services
+    try:
+        yield
+    finally:
+        await services.shutdown()
+
+
+app = FastAPI(title=settings.app_name, lifespan=lifespan)
+app.add_middleware(UploadLimitMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 # Include routers
 app.include_router(ingestion.router)
@@ -18,8 +38,26 @@ async def root():
         "version": settings.app_version,
         "endpoints": {
             "document_ingestion": "/api/ingest/upload",
+            "bulk_ingestion": "/api/ingest/bulk",
+            "ingestion_job": "/api/ingest/jobs/{job_id}",
             "chat_query": "/api/chat/query",
+            "chat_stream": "/api/chat/stream",
             "book_interview": "/api/chat/book-interview",
-            "chat_history": "/api/chat/history/{session_id}"
+            "chat_history": "/api/chat/history/{session_id}",
+            "metrics": "/metrics"
         }
     }
+
+
+@app.get("/stats")
+async def stats(request: Request):
+    return await request.app.state.services.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics(request: Request):
+    """Prometheus text exposition of request, stage and service metrics"""
+    return PlainTextResponse(
+        REGISTRY.render(await request.app.state.services.stats()),
+        media_type="text/plain; version=0.0.4"
+    )
@@ -0,0 +1,169 @@
+from typing import Dict, List, Optional, Tuple
+import json
+import redis
+import redis.asyncio as aioredis
+from redis.exceptions import ResponseError, WatchError
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+Message = Dict[str, str]
+
+
+def history_key(session_id: str) -> str:
+    return f"chat:{session_id}"
+
+
+def _is_wrong_type(error: ResponseError) -> bool:
+    # Errors raised by a pipeline carry a "Command # n (...) of pipeline
+    # caused error:" prefix
+    return "WRONGTYPE" in str(error)
+
+
+class ChatHistoryStore:
+    """
+    Chat history as a Redis list of JSON messages, one list per session.
+
+    A turn is appended with RPUSH + LTRIM + EXPIRE in a single MULTI
+    pipeline, so it costs one round trip and never rewrites earlier
+    messages. Sessions written by older versions as one JSON string are
+    converted to a list the first time they are touched; the
+    scripts.migrate_chat_history command converts all of them up front.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        async_redis_client: aioredis.Redis,
+        max_messages: Optional[int] = None,
+        ttl: Optional[int] = None
+    ):
+        self.redis_client = redis_client
+        self.async_redis_client = async_redis_client
+        self.max_messages = max_messages or settings.chat_history_max_messages
+        self.ttl = ttl or settings.chat_history_ttl
+
+    def _range(self, offset: int, limit: Optional[int]) -> Tuple[int, int]:
+        return offset, -1 if limit is None else offset + limit - 1
+
+    def get(self, session_id: str, offset: int = 0, limit: Optional[int] = None) -> List[Message]:
+        key = history_key(session_id)
+        try:
+            items = self.redis_client.lrange(key, *self._range(offset, limit))
+        except ResponseError as e:
+            if not _is_wrong_type(e):
+                raise
+            self.migrate(key)
+            items = self.redis_client.lrange(key, *self._range(offset, limit))
+        return [json.loads(item) for item in items]
+
+    def append(self, session_id: str, messages: List[Message]):
+        key = history_key(session_id)
+        try:
+            self._append(key, messages)
+        except ResponseError as e:
+            if not _is_wrong_type(e):
+                raise
+            self.migrate(key)
+            self._append(key, messages)
+
+    def _append(self, key: str, messages: List[Message]):
+        with self.redis_client.pipeline(transaction=True) as pipe:
+            pipe.rpush(key, *[json.dumps(message) for message in messages])
+            pipe.ltrim(key, -self.max_messages, -1)
+            pipe.expire(key, self.ttl)
+            pipe.execute()
+
+    def migrate(self, key: str) -> bool:
+        """Convert a JSON-string history to a list, keeping its expiry"""
+        with self.redis_client.pipeline(transaction=True) as pipe:
+            try:
+                pipe.watch(key)
+                if pipe.type(key) != "string":
+                    return False
+                messages = self._decode_legacy(key, pipe.get(key))
+                ttl_ms = pipe.pttl(key)
+                pipe.multi()
+                self._queue_migration(pipe, key, messages, ttl_ms)
+                pipe.execute()
+                return True
+            except WatchError:
+                # Changed while converting, most likely by a concurrent migration
+                return False
+
+    async def get_async(self, session_id: str, offset: int = 0, limit: Optional[int] = None) -> List[Message]:
+        key = history_key(session_id)
+        try:
+            items = await self.async_redis_client.lrange(key, *self._range(offset, limit))
+        except ResponseError as e:
+            if not _is_wrong_type(e):
+                raise
+            await self.migrate_async(key)
+            items = await self.async_redis_client.lrange(key, *self._range(offset, limit))
+        return [json.loads(item) for item in items]
+
+    async def page_async(self, session_id: str, offset: int, limit: int) -> Tuple[List[Message], int]:
+        """One page of messages, oldest first, and the total message count"""
+        key = history_key(session_id)
+        for attempt in range(2):
+            try:
+                async with self.async_redis_client.pipeline(transaction=False) as pipe:
+                    pipe.lrange(key, *self._range(offset, limit))
+                    pipe.llen(key)
+                    items, total = await pipe.execute()
+                return [json.loads(item) for item in items], total
+            except ResponseError as e:
+                if attempt or not _is_wrong_type(e):
+                    raise
+                await self.migrate_async(key)
+
+    async def append_async(self, session_id: str, messages: List[Message]):
+        key = history_key(session_id)
+        try:
+            await self._append_async(key, messages)
+        except ResponseError as e:
+            if not _is_wrong_type(e):
+                raise
+            await self.migrate_async(key)
+            await self._append_async(key, messages)
+
+    async def _append_async(self, key: str, messages: List[Message]):
+        async with self.async_redis_client.pipeline(transaction=True) as pipe:
+            pipe.rpush(key, *[json.dumps(message) for message in messages])
+            pipe.ltrim(key, -self.max_messages, -1)
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+    async def migrate_async(self, key: str) -> bool:
+        async with self.async_redis_client.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(key)
+                if await pipe.type(key) != "string":
+                    return False
+                messages = self._decode_legacy(key, await pipe.get(key))
+                ttl_ms = await pipe.pttl(key)
+                pipe.multi()
+                self._queue_migration(pipe, key, messages, ttl_ms)
+                await pipe.execute()
+                return True
+            except WatchError:
+                return False
+
+    def _decode_legacy(self, key: str, raw: Optional[str]) -> List[Message]:
+        try:
+            messages = json.loads(raw) if raw else []
+        except json.JSONDecodeError:
+            logger.warning(f"Dropping unreadable chat history {key}")
+            return []
+        return messages if isinstance(messages, list) else []
+
+    def _queue_migration(self, pipe, key: str, messages: List[Message], ttl_ms: int):
+        pipe.delete(key)
+        messages = messages[-self.max_messages:]
+        if messages:
+            pipe.rpush(key, *[json.dumps(message) for message in messages])
+            if ttl_ms and ttl_ms > 0:
+                pipe.pexpire(key, ttl_ms)
+            else:
+                pipe.expire(key, self.ttl)
@@ -1,107 +1,353 @@
-from typing import List, Dict, Any, Optional
-import json
+from typing import List, Dict, Any, AsyncIterator, FrozenSet, Iterator, Optional, Tuple
+import asyncio
+import time
+import numpy as np
 import redis
+import redis.asyncio as aioredis
 from app.core.config import settings
 from app.core.embeddings import EmbeddingService
-from app.core.vector_store import VectorStore
+from app.core.batching import EmbeddingBatcher
+from app.core.bm25_index import PartitionedBM25Index, reciprocal_rank_fusion
+from app.core.collections import RetrievalScope
+from app.core.diversity import candidate_matrix, select_diverse
+from app.core.intents import QUERY_MATCHER, TOPICS, enclosing_sentence
+from app.core.metrics import CHAT_REQUESTS, stage_timer
+from app.core.semantic_cache import IndexVersion, SemanticCache
+from app.core.vector_store import BaseVectorStore, AsyncVectorStore, create_vector_store
+from app.services.chat_history import ChatHistoryStore
 import re
 import logging
 
 logger = logging.getLogger(__name__)
 
+_RESPONSE_PIECE = re.compile(r"\S+\s*|\s+")
+
 class ChatService:
-    def __init__(self):
-        self.embedding_service = EmbeddingService()
-        self.vector_store = VectorStore()
-        self.redis_client = redis.Redis(
+    def __init__(
+        self,
+        embedding_service: Optional[EmbeddingService] = None,
+        vector_store: Optional[BaseVectorStore] = None,
+        embedding_batcher: Optional[EmbeddingBatcher] = None,
+        redis_client: Optional[redis.Redis] = None,
+        async_redis_client: Optional[aioredis.Redis] = None,
+        async_vector_store: Optional[AsyncVectorStore] = None,
+        lexical_index: Optional[PartitionedBM25Index] = None,
+        semantic_cache: Optional[SemanticCache] = None,
+        index_version: Optional[IndexVersion] = None
+    ):
+        self.embedding_service = embedding_service or EmbeddingService()
+        self.vector_store = vector_store if vector_store is not None else create_vector_store()
+        self.embedding_batcher = embedding_batcher
+        self.redis_client = redis_client or redis.Redis(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            db=settings.redis_db,
+            decode_responses=True
+        )
+        self.async_redis_client = async_redis_client or aioredis.Redis(
             host=settings.redis_host,
             port=settings.redis_port,
             db=settings.redis_db,
             decode_responses=True
         )
+        self.history = ChatHistoryStore(self.redis_client, self.async_redis_client)
+        self.async_vector_store = async_vector_store or AsyncVectorStore(self.vector_store)
+        self.lexical_index = lexical_index
+        self.semantic_cache = semantic_cache
+        self.index_version = index_version or IndexVersion(self.redis_client, self.async_redis_client)
     
     def get_chat_history(self, session_id: str) -> List[Dict[str, str]]:
         """Retrieve chat history from Redis"""
         try:
-            history_key = f"chat:{session_id}"
-            history_json = self.redis_client.get(history_key)
-            
-            if history_json:
-                return json.loads(history_json)
-            return []
+            with stage_timer("chat", "history_read"):
+                return self.history.get(session_id)
         except Exception as e:
             return []
     
-    def save_chat_history(self, session_id: str, history: List[Dict[str, str]]):
-        """Save chat history to Redis with 24-hour expiry"""
+    def add_turn_to_history(self, session_id: str, query: str, response: str):
+        """Append a user query and its answer in one round trip"""
         try:
-            history_key = f"chat:{session_id}"
-            self.redis_client.setex(
-                history_key, 
-                86400,  
-                json.dumps(history)
-            )
+            with stage_timer("chat", "history_write"):
+                self.history.append(session_id, [
+                    {"role": "user", "content": query},
+                    {"role": "assistant", "content": response}
+                ])
         except Exception as e:
             logger.error(f"Error saving chat history: {e}")
     
     def add_message_to_history(self, session_id: str, role: str, content: str):
         """Add a message to chat history"""
-        history = self.get_chat_history(session_id)
-        history.append({"role": role, "content": content})
-
-        if len(history) > 10:
-            history = history[-10:]
-        
-        self.save_chat_history(session_id, history)
+        try:
+            self.history.append(session_id, [{"role": role, "content": content}])
+        except Exception as e:
+            logger.error(f"Error saving chat history: {e}")
+    
+    async def get_chat_history_async(self, session_id: str) -> List[Dict[str, str]]:
+        """Retrieve chat history from Redis without blocking the event loop"""
+        try:
+            with stage_timer("chat", "history_read"):
+                return await self.history.get_async(session_id)
+        except Exception as e:
+            return []
+    
+    async def get_chat_history_page_async(
+        self, session_id: str, offset: int = 0, limit: int = 50
+    ) -> Tuple[List[Dict[str, str]], int]:
+        """A page of chat history, oldest first, and the total message count"""
+        return await self.history.page_async(session_id, offset, limit)
+    
+    async def add_turn_to_history_async(self, session_id: str, query: str, response: str):
+        """Append a user query and its answer in one round trip"""
+        try:
+            with stage_timer("chat", "history_write"):
+                await self.history.append_async(session_id, [
+                    {"role": "user", "content": query},
+                    {"role": "assistant", "content": response}
+                ])
+        except Exception as e:
+            logger.error(f"Error saving chat history: {e}")
+    
+    async def add_message_to_history_async(self, session_id: str, role: str, content: str):
+        """Add a message to chat history"""
+        try:
+            await self.history.append_async(session_id, [{"role": role, "content": content}])
+        except Exception as e:
+            logger.error(f"Error saving chat history: {e}")
+    
+    def detect_intents(self, query: str) -> FrozenSet[str]:
+        """Names of the intent and topic rules (app.core.intents) the query matches"""
+        return QUERY_MATCHER.match(query)
     
     def detect_booking_intent(self, query: str) -> bool:
         """Detect if user wants to book an interview"""
-        booking_keywords = [
-            'book', 'schedule', 'interview', 'appointment', 
-            'meeting', 'slot', 'time', 'date', 'reserve'
-        ]
-        query_lower = query.lower()
-        return any(keyword in query_lower for keyword in booking_keywords)
-    
-    def retrieve_context(self, query: str, top_k: int = 5) -> List[str]:
-        """Retrieve relevant context from vector store"""
+        return "booking" in self.detect_intents(query)
+    
+    def _diversity_options(
+        self, mmr_lambda: Optional[float], dedup_threshold: Optional[float]
+    ) -> Tuple[float, float]:
+        return (
+            settings.retrieval_mmr_lambda if mmr_lambda is None else mmr_lambda,
+            settings.retrieval_dedup_threshold if dedup_threshold is None else dedup_threshold
+        )
+    
+    def _candidate_count(self, top_k: int, diversify: bool = False) -> int:
+        count = top_k * settings.retrieval_fetch_factor if diversify else top_k
+        if self.lexical_index is None:
+            return count
+        return max(count, settings.hybrid_candidates)
+    
+    def _fuse(
+        self, dense_results: List[Dict[str, Any]], query: str, candidates: int, scope: RetrievalScope
+    ) -> List[Dict[str, Any]]:
+        """
+        Dense matches above the similarity threshold, fused with BM25
+        matches by reciprocal rank when the lexical index is enabled
+        """
+        relevant_results = [result for result in dense_results if result.get('score', 0) > 0.3]
+        if self.lexical_index is not None:
+            with stage_timer("chat", "lexical_query"):
+                lexical_results = self.lexical_index.search(
+                    query, top_k=candidates, namespace=scope.namespace, ids=scope.chunk_ids
+                )
+            if lexical_results:
+                relevant_results = reciprocal_rank_fusion(
+                    [relevant_results, lexical_results], k=settings.hybrid_rrf_k
+                )
+        
+        return [result for result in relevant_results[:candidates] if result.get('text')]
+    
+    @staticmethod
+    def _missing_vectors(candidates: List[Dict[str, Any]]) -> List[str]:
+        """Ids of candidates that came without a vector, i.e. lexical-only matches"""
+        return [result['id'] for result in candidates if result.get('values') is None]
+    
+    @staticmethod
+    def _attach_vectors(candidates: List[Dict[str, Any]], vectors: Dict[str, Any]):
+        for result in candidates:
+            if result.get('values') is None and result['id'] in vectors:
+                result['values'] = vectors[result['id']]
+    
+    def _select(
+        self,
+        candidates: List[Dict[str, Any]],
+        dimension: int,
+        top_k: int,
+        mmr_lambda: float,
+        dedup_threshold: float
+    ) -> List[str]:
+        """
+        Texts of the final context: near duplicates dropped and the rest
+        picked by MMR, with relevance the candidate score relative to the best
+        """
+        if len(candidates) <= 1 or (mmr_lambda >= 1.0 and dedup_threshold >= 1.0):
+            return [result['text'] for result in candidates[:top_k]]
+        
+        with stage_timer("chat", "diversify"):
+            vectors = candidate_matrix([result.get('values') for result in candidates], dimension)
+            scores = np.fromiter((result['score'] for result in candidates), dtype=np.float32, count=len(candidates))
+            relevance = scores / max(float(scores.max()), 1e-12)
+            chosen = select_diverse(vectors, relevance, top_k, mmr_lambda, dedup_threshold)
+        return [candidates[position]['text'] for position in chosen]
+    
+    def _cached_context(self, query_embedding, version, variant, started: float) -> Optional[List[str]]:
+        if self.semantic_cache is None or version is None:
+            return None
+        context = self.semantic_cache.get(query_embedding, version, variant)
+        if context is not None:
+            self.semantic_cache.record_latency(time.perf_counter() - started, hit=True)
+        return context
+    
+    def _cache_context(self, query_embedding, version, variant, context: List[str], dense_results, started: float):
+        if self.semantic_cache is None or version is None:
+            return
+        # Without dense matches (the query failed or found nothing) the
+        # context is lexical-only or empty; cached, it would keep being
+        # served after the vector store recovers
+        if dense_results:
+            self.semantic_cache.put(query_embedding, version, variant, context)
+        self.semantic_cache.record_latency(time.perf_counter() - started, hit=False)
+    
+    def retrieve_context(
+        self,
+        query: str,
+        top_k: int = 5,
+        mmr_lambda: Optional[float] = None,
+        dedup_threshold: Optional[float] = None,
+        scope: Optional[RetrievalScope] = None
+    ) -> List[str]:
+        """Retrieve relevant context from vector store, within scope (the default collection if None)"""
         try:
-            query_embedding = self.embedding_service.generate_embedding(query)            
-            results = self.vector_store.query(query_embedding, top_k=top_k)
-            relevant_results = [result for result in results if result.get('score', 0) > 0.3]
+            scope = scope or RetrievalScope()
+            mmr_lambda, dedup_threshold = self._diversity_options(mmr_lambda, dedup_threshold)
+            diversify = mmr_lambda < 1.0 or dedup_threshold < 1.0
+            variant = (top_k, mmr_lambda, dedup_threshold, scope.cache_key())
             
-            return [result['text'] for result in relevant_results if result.get('text')]
+            started = time.perf_counter()
+            with stage_timer("chat", "embed"):
+                query_embedding = self.embedding_service.generate_embedding(query)            
+            with stage_timer("chat", "cache_lookup"):
+                version = self.index_version.current() if self.semantic_cache is not None else None
+                context = self._cached_context(query_embedding, version, variant, started)
+            if context is not None:
+                return context
+            
+            candidate_count = self._candidate_count(top_k, diversify)
+            with stage_timer("chat", "vector_query"):
+                try:
+                    results = self.vector_store.query(
+                        query_embedding,
+                        top_k=candidate_count,
+                        filter_dict=scope.vector_filter(),
+                        include_values=diversify,
+                        namespace=scope.namespace
+                    )
+                except Exception as e:
+                    logger.warning(f"Dense retrieval failed, answering from lexical matches only: {e}")
+                    results = []
+            candidates = self._fuse(results, query, candidate_count, scope)
+            missing = self._missing_vectors(candidates) if diversify else []
+            if missing:
+                self._attach_vectors(candidates, self.vector_store.fetch_vectors(missing, scope.namespace))
+            context = self._select(candidates, len(query_embedding), top_k, mmr_lambda, dedup_threshold)
+            self._cache_context(query_embedding, version, variant, context, results, started)
+            return context
+            
+        except Exception as e:
+            return []
+    
+    async def retrieve_context_async(
+        self,
+        query: str,
+        top_k: int = 5,
+        mmr_lambda: Optional[float] = None,
+        dedup_threshold: Optional[float] = None,
+        scope: Optional[RetrievalScope] = None
+    ) -> List[str]:
+        """
+        Retrieve relevant context with encoding and vector search off the
+        event loop, searching only the partition of the scope's collection.
+        A semantically equivalent earlier query, answered under the current
+        index version with the same options and scope, is served from the
+        semantic cache.
+        """
+        try:
+            scope = scope or RetrievalScope()
+            mmr_lambda, dedup_threshold = self._diversity_options(mmr_lambda, dedup_threshold)
+            diversify = mmr_lambda < 1.0 or dedup_threshold < 1.0
+            variant = (top_k, mmr_lambda, dedup_threshold, scope.cache_key())
+            
+            started = time.perf_counter()
+            with stage_timer("chat", "embed"):
+                if self.embedding_batcher is not None:
+                    query_embedding = await self.embedding_batcher.embed(query)
+                else:
+                    query_embedding = await self.embedding_service.generate_embedding_async(query)
+            with stage_timer("chat", "cache_lookup"):
+                version = await self.index_version.current_async() if self.semantic_cache is not None else None
+                context = self._cached_context(query_embedding, version, variant, started)
+            if context is not None:
+                return context
+            
+            candidate_count = self._candidate_count(top_k, diversify)
+            with stage_timer("chat", "vector_query"):
+                try:
+                    results = await self.async_vector_store.query(
+                        query_embedding,
+                        top_k=candidate_count,
+                        filter_dict=scope.vector_filter(),
+                        include_values=diversify,
+                        namespace=scope.namespace
+                    )
+                except Exception as e:
+                    logger.warning(f"Dense retrieval failed, answering from lexical matches only: {e}")
+                    results = []
+            candidates = self._fuse(results, query, candidate_count, scope)
+            missing = self._missing_vectors(candidates) if diversify else []
+            if missing:
+                self._attach_vectors(
+                    candidates, await self.async_vector_store.fetch_vectors(missing, scope.namespace)
+                )
+            context = self._select(candidates, len(query_embedding), top_k, mmr_lambda, dedup_threshold)
+            self._cache_context(query_embedding, version, variant, context, results, started)
+            return context
             
         except Exception as e:
             return []
     
-    def generate_response(self, query: str, context: List[str], chat_history: List[Dict[str, str]]) -> str:
-        """Generate response using rule-based system with RAG"""
-        query_lower = query.lower()
+    def generate_response(
+        self,
+        query: str,
+        context: List[str],
+        chat_history: List[Dict[str, str]],
+        intents: Optional[FrozenSet[str]] = None
+    ) -> str:
+        """
+        Generate response using rule-based system with RAG. `intents` are
+        those of detect_intents(query), when the caller already has them.
+        """
+        if intents is None:
+            intents = self.detect_intents(query)
         
-        if any(word in query_lower for word in ['hello', 'hi', 'hey', 'greetings']):
+        if "greeting" in intents:
             return "Hello! I'm your AI assistant. I can help answer questions based on your uploaded documents or help you book an interview."
         
-        if self.detect_booking_intent(query):
+        if "booking" in intents:
             return "I can help you book an interview! Please provide your name, email, preferred date (YYYY-MM-DD), and time (HH:MM)."
         
-        if any(word in query_lower for word in ['thank', 'thanks']):
+        if "thanks" in intents:
             return "You're welcome! Is there anything else I can help you with?"
         
         if context:
             combined_context = "\n\n".join(context)
 
-            if "artificial intelligence" in query_lower or "ai" in query_lower:
-                ai_sentences = [sentence for sentence in combined_context.split('.') 
-                               if 'artificial intelligence' in sentence.lower() or 'ai' in sentence.lower()]
-                if ai_sentences:
-                    return f"Based on your documents: {ai_sentences[0].strip()}."
-            
-            if "machine learning" in query_lower or "ml" in query_lower:
-                ml_sentences = [sentence for sentence in combined_context.split('.') 
-                               if 'machine learning' in sentence.lower() or 'ml' in sentence.lower()]
-                if ml_sentences:
-                    return f"Based on your documents: {ml_sentences[0].strip()}."
+            # The sentence around the first mention of the topic, found
+            # without splitting the whole context
+            topics = [topic for topic in TOPICS if topic in intents]
+            lowered = combined_context.lower() if topics else None
+            for topic in topics:
+                position = QUERY_MATCHER.find(topic, combined_context, lowered)
+                if position != -1:
+                    return f"Based on your documents: {enclosing_sentence(combined_context, position)}."
             
             if len(combined_context) > 200:
                 combined_context = combined_context[:197] + "..."
@@ -111,22 +357,66 @@ class ChatService:
 
         return "I don't have enough relevant information in my knowledge base to answer that specific question. You might want to upload documents related to this topic, or try asking about artificial intelligence, machine learning, or other topics you've uploaded."
     
-    def chat(self, session_id: str, query: str) -> Dict[str, Any]:
+    def chat(
+        self,
+        session_id: str,
+        query: str,
+        top_k: int = 5,
+        mmr_lambda: Optional[float] = None,
+        dedup_threshold: Optional[float] = None,
+        scope: Optional[RetrievalScope] = None
+    ) -> Dict[str, Any]:
         """Main chat function with RAG"""
         try:
             chat_history = self.get_chat_history(session_id)
-            context = self.retrieve_context(query)
-            response = self.generate_response(query, context, chat_history)
+            context = self.retrieve_context(query, top_k, mmr_lambda, dedup_threshold, scope)
+            with stage_timer("chat", "generate"):
+                intents = self.detect_intents(query)
+                response = self.generate_response(query, context, chat_history, intents)
             
-            self.add_message_to_history(session_id, "user", query)
-            self.add_message_to_history(session_id, "assistant", response)
+            self.add_turn_to_history(session_id, query, response)
+            CHAT_REQUESTS.inc(mode="sync")
             
-            booking_detected = self.detect_booking_intent(query)
+            return {
+                "response": response,
+                "context_used": context[:3],  
+                "booking_detected": "booking" in intents,
+                "booking_info": None
+            }
+        
+        except Exception as e:
+            logger.error(f"Chat error: {e}", exc_info=True)
+            return {
+                "response": "Sorry, I encountered an error while processing your request. Please try again.",
+                "context_used": [],
+                "booking_detected": False,
+                "booking_info": None
+            }
+    
+    async def chat_async(
+        self,
+        session_id: str,
+        query: str,
+        top_k: int = 5,
+        mmr_lambda: Optional[float] = None,
+        dedup_threshold: Optional[float] = None,
+        scope: Optional[RetrievalScope] = None
+    ) -> Dict[str, Any]:
+        """Main chat function with RAG, safe to await from request handlers"""
+        try:
+            chat_history = await self.get_chat_history_async(session_id)
+            context = await self.retrieve_context_async(query, top_k, mmr_lambda, dedup_threshold, scope)
+            with stage_timer("chat", "generate"):
+                intents = self.detect_intents(query)
+                response = self.generate_response(query, context, chat_history, intents)
+            
+            await self.add_turn_to_history_async(session_id, query, response)
+            CHAT_REQUESTS.inc(mode="async")
             
             return {
                 "response": response,
                 "context_used": context[:3],  
-                "booking_detected": booking_detected,
+                "booking_detected": "booking" in intents,
                 "booking_info": None
             }
         
@@ -137,4 +427,62 @@ class ChatService:
                 "context_used": [],
                 "booking_detected": False,
                 "booking_info": None
-            }
\ No newline at end of file
+            }
+    
+    @staticmethod
+    def iter_response_pieces(response: str, words_per_piece: int = 4) -> Iterator[str]:
+        """Split a response into increments of a few words, whitespace kept"""
+        words = _RESPONSE_PIECE.findall(response)
+        for start in range(0, len(words), words_per_piece):
+            yield "".join(words[start:start + words_per_piece])
+    
+    async def chat_stream(
+        self,
+        session_id: str,
+        query: str,
+        top_k: int = 5,
+        mmr_lambda: Optional[float] = None,
+        dedup_threshold: Optional[float] = None,
+        scope: Optional[RetrievalScope] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Chat turn as a sequence of events: "context" as soon as retrieval
+        finishes, one "delta" per increment of the response, then "done".
+        
+        History is read alongside retrieval. The turn is written to history
+        only after "done" has been handed out, so a consumer that stops
+        early, because its client disconnected, records nothing.
+        """
+        history_task = asyncio.ensure_future(self.get_chat_history_async(session_id))
+        try:
+            context = await self.retrieve_context_async(query, top_k, mmr_lambda, dedup_threshold, scope)
+            chat_history = await history_task
+        finally:
+            if not history_task.done():
+                history_task.cancel()
+        
+        intents = self.detect_intents(query)
+        yield {
+            "event": "context",
+            "data": {
+                "context_used": context[:3],
+                "context_count": len(context),
+                "booking_detected": "booking" in intents
+            }
+        }
+        
+        try:
+            with stage_timer("chat", "generate"):
+                response = self.generate_response(query, context, chat_history, intents)
+        except Exception as e:
+            logger.error(f"Chat error: {e}", exc_info=True)
+            yield {"event": "error", "data": {"detail": "Sorry, I encountered an error while processing your request. Please try again."}}
+            return
+        
+        for piece in self.iter_response_pieces(response):
+            yield {"event": "delta", "data": {"text": piece}}
+        yield {"event": "done", "data": {"response": response}}
+        CHAT_REQUESTS.inc(mode="stream")
+        
+        # Shielded so a disconnect right after "done" cannot cut the write short
+        await asyncio.shield(self.add_turn_to_history_async(session_id, query, response))
@@ -0,0 +1,159 @@
+from typing import Dict, Any
+import asyncio
+import redis
+import redis.asyncio as aioredis
+from app.core.config import settings, usable_cpus
+from app.core.embeddings import EmbeddingService
+from app.core.batching import EmbeddingBatcher
+from app.core.bm25_index import PartitionedBM25Index, default_index_path
+from app.core.pdf_extraction import create_pdf_executor
+from app.core.semantic_cache import IndexVersion, SemanticCache
+from app.services.document_service import DocumentLocks, DocumentService
+from app.services.job_service import IngestionJobManager
+from app.core.vector_store import AsyncVectorStore, create_vector_store
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceContainer:
+    """
+    Process-wide holder for the expensive shared clients.
+
+    Created once by the application lifespan so that the embedding model,
+    the vector index handle and the Redis connection pool are reused by
+    every request instead of being rebuilt per call.
+    """
+
+    def __init__(self):
+        self.embedding_service = None
+        self.embedding_batcher = None
+        self.vector_store = None
+        self.async_vector_store = None
+        self.redis_client = None
+        self.async_redis_client = None
+        self.pdf_executor = None
+        self.lexical_index = None
+        self.semantic_cache = None
+        self.index_version = None
+        self.document_locks = DocumentLocks()
+        self.job_manager = None
+
+    async def startup(self):
+        """Load the model, connect to the index and open the Redis pools"""
+        self.embedding_service = EmbeddingService()
+        self.embedding_service.warmup()
+        self.embedding_batcher = EmbeddingBatcher(self.embedding_service)
+        await self.embedding_batcher.start()
+
+        self.vector_store = create_vector_store()
+        self.async_vector_store = AsyncVectorStore(self.vector_store)
+        if settings.hybrid_search_enabled:
+            self.lexical_index = await asyncio.to_thread(PartitionedBM25Index, default_index_path())
+
+        # On a single CPU the pool only adds its overhead to every large PDF
+        if settings.pdf_extraction_workers > 1 and usable_cpus() > 1:
+            self.pdf_executor = create_pdf_executor(settings.pdf_extraction_workers)
+        elif settings.pdf_extraction_workers > 1:
+            logger.info("One usable CPU: PDF pages are extracted serially")
+
+        self.redis_client = redis.Redis(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            db=settings.redis_db,
+            decode_responses=True
+        )
+        self.async_redis_client = aioredis.Redis(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            db=settings.redis_db,
+            decode_responses=True
+        )
+        self.index_version = IndexVersion(self.redis_client, self.async_redis_client)
+        if settings.semantic_cache_enabled:
+            self.semantic_cache = SemanticCache(
+                dimension=settings.embedding_dimension,
+                threshold=settings.semantic_cache_threshold,
+                ttl=settings.semantic_cache_ttl,
+                max_entries=settings.semantic_cache_max_entries
+            )
+
+        self.job_manager = IngestionJobManager(self.document_service)
+        await self.job_manager.start()
+        logger.info("Service container started")
+
+    async def shutdown(self):
+        """Release shared clients"""
+        if self.job_manager is not None:
+            await self.job_manager.stop()
+
+        if self.embedding_batcher is not None:
+            await self.embedding_batcher.stop()
+
+        if self.async_redis_client is not None:
+            try:
+                await self.async_redis_client.aclose()
+            except Exception as e:
+                logger.error(f"Failed to close async Redis client: {e}")
+
+        if self.redis_client is not None:
+            try:
+                self.redis_client.close()
+                self.redis_client.connection_pool.disconnect()
+            except Exception as e:
+                logger.error(f"Failed to close Redis client: {e}")
+
+        if self.lexical_index is not None:
+            self.lexical_index.close()
+
+        if self.async_vector_store is not None:
+            self.async_vector_store.close()
+
+        if self.embedding_service is not None:
+            self.embedding_service.close()
+
+        if self.pdf_executor is not None:
+            self.pdf_executor.shutdown(wait=False, cancel_futures=True)
+
+        self.job_manager = None
+        self.semantic_cache = None
+        self.index_version = None
+        self.async_redis_client = None
+        self.redis_client = None
+        self.async_vector_store = None
+        self.pdf_executor = None
+        self.lexical_index = None
+        self.vector_store = None
+        self.embedding_batcher = None
+        self.embedding_service = None
+        logger.info("Service container stopped")
+
+    def document_service(self) -> DocumentService:
+        """DocumentService bound to the shared model, store and PDF pool"""
+        return DocumentService(
+            embedding_service=self.embedding_service,
+            vector_store=self.vector_store,
+            async_vector_store=self.async_vector_store,
+            pdf_executor=self.pdf_executor,
+            lexical_index=self.lexical_index,
+            index_version=self.index_version,
+            document_locks=self.document_locks
+        )
+
+    async def stats(self) -> Dict[str, Any]:
+        """Runtime figures of the shared services"""
+        stats = {}
+        if self.embedding_batcher is not None:
+            stats["embedding_batcher"] = self.embedding_batcher.stats()
+        if self.embedding_service is not None and self.embedding_service.cache is not None:
+            stats["embedding_cache"] = self.embedding_service.cache.stats()
+        if self.embedding_service is not None:
+            # A blocking round trip to the embedding server, kept off the event loop
+            server_stats = await asyncio.to_thread(self.embedding_service.stats)
+            if server_stats is not None:
+                stats["embedding_server"] = server_stats
+        if self.semantic_cache is not None:
+            stats["semantic_cache"] = self.semantic_cache.stats()
+        if self.job_manager is not None:
+            stats["ingestion_jobs"] = self.job_manager.stats()
+        return stats
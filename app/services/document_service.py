@@ -1,101 +1,396 @@
-from typing import List
+from typing import AsyncIterator, Dict, Iterable, Iterator, Optional, Set, Tuple, Union
+from concurrent.futures import Executor
+from contextlib import asynccontextmanager
+import asyncio
+import codecs
+import os
+import tempfile
+import time
 import PyPDF2
 from io import BytesIO
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.chunking import TextChunker, ChunkingStrategy
+from app.core.config import settings
 from app.core.embeddings import EmbeddingService
-from app.core.vector_store import VectorStore
-from app.db.models import Document
+from app.core.bm25_index import PartitionedBM25Index
+from app.core.collections import DEFAULT_COLLECTION, collection_namespace, normalize_collection
+from app.core.metrics import DOCUMENTS, INGESTED_BYTES, STAGE_SECONDS, stage_timer
+from app.core.semantic_cache import IndexVersion
+from app.core.pdf_extraction import iter_pages_parallel, open_pdf
+from app.core.vector_store import BaseVectorStore, AsyncVectorStore, create_vector_store
+from app.db.models import Document, DocumentChunk
+from app.services.ingestion_pipeline import IngestionPipeline, PipelineResult, ProgressCallback
 import logging
 
 logger = logging.getLogger(__name__)
 
-class DocumentService:
+# Raw file bytes, or the path of a file on disk
+DocumentSource = Union[bytes, str]
+
+
+class DocumentLocks:
+    """
+    One lock per (collection, filename), so that ingests of the same
+    document run one after the other. Each one then sees the rows and
+    chunk ids committed by the one before. Locks are dropped when no
+    ingest holds or waits for them.
+    """
+
     def __init__(self):
-        self.embedding_service = EmbeddingService()
-        self.vector_store = VectorStore()
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+        self._holders: Dict[Tuple[str, str], int] = {}
+
+    @asynccontextmanager
+    async def hold(self, filename: str, collection: Optional[str] = None) -> AsyncIterator[None]:
+        key = (normalize_collection(collection), filename)
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._holders[key] = self._holders.get(key, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._holders[key] -= 1
+            if not self._holders[key]:
+                del self._holders[key]
+                del self._locks[key]
+
+
+class DocumentService:
+    def __init__(
+        self,
+        embedding_service: Optional[EmbeddingService] = None,
+        vector_store: Optional[BaseVectorStore] = None,
+        async_vector_store: Optional[AsyncVectorStore] = None,
+        pdf_executor: Optional[Executor] = None,
+        lexical_index: Optional[PartitionedBM25Index] = None,
+        index_version: Optional[IndexVersion] = None,
+        document_locks: Optional[DocumentLocks] = None
+    ):
+        self.embedding_service = embedding_service or EmbeddingService()
+        self.vector_store = vector_store if vector_store is not None else create_vector_store()
+        self.async_vector_store = async_vector_store or AsyncVectorStore(self.vector_store)
+        self.pdf_executor = pdf_executor
+        self.lexical_index = lexical_index
+        self.index_version = index_version
+        self.document_locks = document_locks or DocumentLocks()
         self.chunker = TextChunker()
+        self.pipeline = IngestionPipeline(
+            self.embedding_service, self.async_vector_store, lexical_index=lexical_index
+        )
     
-    def extract_text_from_pdf(self, file_content: bytes) -> str:
-        """Extract text from PDF file"""
+    def iter_pdf_pages(self, source: DocumentSource) -> Iterator[str]:
+        """Yield the text of each PDF page (newline-terminated) as it is extracted"""
         try:
-            pdf_file = BytesIO(file_content)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            
-            text = ""
-            for page in pdf_reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-            
-            logger.info(f"Extracted {len(text)} characters from PDF")
-            return text.strip()
+            if isinstance(source, (bytes, bytearray)):
+                pdf_reader = PyPDF2.PdfReader(BytesIO(source))
+                page_count = len(pdf_reader.pages)
+                if self._extract_in_parallel(page_count):
+                    page_texts = self._iter_pdf_bytes_parallel(source, page_count)
+                else:
+                    page_texts = (page.extract_text() for page in pdf_reader.pages)
+                yield from self._terminate_pages(page_texts)
+            else:
+                with open_pdf(source) as pdf_reader:
+                    page_count = len(pdf_reader.pages)
+                    if self._extract_in_parallel(page_count):
+                        page_texts = iter_pages_parallel(
+                            self.pdf_executor, source, page_count, settings.pdf_extraction_workers
+                        )
+                    else:
+                        page_texts = (page.extract_text() for page in pdf_reader.pages)
+                    yield from self._terminate_pages(page_texts)
         except Exception as e:
             logger.error(f"PDF extraction failed: {e}")
             raise ValueError(f"Failed to extract text from PDF: {e}")
     
-    def extract_text_from_txt(self, file_content: bytes) -> str:
-        """Extract text from TXT file"""
+    @staticmethod
+    def _terminate_pages(page_texts: Iterable[str]) -> Iterator[str]:
+        for page_text in page_texts:
+            if page_text:
+                yield page_text + "\n"
+    
+    def _extract_in_parallel(self, page_count: int) -> bool:
+        return self.pdf_executor is not None and page_count >= settings.pdf_parallel_min_pages
+    
+    def _iter_pdf_bytes_parallel(self, file_content: bytes, page_count: int) -> Iterator[str]:
+        """Extract page ranges on the process pool from a temp copy of the PDF"""
+        fd, path = tempfile.mkstemp(suffix=".pdf", dir=settings.upload_spool_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(file_content)
+            yield from iter_pages_parallel(
+                self.pdf_executor, path, page_count, settings.pdf_extraction_workers
+            )
+        finally:
+            os.remove(path)
+    
+    def iter_txt_pieces(self, source: DocumentSource, piece_size: int = 64 * 1024) -> Iterator[str]:
+        """Yield decoded TXT content in pieces of about piece_size bytes"""
         try:
-            text = file_content.decode('utf-8').strip()
-            logger.info(f"Extracted {len(text)} characters from TXT")
-            return text
+            if isinstance(source, (bytes, bytearray)):
+                decoder = codecs.getincrementaldecoder('utf-8')()
+                for start in range(0, len(source), piece_size):
+                    piece = decoder.decode(source[start:start + piece_size])
+                    if piece:
+                        yield piece
+                tail = decoder.decode(b"", final=True)
+                if tail:
+                    yield tail
+            else:
+                with open(source, encoding='utf-8', newline='') as f:
+                    while True:
+                        piece = f.read(piece_size)
+                        if not piece:
+                            break
+                        yield piece
         except Exception as e:
             logger.error(f"TXT extraction failed: {e}")
             raise ValueError(f"Failed to extract text from TXT: {e}")
     
+    @staticmethod
+    def _lstrip_stream(pieces: Iterable[str]) -> Iterator[str]:
+        """Drop leading whitespace of a piece stream, like str.strip() did on whole text"""
+        pieces = iter(pieces)
+        for piece in pieces:
+            piece = piece.lstrip()
+            if piece:
+                yield piece
+                break
+        yield from pieces
+    
+    def iter_text(self, file_type: str, source: DocumentSource) -> Iterator[str]:
+        """Stream extracted text pieces for a supported file type"""
+        if file_type == 'pdf':
+            return self._lstrip_stream(self.iter_pdf_pages(source))
+        elif file_type == 'txt':
+            return self._lstrip_stream(self.iter_txt_pieces(source))
+        raise ValueError(f"Unsupported file type: {file_type}")
+    
+    def extract_text_from_pdf(self, file_content: bytes) -> str:
+        """Extract text from PDF file"""
+        text = "".join(self.iter_pdf_pages(file_content))
+        logger.info(f"Extracted {len(text)} characters from PDF")
+        return text.strip()
+    
+    def extract_text_from_txt(self, file_content: bytes) -> str:
+        """Extract text from TXT file"""
+        text = "".join(self.iter_txt_pieces(file_content)).strip()
+        logger.info(f"Extracted {len(text)} characters from TXT")
+        return text
+    
     async def process_document(
         self, 
         filename: str, 
         file_content: bytes, 
-        chunking_strategy: ChunkingStrategy
+        chunking_strategy: ChunkingStrategy,
+        db: Optional[AsyncSession] = None,
+        collection: Optional[str] = None
     ) -> Document:
         """
         Process document: extract text, chunk, embed, and store
         """
+        return await self._process(filename, file_content, chunking_strategy, db, collection=collection)
+    
+    async def process_file(
+        self,
+        filename: str,
+        file_path: str,
+        chunking_strategy: ChunkingStrategy,
+        db: Optional[AsyncSession] = None,
+        on_progress: Optional[ProgressCallback] = None,
+        collection: Optional[str] = None
+    ) -> Document:
+        """
+        Process a document stored on disk, streaming it instead of loading it
+        """
+        return await self._process(filename, file_path, chunking_strategy, db, on_progress, collection)
+    
+    def document_lock(self, filename: str, collection: Optional[str] = None):
+        """
+        Exclusive hold on a document for one ingest. Callers that pass a
+        session keep it until they have committed, so the next ingest of
+        the same document starts from this one's rows.
+        """
+        return self.document_locks.hold(filename, collection)
+    
+    async def _load_previous(
+        self, db: AsyncSession, filename: str, collection: str
+    ) -> Tuple[Optional[Document], Set[str]]:
+        """Latest document stored under filename in the collection and the vector ids of its chunks"""
+        result = await db.execute(
+            select(Document)
+            .where(Document.filename == filename, Document.collection == collection)
+            .order_by(Document.id.desc())
+            .limit(1)
+        )
+        previous = result.scalars().first()
+        if previous is None:
+            return None, set()
+        
+        result = await db.execute(
+            select(DocumentChunk.id).where(DocumentChunk.document_id == previous.id)
+        )
+        return previous, set(result.scalars().all())
+    
+    async def _record_chunks(
+        self,
+        db: AsyncSession,
+        document: Document,
+        result: PipelineResult,
+        known_ids: Set[str]
+    ):
+        """Replace the document's chunk rows with those of the latest ingest"""
+        # Chunks whose upsert failed are left out so the next ingest retries them
+        stored = set(result.vector_ids)
+        db.add(document)
+        await db.flush()
+        await db.execute(delete(DocumentChunk).where(DocumentChunk.document_id == document.id))
+        rows = [
+            {
+                'id': vector_id,
+                'document_id': document.id,
+                'chunk_index': chunk_index,
+                'content_hash': chunk_hash
+            }
+            for vector_id, chunk_index, chunk_hash in result.chunks
+            if vector_id in stored or vector_id in known_ids
+        ]
+        for start in range(0, len(rows), 1000):
+            await db.execute(insert(DocumentChunk), rows[start:start + 1000])
+    
+    async def _reusable_ids(self, known_ids: Set[str], namespace: Optional[str]) -> Set[str]:
+        """
+        Known chunk ids whose vectors are still stored. The database rows
+        can outlive the vectors (a local store without a path, or one whose
+        files were lost), so where the lookup is in-process they are
+        checked rather than trusted.
+        """
+        if not known_ids or not self.vector_store.local_fetch:
+            return known_ids
+        stored = await self.async_vector_store.fetch_vectors(list(known_ids), namespace)
+        if len(stored) < len(known_ids):
+            logger.info(
+                f"{len(known_ids) - len(stored)} recorded chunks are no longer in the vector store "
+                f"and will be embedded again"
+            )
+        return known_ids.intersection(stored)
+    
+    @staticmethod
+    def _document_key(filename: str, collection: str) -> str:
+        # Documents of the default collection keep the keys, and so the chunk
+        # ids, they had before collections existed
+        return filename if collection == DEFAULT_COLLECTION else f"{collection}/{filename}"
+    
+    @staticmethod
+    def _source_size(source: DocumentSource) -> int:
+        if isinstance(source, (bytes, bytearray)):
+            return len(source)
         try:
+            return os.path.getsize(source)
+        except OSError:
+            return 0
+    
+    async def _process(
+        self,
+        filename: str,
+        source: DocumentSource,
+        chunking_strategy: ChunkingStrategy,
+        db: Optional[AsyncSession] = None,
+        on_progress: Optional[ProgressCallback] = None,
+        collection: Optional[str] = None
+    ) -> Document:
+        """
+        Ingest a document into a collection (the default one if None),
+        reusing the chunks stored by an earlier ingest of the same filename
+        in that collection.
+        
+        Chunk ids are derived from the filename and chunk content, so only
+        new or edited chunks are embedded and upserted, and chunks that no
+        longer occur are deleted from the vector store afterwards. With a
+        session, the document row is updated in place and its chunk rows
+        replaced; the caller commits, under document_lock when other
+        ingests of the same filename may run concurrently. The index version is bumped once the
+        vectors are written, even partially, so cached retrievals from
+        before the ingest are no longer served.
+        """
+        started = time.perf_counter()
+        try:
+            collection = normalize_collection(collection)
+            namespace = collection_namespace(collection)
             file_type = filename.split('.')[-1].lower()
             
-            logger.info(f"Processing {file_type} file: {filename}")
+            logger.info(f"Processing {file_type} file: {filename} into collection {collection}")
             
-            if file_type == 'pdf':
-                text = self.extract_text_from_pdf(file_content)
-            elif file_type == 'txt':
-                text = self.extract_text_from_txt(file_content)
-            else:
-                raise ValueError(f"Unsupported file type: {file_type}")
+            previous, known_ids = (None, set())
+            if db is not None:
+                previous, known_ids = await self._load_previous(db, filename, collection)
+            reusable_ids = await self._reusable_ids(known_ids, namespace)
+            
+            pieces = self.iter_text(file_type, source)
             
-            if not text:
+            base_metadata = {
+                'filename': filename,
+                'file_type': file_type,
+                'chunking_strategy': chunking_strategy.value
+            }
+            
+            result = await self.pipeline.run(
+                pieces,
+                chunking_strategy,
+                base_metadata,
+                document_key=self._document_key(filename, collection),
+                known_ids=reusable_ids,
+                on_progress=on_progress,
+                namespace=namespace
+            )
+            
+            if not result.characters:
                 raise ValueError("No text extracted from document")
-
-
-            chunks = self.chunker.chunk_text(text, chunking_strategy)
             
-            if not chunks:
+            if not result.chunk_count:
                 raise ValueError("No chunks created from text")
             
-            embeddings = self.embedding_service.generate_embeddings(chunks)
- 
-            metadata = [
-                {
-                    'filename': filename,
-                    'file_type': file_type,
-                    'chunking_strategy': chunking_strategy.value,
-                    'chunk_index': i
-                }
-                for i in range(len(chunks))
-            ]
+            removed = known_ids.difference(vector_id for vector_id, _, _ in result.chunks)
+            if removed:
+                with stage_timer("ingest", "delete"):
+                    await self.async_vector_store.delete_vectors(list(removed), namespace)
+                    if self.lexical_index is not None:
+                        await asyncio.to_thread(self.lexical_index.remove, removed, namespace)
             
-            self.vector_store.upsert_vectors(embeddings, chunks, metadata)
+            if result.failed_ids:
+                logger.error(
+                    f"{len(result.failed_ids)} chunks of {filename} could not be upserted; "
+                    f"they will be retried on the next ingest"
+                )
             
-            document = Document(
-                filename=filename,
-                file_type=file_type,
-                chunking_strategy=chunking_strategy.value,
-                chunk_count=len(chunks)
+            logger.info(
+                f"Ingested {filename}: {result.characters} characters, "
+                f"{result.chunk_count} chunks, {len(result.vector_ids)} vectors upserted, "
+                f"{result.chunks_reused} reused, {len(removed)} deleted"
             )
             
+            document = previous or Document(filename=filename, collection=collection)
+            document.file_type = file_type
+            document.chunking_strategy = chunking_strategy.value
+            document.chunk_count = result.chunk_count
+            
+            if db is not None:
+                with stage_timer("ingest", "record_chunks"):
+                    await self._record_chunks(db, document, result, reusable_ids)
+            
+            INGESTED_BYTES.inc(self._source_size(source), file_type=file_type)
+            DOCUMENTS.inc(status="completed")
+            STAGE_SECONDS.observe(time.perf_counter() - started, operation="ingest", stage="total")
             return document
             
         except Exception as e:
+            DOCUMENTS.inc(status="failed")
             logger.error(f"Document processing failed: {e}")
-            raise
\ No newline at end of file
+            raise
+        
+        finally:
+            if self.index_version is not None:
+                await self.index_version.bump_async()
@@ -0,0 +1,261 @@
+from typing import List, Dict, Any, Iterable, Optional, Callable, Awaitable, AbstractSet, Tuple
+import asyncio
+import hashlib
+import threading
+import time
+import uuid
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from app.core.bm25_index import PartitionedBM25Index
+from app.core.chunking import TextChunker, ChunkingStrategy
+from app.core.config import settings
+from app.core.embeddings import EmbeddingService
+from app.core.metrics import CHUNKS, STAGE_SECONDS, VECTORS_UPSERTED, VECTOR_UPSERT_FAILURES, stage_timer
+from app.core.vector_store import AsyncVectorStore
+import logging
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+CHUNK_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "rag-system/chunks")
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_vector_id(document_key: str, chunk_hash: str, occurrence: int) -> str:
+    """
+    Deterministic vector id of a chunk. `occurrence` counts earlier chunks
+    of the same document with identical content, keeping repeats distinct.
+    """
+    return str(uuid.uuid5(CHUNK_ID_NAMESPACE, f"{document_key}\x00{chunk_hash}\x00{occurrence}"))
+
+
+class PipelineResult:
+    """Counters of a pipeline run, updated live as the stages progress"""
+
+    def __init__(self):
+        self.pages = 0
+        self.characters = 0
+        self.chunk_count = 0
+        self.chunks_reused = 0
+        self.vector_ids: List[str] = []
+        # vector id -> error of chunks that could not be upserted
+        self.failed_ids: Dict[str, str] = {}
+        # (vector id, chunk index, content hash) of every chunk, in order
+        self.chunks: List[Tuple[str, int, str]] = []
+
+    @property
+    def vectors_upserted(self) -> int:
+        return len(self.vector_ids)
+
+
+ProgressCallback = Callable[[PipelineResult], Awaitable[None]]
+
+
+class IngestionPipeline:
+    """
+    Overlapping extract -> chunk -> embed -> upsert stages.
+
+    Extraction and chunking run together in a worker thread and hand
+    fixed-size chunk batches to the embedding stage; embedded batches are
+    upserted by a third stage, up to `upsert_concurrency` at a time, while
+    the next batch encodes. Stored chunks are also added to the lexical
+    index, when one is given. Stages are
+    linked by bounded queues, so a slow stage back-pressures the ones
+    before it and at most `queue_size` batches are buffered between any
+    two of them.
+
+    Vectors and lexical entries are written to `namespace`.
+
+    Chunk vector ids are derived from the document key and the chunk's
+    content hash. Chunks whose id is in `known_ids` are already stored
+    with that exact content, so they are neither embedded nor upserted;
+    their stored metadata keeps the chunk_index of the earlier ingest.
+    """
+
+    def __init__(
+        self,
+        embedding_service: EmbeddingService,
+        async_vector_store: AsyncVectorStore,
+        batch_size: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        upsert_concurrency: Optional[int] = None,
+        lexical_index: Optional[PartitionedBM25Index] = None
+    ):
+        self.embedding_service = embedding_service
+        self.async_vector_store = async_vector_store
+        self.batch_size = batch_size or settings.ingest_batch_size
+        self.queue_size = queue_size or settings.ingest_queue_size
+        self.upsert_concurrency = upsert_concurrency or settings.vector_upsert_concurrency
+        self.lexical_index = lexical_index
+
+    async def run(
+        self,
+        pieces: Iterable[str],
+        chunking_strategy: ChunkingStrategy,
+        base_metadata: Dict[str, Any],
+        document_key: str,
+        known_ids: AbstractSet[str] = frozenset(),
+        on_progress: Optional[ProgressCallback] = None,
+        namespace: Optional[str] = None
+    ) -> PipelineResult:
+        loop = asyncio.get_running_loop()
+        chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        upsert_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        stopped = threading.Event()
+        result = PipelineResult()
+        # Producer thread time reading pieces, and blocked on a full queue
+        extract_seconds = 0.0
+        blocked_seconds = 0.0
+
+        def put_from_thread(item):
+            nonlocal blocked_seconds
+            started = time.perf_counter()
+            future = asyncio.run_coroutine_threadsafe(chunk_queue.put(item), loop)
+            try:
+                while True:
+                    if stopped.is_set():
+                        future.cancel()
+                        raise RuntimeError("Ingestion pipeline stopped")
+                    try:
+                        return future.result(timeout=0.1)
+                    except FutureTimeoutError:
+                        continue
+            finally:
+                blocked_seconds += time.perf_counter() - started
+
+        def counted(source):
+            nonlocal extract_seconds
+            pieces_iter = iter(source)
+            while True:
+                started = time.perf_counter()
+                try:
+                    piece = next(pieces_iter)
+                except StopIteration:
+                    return
+                finally:
+                    extract_seconds += time.perf_counter() - started
+                result.pages += 1
+                result.characters += len(piece)
+                yield piece
+
+        def produce():
+            occurrences: Dict[str, int] = {}
+            started = time.perf_counter()
+            try:
+                batch = []
+                chunk_options = {}
+                if chunking_strategy == ChunkingStrategy.TOKEN_BASED:
+                    chunk_options = {
+                        'tokenizer': self.embedding_service.tokenizer(),
+                        'max_tokens': self.embedding_service.chunk_token_budget(),
+                        'overlap_tokens': settings.token_chunk_overlap
+                    }
+                chunks = TextChunker.iter_chunks(counted(pieces), chunking_strategy, **chunk_options)
+                for chunk in chunks:
+                    chunk_hash = content_hash(chunk)
+                    occurrence = occurrences.get(chunk_hash, 0)
+                    occurrences[chunk_hash] = occurrence + 1
+                    batch.append((chunk, chunk_hash, chunk_vector_id(document_key, chunk_hash, occurrence)))
+                    if len(batch) >= self.batch_size:
+                        put_from_thread(batch)
+                        batch = []
+                if batch:
+                    put_from_thread(batch)
+                # Whatever is left of the thread's time went to chunking and hashing
+                STAGE_SECONDS.observe(extract_seconds, operation="ingest", stage="extract")
+                STAGE_SECONDS.observe(
+                    time.perf_counter() - started - extract_seconds - blocked_seconds,
+                    operation="ingest", stage="chunk"
+                )
+            finally:
+                if not stopped.is_set():
+                    put_from_thread(_DONE)
+
+        async def embed():
+            chunk_index = 0
+            while True:
+                batch = await chunk_queue.get()
+                if batch is _DONE:
+                    break
+                texts, ids, metadata = [], [], []
+                for chunk, chunk_hash, vector_id in batch:
+                    result.chunks.append((vector_id, chunk_index, chunk_hash))
+                    if vector_id in known_ids:
+                        result.chunks_reused += 1
+                    else:
+                        texts.append(chunk)
+                        ids.append(vector_id)
+                        metadata.append({**base_metadata, 'chunk_index': chunk_index})
+                    chunk_index += 1
+                result.chunk_count += len(batch)
+                CHUNKS.inc(len(batch), strategy=chunking_strategy.value)
+                if texts:
+                    with stage_timer("ingest", "embed"):
+                        embeddings = await self.embedding_service.generate_embeddings_async(texts)
+                    await upsert_queue.put((embeddings, texts, metadata, ids))
+                elif on_progress is not None:
+                    await on_progress(result)
+            await upsert_queue.put(_DONE)
+
+        async def write(item):
+            embeddings, texts, metadata, ids = item
+            with stage_timer("ingest", "upsert"):
+                report = await self.async_vector_store.upsert_with_report(
+                    embeddings, texts, metadata, ids, namespace
+                )
+            result.vector_ids.extend(report.succeeded)
+            result.failed_ids.update(report.failed)
+            VECTORS_UPSERTED.inc(len(report.succeeded))
+            if report.failed:
+                VECTOR_UPSERT_FAILURES.inc(len(report.failed))
+            if self.lexical_index is not None and report.succeeded:
+                stored = set(report.succeeded)
+                indexed = [(vector_id, text) for vector_id, text in zip(ids, texts) if vector_id in stored]
+                with stage_timer("ingest", "lexical_index"):
+                    await asyncio.to_thread(
+                        self.lexical_index.add,
+                        [vector_id for vector_id, _ in indexed],
+                        [text for _, text in indexed],
+                        namespace
+                    )
+            if on_progress is not None:
+                await on_progress(result)
+
+        async def upsert():
+            in_flight = set()
+            try:
+                while True:
+                    item = await upsert_queue.get()
+                    if item is _DONE:
+                        break
+                    if len(in_flight) >= self.upsert_concurrency:
+                        done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                        for task in done:
+                            task.result()
+                    in_flight.add(asyncio.ensure_future(write(item)))
+                if in_flight:
+                    await asyncio.gather(*in_flight)
+            except BaseException:
+                for task in in_flight:
+                    task.cancel()
+                await asyncio.gather(*in_flight, return_exceptions=True)
+                raise
+
+        tasks = [
+            asyncio.ensure_future(asyncio.to_thread(produce)),
+            asyncio.ensure_future(embed()),
+            asyncio.ensure_future(upsert())
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            stopped.set()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        return result
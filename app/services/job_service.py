@@ -0,0 +1,205 @@
+from typing import Callable, List, Optional
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from sqlalchemy import select, update
+from app.core.chunking import ChunkingStrategy
+from app.core.collections import normalize_collection
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.db.models import IngestionJob
+from app.services.document_service import DocumentService
+from app.services.ingestion_pipeline import PipelineResult
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFullError(Exception):
+    pass
+
+
+class IngestionJobManager:
+    """
+    Runs document ingestion in the background.
+
+    Jobs are recorded in the `ingestion_jobs` table and their spooled files
+    kept in `job_dir` until processed. A fixed pool of `workers` tasks
+    drains a bounded queue, so at most that many documents are ingested at
+    once no matter how many are submitted. Progress counters are written
+    back at most every `ingest_progress_interval` seconds. Jobs left queued
+    or running by a previous process are re-queued on start if their file
+    is still present.
+    """
+
+    def __init__(
+        self,
+        document_service_factory: Callable[[], DocumentService],
+        workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        job_dir: Optional[str] = None
+    ):
+        self.document_service_factory = document_service_factory
+        self.workers = workers or settings.ingest_job_workers
+        self.job_dir = job_dir or settings.ingest_job_dir or os.path.join(
+            tempfile.gettempdir(), "rag-ingest-jobs"
+        )
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or settings.ingest_job_queue_size)
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        os.makedirs(self.job_dir, exist_ok=True)
+        await self._recover()
+        self._tasks = [
+            asyncio.create_task(self._worker(i)) for i in range(self.workers)
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def has_capacity(self, count: int = 1) -> bool:
+        return self._queue.maxsize <= 0 or self._queue.qsize() + count <= self._queue.maxsize
+
+    async def submit(
+        self,
+        filename: str,
+        file_path: str,
+        chunking_strategy: ChunkingStrategy,
+        collection: Optional[str] = None
+    ) -> IngestionJob:
+        """Record a queued job for an already spooled file and enqueue it"""
+        if not self.has_capacity():
+            raise JobQueueFullError("Ingestion queue is full, retry later")
+
+        job = IngestionJob(
+            id=str(uuid.uuid4()),
+            filename=filename,
+            file_type=filename.split('.')[-1].lower(),
+            chunking_strategy=chunking_strategy.value,
+            collection=normalize_collection(collection),
+            file_path=file_path,
+            status="queued"
+        )
+        async with AsyncSessionLocal() as session:
+            session.add(job)
+            await session.commit()
+            await session.refresh(job)
+
+        self._queue.put_nowait(job.id)
+        return job
+
+    async def get(self, job_id: str) -> Optional[IngestionJob]:
+        async with AsyncSessionLocal() as session:
+            return await session.get(IngestionJob, job_id)
+
+    async def _recover(self):
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(IngestionJob)
+                .where(IngestionJob.status.in_(["queued", "running"]))
+                .order_by(IngestionJob.created_at)
+            )
+            jobs = result.scalars().all()
+
+            for job in jobs:
+                if job.file_path and os.path.exists(job.file_path) and self.has_capacity():
+                    job.status = "queued"
+                    self._queue.put_nowait(job.id)
+                else:
+                    job.status = "failed"
+                    job.error = "Interrupted before completion and cannot be resumed"
+                    job.finished_at = datetime.utcnow()
+            await session.commit()
+
+        if jobs:
+            logger.info(f"Recovered {len(jobs)} unfinished ingestion jobs")
+
+    async def _update(self, job_id: str, **values):
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                update(IngestionJob).where(IngestionJob.id == job_id).values(**values)
+            )
+            await session.commit()
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ingestion worker {worker_id} failed on job {job_id}: {e}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        job = await self.get(job_id)
+        if job is None:
+            return
+
+        await self._update(job_id, status="running", started_at=datetime.utcnow())
+        last_flush = 0.0
+        latest: Optional[PipelineResult] = None
+
+        async def on_progress(progress: PipelineResult):
+            nonlocal last_flush, latest
+            latest = progress
+            now = time.monotonic()
+            if now - last_flush < settings.ingest_progress_interval:
+                return
+            last_flush = now
+            await self._update(
+                job_id,
+                pages_extracted=progress.pages,
+                chunks_embedded=progress.chunk_count,
+                vectors_upserted=progress.vectors_upserted
+            )
+
+        try:
+            document_service = self.document_service_factory()
+            async with document_service.document_lock(job.filename, job.collection), \
+                    AsyncSessionLocal() as session:
+                document = await document_service.process_file(
+                    filename=job.filename,
+                    file_path=job.file_path,
+                    chunking_strategy=ChunkingStrategy(job.chunking_strategy),
+                    db=session,
+                    on_progress=on_progress,
+                    collection=job.collection
+                )
+                await session.execute(
+                    update(IngestionJob).where(IngestionJob.id == job_id).values(
+                        status="completed",
+                        document_id=document.id,
+                        pages_extracted=latest.pages if latest else 0,
+                        chunks_embedded=document.chunk_count,
+                        vectors_upserted=latest.vectors_upserted if latest else 0,
+                        finished_at=datetime.utcnow()
+                    )
+                )
+                await session.commit()
+            logger.info(f"Ingestion job {job_id} completed: {job.filename}")
+
+        except asyncio.CancelledError:
+            # Leave the job and its file in place so the next start re-queues it
+            raise
+        except Exception as e:
+            logger.error(f"Ingestion job {job_id} failed: {e}")
+            await self._update(job_id, status="failed", error=str(e), finished_at=datetime.utcnow())
+
+        if job.file_path and os.path.exists(job.file_path):
+            os.remove(job.file_path)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize(),
+            "queue_size": self._queue.maxsize
+        }
@@ -0,0 +1,94 @@
+"""
+Recall@k vs latency of the local IVF index against exact search.
+
+    python -m benchmarks.ann_recall --vectors 200000 --nprobe 1 4 8 16 32
+
+Vectors are drawn from a Gaussian mixture so the corpus has the cluster
+structure real sentence embeddings show; uniform noise would understate
+IVF recall.
+"""
+import argparse
+import json
+import time
+import numpy as np
+from app.core.ann_index import recall_at_k
+from app.core.local_vector_store import LocalVectorStore
+
+
+def clustered_vectors(count: int, dimension: int, clusters: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    labels = rng.integers(0, clusters, count)
+    noise = rng.standard_normal((count, dimension)).astype(np.float32) * 0.6
+    return centers[labels] + noise
+
+
+def timed_queries(store: LocalVectorStore, queries: np.ndarray, k: int, **kwargs):
+    ids, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results = store.query(query, top_k=k, **kwargs)
+        latencies.append(time.perf_counter() - start)
+        ids.append([result['id'] for result in results])
+    latencies = np.array(latencies) * 1000
+    return ids, {
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "mean_ms": float(latencies.mean())
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=0, help="0 picks 4*sqrt(N)")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    args = parser.parse_args()
+
+    from app.core.config import settings
+    settings.local_ivf_nlist = args.nlist
+    settings.local_ivf_min_train_size = min(settings.local_ivf_min_train_size, args.vectors)
+
+    corpus = clustered_vectors(args.vectors, args.dimension, args.clusters, seed=0)
+    queries = clustered_vectors(args.queries, args.dimension, args.clusters, seed=1)
+
+    store = LocalVectorStore(dimension=args.dimension, index_type="ivf", path="")
+    start = time.perf_counter()
+    for offset in range(0, args.vectors, 10000):
+        batch = corpus[offset:offset + 10000]
+        store.upsert_vectors(batch, [""] * len(batch), [{} for _ in range(len(batch))])
+    build_seconds = time.perf_counter() - start
+
+    exact_ids, exact_latency = timed_queries(store, queries, args.k, exact=True)
+    report = {
+        "vectors": args.vectors,
+        "dimension": args.dimension,
+        "k": args.k,
+        "nlist": store._ivf.nlist if store._ivf is not None else None,
+        "build_seconds": build_seconds,
+        "exact": exact_latency,
+        "ivf": []
+    }
+
+    print(f"exact        p50={exact_latency['p50_ms']:.3f}ms p99={exact_latency['p99_ms']:.3f}ms")
+    for nprobe in args.nprobe:
+        ids, latency = timed_queries(store, queries, args.k, nprobe=nprobe)
+        recall = recall_at_k(exact_ids, ids)
+        report["ivf"].append({"nprobe": nprobe, f"recall@{args.k}": recall, **latency})
+        print(
+            f"nprobe={nprobe:<5} recall@{args.k}={recall:.3f} "
+            f"p50={latency['p50_ms']:.3f}ms p99={latency['p99_ms']:.3f}ms"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Embedding throughput (chunks/sec) of the encoder backends on one corpus.
+
+    python -m benchmarks.embedding_throughput --onnx-path models/minilm-onnx
+
+Runs, on the same chunks:
+  - baseline      SentenceTransformer.encode on the chunks as given
+  - torch         length-bucketed TorchEncoder
+  - onnx          length-bucketed OnnxEncoder (with --onnx-path)
+  - onnx-int8     the same with model_quantized.onnx (if exported)
+
+The corpus is the token-based chunks of --file when given, otherwise a
+synthetic mix of short and long chunks resembling PDF page text. Each
+backend is compared to the baseline by cosine similarity, so a quantized
+model's accuracy cost is reported next to its speedup.
+"""
+import argparse
+import json
+import os
+import random
+import time
+import numpy as np
+from app.core.chunking import TextChunker
+from app.core.encoder import OnnxEncoder, TorchEncoder
+
+WORDS = (
+    "the model retrieves relevant passages from indexed documents and answers "
+    "questions about vector search embeddings chunking latency throughput "
+    "memory cache index query ranking recall precision"
+).split()
+
+
+def synthetic_chunks(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    chunks = []
+    for _ in range(count):
+        length = rng.choice([8, 16, 32, 64, 128, 200])
+        chunks.append(" ".join(rng.choice(WORDS) for _ in range(length)) + ".")
+    return chunks
+
+
+def measure(encode, chunks, repeats: int):
+    encode(chunks[:8])
+    best = float("inf")
+    embeddings = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        embeddings = np.asarray(encode(chunks), dtype=np.float32)
+        best = min(best, time.perf_counter() - start)
+    return embeddings, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", help="Text file to chunk into the corpus")
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--model", default=None, help="Defaults to settings.embedding_model")
+    parser.add_argument("--onnx-path", help="Directory written by scripts.export_onnx_model")
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    args = parser.parse_args()
+
+    from app.core.config import settings
+    torch_encoder = TorchEncoder(args.model or settings.embedding_model, args.threads, args.batch_size)
+
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            budget = torch_encoder.max_seq_length - torch_encoder.tokenizer.num_special_tokens_to_add()
+            chunks = list(TextChunker.iter_token_based(f, torch_encoder.tokenizer, budget))[:args.chunks]
+    else:
+        chunks = synthetic_chunks(args.chunks)
+
+    backends = {
+        "baseline": lambda texts: torch_encoder.model.encode(texts, batch_size=args.batch_size),
+        "torch": torch_encoder.encode
+    }
+    if args.onnx_path:
+        backends["onnx"] = OnnxEncoder(args.onnx_path, False, args.threads, args.batch_size).encode
+        if os.path.exists(os.path.join(args.onnx_path, "model_quantized.onnx")):
+            backends["onnx-int8"] = OnnxEncoder(args.onnx_path, True, args.threads, args.batch_size).encode
+
+    report = {"chunks": len(chunks), "threads": args.threads, "batch_size": args.batch_size, "backends": {}}
+    reference = None
+    for name, encode in backends.items():
+        embeddings, seconds = measure(encode, chunks, args.repeats)
+        if reference is None:
+            reference = embeddings
+        result = {"seconds": seconds, "chunks_per_second": len(chunks) / seconds}
+        line = f"{name:<10} {result['chunks_per_second']:8.1f} chunks/s"
+        if embeddings.shape == reference.shape:
+            cosine = np.sum(embeddings * reference, axis=1) / (
+                np.linalg.norm(embeddings, axis=1) * np.linalg.norm(reference, axis=1)
+            )
+            result["min_cosine_to_baseline"] = float(cosine.min())
+            result["mean_cosine_to_baseline"] = float(cosine.mean())
+            line += f" cosine min={cosine.min():.4f} mean={cosine.mean():.4f}"
+        report["backends"][name] = result
+        print(line)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Concurrent load generator for the chat API.
+
+    python -m benchmarks.load_test --concurrency 32 --duration 30 --output load.json
+    python -m benchmarks.load_test --url http://localhost:8000 --concurrency 64
+
+Without --url the app runs in this process over httpx's ASGI transport,
+with the offline stand-ins of benchmarks/stubs.py, after ingesting
+--documents synthetic documents. With --url it targets a running server
+as is. Each worker sends requests back to back, picked from --mix;
+QPS and p50/p95/p99 latency are reported per request kind and overall.
+
+Queries are drawn from a pool of --query-pool distinct questions, so
+the pool size sets how often the semantic cache can hit. Over the ASGI
+transport a streamed response is delivered whole, so stream time-to-first-
+byte is only meaningful with --url.
+"""
+from typing import Dict, List
+import argparse
+import asyncio
+import random
+import time
+import httpx
+from benchmarks import report, stubs
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        kind, weight = part.split("=")
+        mix[kind.strip()] = float(weight)
+    unknown = set(mix) - {"query", "stream", "history"}
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Unknown request kinds: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def query_pool(size: int, seed: int = 1) -> List[str]:
+    rng = random.Random(seed)
+    return [
+        f"what does the document say about {' '.join(rng.sample(stubs.WORDS, 3))}"
+        for _ in range(size)
+    ]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.first_byte: List[float] = []
+        self.errors: Dict[str, int] = {}
+
+    def record(self, kind: str, seconds: float, ok: bool):
+        if ok:
+            self.latencies.setdefault(kind, []).append(seconds)
+        else:
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+
+
+async def send(client: httpx.AsyncClient, kind: str, session_id: str, query: str, recorder: Recorder):
+    start = time.perf_counter()
+    ok = False
+    try:
+        if kind == "query":
+            response = await client.post("/api/chat/query", json={"session_id": session_id, "query": query})
+            ok = response.status_code == 200
+        elif kind == "stream":
+            async with client.stream(
+                "POST", "/api/chat/stream", json={"session_id": session_id, "query": query}
+            ) as response:
+                first = None
+                async for _ in response.aiter_bytes():
+                    if first is None:
+                        first = time.perf_counter() - start
+                ok = response.status_code == 200
+                if ok and first is not None:
+                    recorder.first_byte.append(first)
+        else:
+            response = await client.get(f"/api/chat/history/{session_id}", params={"limit": 20})
+            ok = response.status_code == 200
+    except httpx.HTTPError:
+        ok = False
+    recorder.record(kind, time.perf_counter() - start, ok)
+
+
+async def worker(worker_id: int, client, args, queries, recorder: Recorder, deadline: float, budget: List[int]):
+    rng = random.Random(worker_id)
+    kinds, weights = zip(*args.mix.items())
+    while time.perf_counter() < deadline:
+        if args.requests:
+            if budget[0] <= 0:
+                return
+            budget[0] -= 1
+        kind = rng.choices(kinds, weights)[0]
+        session_id = f"load-{worker_id}-{rng.randrange(args.sessions)}"
+        await send(client, kind, session_id, rng.choice(queries), recorder)
+
+
+async def seed_documents(client: httpx.AsyncClient, count: int, words: int):
+    for i in range(count):
+        content = stubs.synthetic_text(words, seed=100 + i).encode("utf-8")
+        response = await client.post(
+            "/api/ingest/upload",
+            files={"file": (f"bench-{i}.txt", content, "text/plain")},
+            data={"chunking_strategy": "sentence_based"}
+        )
+        response.raise_for_status()
+
+
+async def run(args, client: httpx.AsyncClient) -> Dict:
+    if args.documents:
+        await seed_documents(client, args.documents, args.document_words)
+
+    queries = query_pool(args.query_pool)
+    recorder = Recorder()
+    budget = [args.requests]
+    deadline = time.perf_counter() + (args.duration if not args.requests else float("inf"))
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        worker(i, client, args, queries, recorder, deadline, budget) for i in range(args.concurrency)
+    ])
+    elapsed = time.perf_counter() - start
+
+    results = {"elapsed_seconds": elapsed, "requests": {}}
+    total = 0
+    for kind, latencies in recorder.latencies.items():
+        total += len(latencies)
+        results["requests"][kind] = {
+            "qps": len(latencies) / elapsed,
+            "errors": recorder.errors.get(kind, 0),
+            **report.latency_summary(latencies)
+        }
+    all_latencies = [seconds for latencies in recorder.latencies.values() for seconds in latencies]
+    results["overall"] = {
+        "qps": total / elapsed,
+        "errors": sum(recorder.errors.values()),
+        **report.latency_summary(all_latencies)
+    }
+    if recorder.first_byte:
+        results["stream_first_byte"] = report.latency_summary(recorder.first_byte)
+
+    stats = await client.get("/stats")
+    if stats.status_code == 200:
+        results["service_stats"] = stats.json()
+    return results
+
+
+async def run_in_process(args) -> Dict:
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+            return await run(args, client)
+
+
+async def run_remote(args) -> Dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        return await run(args, client)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Base URL of a running server; in-process with stand-ins when omitted")
+    parser.add_argument("--real-model", action="store_true", help="In-process: use the real embedding model")
+    parser.add_argument("--encoder-cost-ms", type=float, default=0.0, help="In-process: simulated model time per text")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load")
+    parser.add_argument("--requests", type=int, default=0, help="Total requests instead of a duration")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("query=0.7,stream=0.2,history=0.1"))
+    parser.add_argument("--sessions", type=int, default=50, help="Chat sessions per worker")
+    parser.add_argument("--query-pool", type=int, default=200)
+    parser.add_argument("--documents", type=int, default=None, help="Documents to ingest first (default 5 in-process, 0 with --url)")
+    parser.add_argument("--document-words", type=int, default=20000)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    parser.add_argument("--compare", help="Earlier JSON report to print changes against")
+    args = parser.parse_args()
+
+    if args.documents is None:
+        args.documents = 0 if args.url else 5
+
+    if args.url:
+        results = asyncio.run(run_remote(args))
+    else:
+        stubs.configure(real_model=args.real_model, encoder_cost_ms=args.encoder_cost_ms)
+        results = asyncio.run(run_in_process(args))
+
+    for kind, summary in {**results["requests"], "overall": results["overall"]}.items():
+        if summary.get("count"):
+            print(
+                f"{kind:<8} {summary['qps']:8.1f} qps  p50 {summary['p50_ms']:7.2f} ms  "
+                f"p95 {summary['p95_ms']:7.2f} ms  p99 {summary['p99_ms']:7.2f} ms  errors {summary['errors']}"
+            )
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+    report.write(args.output, results, config, args.compare)
+
+
+if __name__ == "__main__":
+    main()
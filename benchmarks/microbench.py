@@ -0,0 +1,215 @@
+"""
+Microbenchmarks of the ingestion building blocks, offline.
+
+    python -m benchmarks.microbench --output bench.json [--compare previous.json]
+
+Sections (--only to pick some):
+  - chunking    TextChunker.iter_chunks per strategy, MB/s and chunks/s
+  - pdf         page extraction of a synthetic PDF, serial and on a process pool
+  - embedding   EmbeddingService.generate_embeddings at several call sizes
+  - upsert      vector upsert batching: Pinecone VectorStore against a fake
+                index with request latency, by concurrency, and the local store
+  - selection   near-duplicate suppression + MMR over retrieval candidates
+
+Runs with the stub encoder unless --real-model is given (needs the model
+and sentence-transformers installed). See benchmarks/stubs.py.
+"""
+import argparse
+import os
+import time
+import numpy as np
+from benchmarks import report, stubs
+
+
+def best_of(repeats: int, function):
+    best = float("inf")
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench_chunking(args, text: str, tokenizer, budget: int):
+    from app.core.chunking import ChunkingStrategy, TextChunker
+
+    pieces = [text[i:i + 64 * 1024] for i in range(0, len(text), 64 * 1024)]
+    megabytes = len(text.encode("utf-8")) / (1024 * 1024)
+    results = {}
+    for strategy in ChunkingStrategy:
+        options = {}
+        if strategy == ChunkingStrategy.TOKEN_BASED:
+            options = {"tokenizer": tokenizer, "max_tokens": budget}
+        seconds, chunks = best_of(
+            args.repeats, lambda: list(TextChunker.iter_chunks(iter(pieces), strategy, **options))
+        )
+        results[strategy.value] = {
+            "seconds": seconds,
+            "mb_per_second": megabytes / seconds,
+            "chunks": len(chunks),
+            "chunks_per_second": len(chunks) / seconds
+        }
+        print(f"chunking  {strategy.value:<15} {megabytes / seconds:8.2f} MB/s {len(chunks) / seconds:10.0f} chunks/s")
+    return results
+
+
+def bench_pdf(args, workdir: str):
+    from app.core.pdf_extraction import create_pdf_executor, iter_pages_parallel, open_pdf
+
+    path = os.path.join(workdir, "synthetic.pdf")
+    with open(path, "wb") as f:
+        f.write(stubs.synthetic_pdf(args.pdf_pages))
+
+    def serial():
+        with open_pdf(path) as reader:
+            return [page.extract_text() for page in reader.pages]
+
+    from app.core.config import usable_cpus
+
+    seconds, pages = best_of(args.repeats, serial)
+    results = {
+        "pages": len(pages),
+        "usable_cpus": usable_cpus(),
+        "serial": {"seconds": seconds, "pages_per_second": len(pages) / seconds}
+    }
+    print(f"pdf       serial          {len(pages) / seconds:8.1f} pages/s ({usable_cpus()} usable CPUs)")
+
+    for workers in args.pdf_workers:
+        executor = create_pdf_executor(workers)
+        try:
+            list(executor.map(abs, range(workers)))
+            seconds, _ = best_of(
+                args.repeats, lambda: list(iter_pages_parallel(executor, path, len(pages), workers))
+            )
+        finally:
+            executor.shutdown()
+        results[f"workers_{workers}"] = {"seconds": seconds, "pages_per_second": len(pages) / seconds}
+        print(f"pdf       {workers} workers       {len(pages) / seconds:8.1f} pages/s")
+    return results
+
+
+def bench_embedding(args, service, chunks):
+    results = {}
+    for call_size in args.embed_call_sizes:
+        def run():
+            for start in range(0, len(chunks), call_size):
+                service.generate_embeddings(chunks[start:start + call_size])
+        seconds, _ = best_of(args.repeats, run)
+        results[f"call_size_{call_size}"] = {"seconds": seconds, "chunks_per_second": len(chunks) / seconds}
+        print(f"embedding call size {call_size:<5} {len(chunks) / seconds:8.1f} chunks/s")
+    return results
+
+
+def bench_upsert(args, vectors, chunks):
+    from app.core.config import settings
+    from app.core.local_vector_store import LocalVectorStore
+
+    results = {}
+    texts = list(chunks)
+    ids = [f"bench-{i}" for i in range(len(texts))]
+    for batch_size in args.upsert_batch_sizes:
+        settings.vector_upsert_max_batch_size = batch_size
+        for concurrency in args.upsert_concurrency:
+            index = stubs.FakePineconeIndex(args.upsert_latency_ms, args.upsert_ms_per_mb)
+            store = stubs.fake_pinecone_store(index, concurrency)
+            try:
+                seconds, _ = best_of(1, lambda: store.upsert_with_report(
+                    vectors, texts, [{} for _ in texts], ids
+                ))
+            finally:
+                store.close()
+            key = f"pinecone_batch_{batch_size}_concurrency_{concurrency}"
+            results[key] = {
+                "seconds": seconds,
+                "vectors_per_second": len(texts) / seconds,
+                "requests": index.requests
+            }
+            print(
+                f"upsert    batch {batch_size:<5} x{concurrency:<3} "
+                f"{len(texts) / seconds:10.0f} vectors/s ({index.requests} requests)"
+            )
+
+    def local():
+        store = LocalVectorStore(path="")
+        for start in range(0, len(texts), 64):
+            store.upsert_vectors(
+                vectors[start:start + 64], texts[start:start + 64],
+                [{} for _ in range(len(texts[start:start + 64]))], ids[start:start + 64]
+            )
+    seconds, _ = best_of(args.repeats, local)
+    results["local"] = {"seconds": seconds, "vectors_per_second": len(texts) / seconds}
+    print(f"upsert    local store     {len(texts) / seconds:10.0f} vectors/s")
+    return results
+
+
+def bench_selection(args, vectors):
+    from app.core.diversity import candidate_matrix, select_diverse
+
+    results = {}
+    rng = np.random.default_rng(0)
+    for candidates in args.selection_candidates:
+        rows = [np.asarray(vector, dtype=np.float32) for vector in vectors[:candidates]]
+        relevance = np.sort(rng.random(len(rows)))[::-1]
+        def run():
+            for _ in range(100):
+                select_diverse(candidate_matrix(rows, len(rows[0])), relevance, args.selection_top_k)
+        seconds, _ = best_of(args.repeats, run)
+        results[f"candidates_{len(rows)}"] = {"ms_per_selection": seconds * 10}
+        print(f"selection {len(rows):<5} candidates {seconds * 10:8.3f} ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=["chunking", "pdf", "embedding", "upsert", "selection"])
+    parser.add_argument("--real-model", action="store_true", help="Use settings.embedding_model instead of the stub")
+    parser.add_argument("--words", type=int, default=500000, help="Size of the synthetic text corpus")
+    parser.add_argument("--chunks", type=int, default=2000, help="Chunks used by the embedding and upsert sections")
+    parser.add_argument("--pdf-pages", type=int, default=200)
+    parser.add_argument("--pdf-workers", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--embed-call-sizes", type=int, nargs="+", default=[1, 32, 256])
+    parser.add_argument("--upsert-batch-sizes", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--upsert-concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--upsert-latency-ms", type=float, default=20.0)
+    parser.add_argument("--upsert-ms-per-mb", type=float, default=10.0)
+    parser.add_argument("--selection-candidates", type=int, nargs="+", default=[20, 50, 200])
+    parser.add_argument("--selection-top-k", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    parser.add_argument("--compare", help="Earlier JSON report to print changes against")
+    args = parser.parse_args()
+
+    os.environ["EMBEDDING_CACHE_ENABLED"] = "false"
+    workdir = stubs.configure(real_model=args.real_model)
+    sections = set(args.only or ["chunking", "pdf", "embedding", "upsert", "selection"])
+
+    from app.core.chunking import ChunkingStrategy, TextChunker
+    from app.core.embeddings import EmbeddingService
+
+    service = EmbeddingService()
+    service.warmup()
+    text = stubs.synthetic_text(args.words)
+    chunks = list(TextChunker.iter_chunks(iter([text]), ChunkingStrategy.SENTENCE_BASED))[:args.chunks]
+
+    results = {}
+    if "chunking" in sections:
+        results["chunking"] = bench_chunking(args, text, service.tokenizer(), service.chunk_token_budget())
+    if "pdf" in sections:
+        results["pdf"] = bench_pdf(args, workdir)
+    if "embedding" in sections:
+        results["embedding"] = bench_embedding(args, service, chunks)
+    if sections & {"upsert", "selection"}:
+        vectors = np.asarray(service.generate_embeddings(chunks), dtype=np.float32).tolist()
+    if "upsert" in sections:
+        results["upsert"] = bench_upsert(args, vectors, chunks)
+    if "selection" in sections:
+        results["selection"] = bench_selection(args, vectors)
+    service.close()
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+    report.write(args.output, results, config, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Shared JSON report helpers, so runs on different commits can be diffed"""
+from typing import Any, Dict, Iterator, Tuple
+import json
+import platform
+import subprocess
+import time
+import numpy as np
+
+
+def latency_summary(seconds) -> Dict[str, float]:
+    latencies = np.asarray(seconds, dtype=np.float64) * 1000
+    if latencies.size == 0:
+        return {"count": 0}
+    return {
+        "count": int(latencies.size),
+        "mean_ms": float(latencies.mean()),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "max_ms": float(latencies.max())
+    }
+
+
+def environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "processor": platform.processor()
+    }
+
+
+def _numbers(report: Dict[str, Any], prefix: str = "") -> Iterator[Tuple[str, float]]:
+    for key, value in report.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            yield from _numbers(value, path)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield path, value
+
+
+def compare(previous: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.1):
+    """Print every numeric result that moved by more than `threshold` (relative)"""
+    before = dict(_numbers(previous.get("results", {})))
+    for path, value in _numbers(current.get("results", {})):
+        old = before.get(path)
+        if not old:
+            continue
+        change = (value - old) / abs(old)
+        if abs(change) >= threshold:
+            print(f"{path:<60} {old:>12.3f} -> {value:>12.3f} ({change:+.0%})")
+
+
+def write(path: str, results: Dict[str, Any], config: Dict[str, Any], compare_to: str = None):
+    report = {"environment": environment(), "config": config, "results": results}
+    if path:
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+    if compare_to:
+        with open(compare_to) as f:
+            compare(json.load(f), report)
+    return report
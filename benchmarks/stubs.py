@@ -0,0 +1,218 @@
+"""
+Local stand-ins for the external services, so benchmarks run offline:
+
+  - StubEncoder: deterministic feature-hashing embeddings with a regex
+    tokenizer, in place of the sentence-transformers model
+  - the local in-memory vector store, in place of Pinecone
+  - FakePineconeIndex: an upsert target with configurable request latency,
+    for measuring upsert batching without a Pinecone account
+  - fakeredis, in place of Redis (pip install fakeredis)
+
+configure() must run before any `app` module is imported, because the
+settings object and the database engine are created at import time.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import zlib
+import numpy as np
+
+WORDS = (
+    "the model retrieves relevant passages from indexed documents and answers "
+    "questions about vector search embeddings chunking latency throughput memory "
+    "cache index query ranking recall precision machine learning artificial "
+    "intelligence neural network training data pipeline interview schedule"
+).split()
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+def synthetic_text(words: int, seed: int = 0) -> str:
+    """Sentences of 6-30 words drawn from a small vocabulary"""
+    rng = random.Random(seed)
+    sentences, count = [], 0
+    while count < words:
+        length = rng.randint(6, 30)
+        sentence = " ".join(rng.choice(WORDS) for _ in range(length))
+        sentences.append(sentence[0].upper() + sentence[1:] + ".")
+        count += length
+    return " ".join(sentences)
+
+
+def synthetic_pdf(pages: int, words_per_page: int = 400, seed: int = 0) -> bytes:
+    """A minimal valid PDF with one Helvetica text stream per page"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+    ]
+    page_ids = []
+    for page in range(pages):
+        words = synthetic_text(words_per_page, seed + page).split()
+        lines = [" ".join(words[i:i + 12]) for i in range(0, len(words), 12)]
+        text = "".join(f"({line}) Tj T* " for line in lines)
+        stream = f"BT /F1 9 Tf 11 TL 40 800 Td {text}ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % pages
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+class StubTokenizer:
+    """Word/punctuation tokenizer with the subset of the HF tokenizer API the app uses"""
+
+    name_or_path = "stub"
+    pad_token_id = 0
+
+    def _encode(self, text: str, add_special_tokens: bool, max_length: Optional[int]):
+        spans = [(match.start(), match.end()) for match in _TOKEN.finditer(text)]
+        ids = [zlib.crc32(text[start:stop].lower().encode()) % 30000 + 1000 for start, stop in spans]
+        if add_special_tokens:
+            ids = [101] + ids + [102]
+            spans = [(0, 0)] + spans + [(0, 0)]
+        if max_length is not None and len(ids) > max_length:
+            ids, spans = ids[:max_length], spans[:max_length]
+        return ids, spans
+
+    def __call__(
+        self,
+        texts,
+        add_special_tokens: bool = True,
+        return_offsets_mapping: bool = False,
+        truncation: bool = False,
+        max_length: Optional[int] = None,
+        **kwargs
+    ) -> Dict[str, Any]:
+        single = isinstance(texts, str)
+        encoded = [
+            self._encode(text, add_special_tokens, max_length if truncation else None)
+            for text in ([texts] if single else texts)
+        ]
+        out = {"input_ids": [ids for ids, _ in encoded]}
+        if return_offsets_mapping:
+            out["offset_mapping"] = [spans for _, spans in encoded]
+        if single:
+            out = {key: value[0] for key, value in out.items()}
+        return out
+
+    def num_special_tokens_to_add(self, pair: bool = False) -> int:
+        return 2
+
+
+def _encoder_base():
+    from app.core.encoder import BaseEncoder
+    return BaseEncoder
+
+
+def create_stub_encoder(dimension: int = 384, max_seq_length: int = 256, batch_size: int = 32, cost_ms: float = 0.0):
+    """
+    Encoder whose embedding is the normalized sum of hashed token vectors,
+    so texts sharing words are close, like a real model. `cost_ms` sleeps
+    per text to stand in for model compute.
+    """
+
+    class StubEncoder(_encoder_base()):
+        def __init__(self):
+            super().__init__(StubTokenizer(), max_seq_length, batch_size)
+            self.dimension = dimension
+            self._table = np.random.default_rng(0).standard_normal((32768, dimension)).astype(np.float32)
+
+        def _encode_batch(self, texts: List[str], input_ids: List[List[int]]) -> np.ndarray:
+            if cost_ms:
+                time.sleep(cost_ms * len(texts) / 1000)
+            out = np.empty((len(texts), self.dimension), dtype=np.float32)
+            for i, ids in enumerate(input_ids):
+                vector = self._table[np.asarray(ids, dtype=np.int64) % self._table.shape[0]].sum(axis=0)
+                out[i] = vector / max(float(np.linalg.norm(vector)), 1e-12)
+            return out
+
+    return StubEncoder()
+
+
+class FakePineconeIndex:
+    """Pinecone Index stand-in: each upsert costs `latency_ms` plus `ms_per_mb` of payload"""
+
+    def __init__(self, latency_ms: float = 20.0, ms_per_mb: float = 10.0):
+        self.latency = latency_ms / 1000
+        self.seconds_per_byte = ms_per_mb / 1000 / (1024 * 1024)
+        self.requests = 0
+        self.vectors = 0
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors: List[Tuple[str, List[float], Dict[str, Any]]], namespace: Optional[str] = None):
+        payload = sum(len(vector_id) + 12 * len(values) + 200 for vector_id, values, _ in vectors)
+        time.sleep(self.latency + payload * self.seconds_per_byte)
+        with self._lock:
+            self.requests += 1
+            self.vectors += len(vectors)
+
+
+def fake_pinecone_store(index: FakePineconeIndex, concurrency: int):
+    """app.core.vector_store.VectorStore bound to a fake index instead of a Pinecone connection"""
+    from concurrent.futures import ThreadPoolExecutor
+    from app.core.vector_store import VectorStore
+
+    store = VectorStore.__new__(VectorStore)
+    store.index = index
+    store.index_name = "benchmark"
+    store._upsert_executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="pinecone-upsert")
+    return store
+
+
+def configure(real_model: bool = False, workdir: Optional[str] = None, encoder_cost_ms: float = 0.0) -> str:
+    """
+    Point the app at local stand-ins: in-memory vector store, SQLite and
+    BM25 index in a scratch directory, fakeredis and, unless `real_model`,
+    the stub encoder. Returns the scratch directory.
+    """
+    workdir = workdir or tempfile.mkdtemp(prefix="rag-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    os.environ.update({
+        "VECTOR_STORE_BACKEND": "local",
+        "LOCAL_VECTOR_STORE_PATH": "",
+        "DATABASE_URL": f"sqlite+aiosqlite:///{os.path.join(workdir, 'bench.db')}",
+        "BM25_INDEX_PATH": os.path.join(workdir, "bm25_index"),
+        "INGEST_JOB_DIR": os.path.join(workdir, "jobs"),
+        "UPLOAD_SPOOL_DIR": workdir,
+        "EMBEDDING_BACKEND": "torch"
+    })
+
+    try:
+        import fakeredis
+    except ImportError:
+        raise SystemExit("The benchmarks need fakeredis as the Redis stand-in: pip install -r requirements-dev.txt")
+    import redis
+    import redis.asyncio
+
+    server = fakeredis.FakeServer()
+    redis.Redis = lambda **kwargs: fakeredis.FakeRedis(server=server, **kwargs)
+    redis.asyncio.Redis = lambda **kwargs: fakeredis.FakeAsyncRedis(server=server, **kwargs)
+
+    from app.db import database
+    database.engine.echo = False
+
+    if not real_model:
+        import app.core.embeddings as embeddings
+        embeddings.create_encoder = lambda backend=None: create_stub_encoder(cost_ms=encoder_cost_ms)
+    return workdir
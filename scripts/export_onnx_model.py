@@ -0,0 +1,74 @@
+"""
+Export a sentence-transformers model for the onnx embedding backend.
+
+    python -m scripts.export_onnx_model --output models/minilm-onnx --quantize
+
+Writes model.onnx (and model_quantized.onnx with --quantize, int8 weights
+via ONNX Runtime dynamic quantization), the tokenizer files and
+sentence_bert_config.json into the output directory. Point
+EMBEDDING_ONNX_PATH at it and set EMBEDDING_BACKEND=onnx.
+
+Needs torch and sentence-transformers at export time only, plus
+requirements-onnx.txt.
+"""
+import argparse
+import json
+import os
+
+
+def export(model_name: str, output: str, quantize: bool, opset: int = 14):
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    pooling = model[1]
+    if not getattr(pooling, "pooling_mode_mean_tokens", False):
+        raise ValueError(f"{model_name} does not use mean pooling, which the onnx backend assumes")
+
+    os.makedirs(output, exist_ok=True)
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+    tokenizer.save_pretrained(output)
+    with open(os.path.join(output, "sentence_bert_config.json"), "w") as f:
+        json.dump({"max_seq_length": model.max_seq_length}, f)
+
+    sample = tokenizer(["An example sentence to trace the graph."], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    model_path = os.path.join(output, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            model_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset
+        )
+    print(f"Wrote {model_path}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantized_path = os.path.join(output, "model_quantized.onnx")
+        quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+        print(f"Wrote {quantized_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=None, help="Defaults to settings.embedding_model")
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--quantize", action="store_true")
+    parser.add_argument("--opset", type=int, default=14)
+    args = parser.parse_args()
+
+    from app.core.config import settings
+    export(args.model or settings.embedding_model, args.output, args.quantize, args.opset)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Convert chat histories stored as one JSON string per session to the Redis
+list layout used by ChatHistoryStore.
+
+    python -m scripts.migrate_chat_history [--dry-run]
+
+Keys are found with SCAN, so the server is not blocked, and each key is
+converted in its own WATCH/MULTI transaction with its expiry kept. Safe to
+run while the API is serving: sessions touched in the meantime are
+converted lazily by the API itself and skipped here.
+"""
+import argparse
+
+
+def migrate(dry_run: bool = False, batch: int = 500) -> dict:
+    import redis
+    from app.core.config import settings
+    from app.services.chat_history import ChatHistoryStore, history_key
+
+    client = redis.Redis(
+        host=settings.redis_host,
+        port=settings.redis_port,
+        db=settings.redis_db,
+        decode_responses=True
+    )
+    store = ChatHistoryStore(client, None)
+    counts = {"legacy": 0, "migrated": 0}
+    try:
+        for key in client.scan_iter(match=history_key("*"), count=batch, _type="string"):
+            counts["legacy"] += 1
+            if not dry_run and store.migrate(key):
+                counts["migrated"] += 1
+    finally:
+        client.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Only count the keys still in the old format")
+    parser.add_argument("--batch", type=int, default=500, help="SCAN count hint")
+    args = parser.parse_args()
+
+    counts = migrate(args.dry_run, args.batch)
+    print(f"{counts['legacy']} JSON-string histories found, {counts['migrated']} migrated")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import asyncio
+import json
+import fakeredis
+import pytest
+from app.services.chat_history import ChatHistoryStore, history_key
+
+LEGACY = [
+    {"role": "user", "content": "hello"},
+    {"role": "assistant", "content": "hi there"}
+]
+
+
+@pytest.fixture
+def store():
+    server = fakeredis.FakeServer()
+    return ChatHistoryStore(
+        fakeredis.FakeRedis(server=server, decode_responses=True),
+        fakeredis.aioredis.FakeRedis(server=server, decode_responses=True),
+        max_messages=10,
+        ttl=3600
+    )
+
+
+def write_legacy(store: ChatHistoryStore, session_id: str):
+    store.redis_client.set(history_key(session_id), json.dumps(LEGACY), ex=600)
+
+
+def test_get_migrates_legacy_history(store):
+    write_legacy(store, "legacy")
+    assert store.get("legacy") == LEGACY
+    assert store.redis_client.type(history_key("legacy")) == "list"
+
+
+def test_append_migrates_legacy_history(store):
+    write_legacy(store, "legacy")
+    store.append("legacy", [{"role": "user", "content": "again"}])
+    assert store.get("legacy") == LEGACY + [{"role": "user", "content": "again"}]
+
+
+def test_get_async_migrates_legacy_history(store):
+    write_legacy(store, "legacy")
+    assert asyncio.run(store.get_async("legacy")) == LEGACY
+
+
+def test_page_async_migrates_legacy_history(store):
+    write_legacy(store, "legacy")
+    messages, total = asyncio.run(store.page_async("legacy", 0, 1))
+    assert messages == LEGACY[:1]
+    assert total == 2
+
+
+def test_append_async_migrates_legacy_history(store):
+    write_legacy(store, "legacy")
+    asyncio.run(store.append_async("legacy", [{"role": "user", "content": "again"}]))
+    assert store.get("legacy") == LEGACY + [{"role": "user", "content": "again"}]
@@ -0,0 +1,61 @@
+import errno
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from urllib3.exceptions import MaxRetryError, ProtocolError
+from app.core.config import settings
+from app.core.vector_store import VectorStore
+
+
+class FlakyIndex:
+    """Index stand-in whose first upserts raise the given errors"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.upserted = []
+
+    def upsert(self, vectors, namespace=None):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.upserted.extend(record[0] for record in vectors)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(settings, "vector_upsert_backoff", 0.0)
+    monkeypatch.setattr(settings, "vector_upsert_max_retries", 2)
+
+
+def store_for(index):
+    store = VectorStore.__new__(VectorStore)
+    store.index = index
+    store.index_name = "test"
+    store._upsert_executor = ThreadPoolExecutor(max_workers=1)
+    return store
+
+
+@pytest.mark.parametrize("error", [
+    ProtocolError("Connection aborted.", ConnectionResetError(104, "Connection reset by peer")),
+    MaxRetryError(None, "/vectors/upsert", "too many retries"),
+    OSError(errno.ENETUNREACH, "Network is unreachable"),
+    ConnectionError("connection refused")
+])
+def test_upsert_retries_transport_errors(error):
+    index = FlakyIndex(error)
+    report = store_for(index).upsert_with_report([[0.1, 0.2]], ["text"], [{}], ["a"])
+    assert report.succeeded == ["a"]
+    assert not report.failed
+    assert index.upserted == ["a"]
+
+
+def test_upsert_gives_up_after_max_retries():
+    index = FlakyIndex(*[OSError(errno.ENETUNREACH, "Network is unreachable")] * 3)
+    report = store_for(index).upsert_with_report([[0.1, 0.2]], ["text"], [{}], ["a"])
+    assert report.succeeded == []
+    assert set(report.failed) == {"a"}
+
+
+def test_upsert_does_not_retry_rejected_payload():
+    index = FlakyIndex(ValueError("bad record"), None)
+    report = store_for(index).upsert_with_report([[0.1, 0.2]], ["text"], [{}], ["a"])
+    assert set(report.failed) == {"a"}
+    assert index.errors == [None]